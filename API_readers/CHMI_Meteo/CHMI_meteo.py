@@ -1,117 +1,99 @@
-import pandas as pd
-import aiohttp
-import aiofiles
 import asyncio
-from bs4 import BeautifulSoup
-import requests
-from pathlib import Path
+import hashlib
 import json
-from datetime import datetime
-import time
+import os
+import warnings
+import httpx
+import pandas as pd
+from bs4 import BeautifulSoup
+from API_readers.CHMI_Meteo.chmi_mapping.chmi_mapping import DATA_ALIASES, GLOBAL_MAPPING
+from utils.atomic_write import atomic_path, atomic_write
+from utils.download_cache import cached_get
+from utils.process_pool import run_in_process
+from utils.station_registry import StationRegistry
 
 # Constants
 BASE_URL = "https://opendata.chmi.cz/meteorology/climate/historical/data/daily/"
-DOWNLOAD_DIR = Path("downloaded_json")
-DOWNLOAD_DIR.mkdir(exist_ok=True, parents=True)
-BATCH_SIZE = 5
-FINAL_COLS = ['station_ID', 'date', 'latitude', 'longitude', 'precipitation [mm]', 'temperature [°c]']
-CURRENT_DATE = datetime.now().strftime('%Y-%m-%dT00:00:00Z')
-
-
-async def fetch_json_files():
-    """Fetch or load cached JSON file list with timeout"""
-    cache_file = Path("json_files_list.txt")
-    if cache_file.exists():
-        with open(cache_file, 'r') as f:
-            return [line.strip() for line in f]
-
+METADATA_URL = "https://opendata.chmi.cz/meteorology/climate/historical/metadata/meta1.json"
+MODULE_DIR = os.path.dirname(os.path.realpath(__file__))
+MIRROR_DIR = os.path.join(MODULE_DIR, 'mirror')
+# Latest listing of the daily data files; the tracked list is a read-only fallback
+FILE_LIST_PATH = os.path.join(MIRROR_DIR, 'json_files_list.txt')
+DEFAULT_FILE_LIST_PATH = os.path.join(MODULE_DIR, 'json_files_list.txt')
+STORE_DIR = os.path.join(MODULE_DIR, 'store')
+MAX_CONCURRENT_DOWNLOADS = 5
+TIMEOUT = 30.0  # seconds
+ROW_GROUP_SIZE = 4096  # about 11 years of daily values
+ELEMENTS = list(DATA_ALIASES.keys())
+STATION_COLUMNS = ['station', 'begin_date', 'end_date', 'lat', 'lon']
+
+
+def _empty_values():
+    """
+    Empty table of daily values with their dtypes.
+    """
+    return pd.DataFrame({'date': pd.Series(dtype='datetime64[ns]'),
+                         **{element: pd.Series(dtype='float64') for element in ELEMENTS}})
+
+
+def _values_path(station, store_dir):
+    """
+    Build the path of the stored daily values of a station.
+    """
+    return os.path.join(store_dir, 'values', f"{station}.parquet")
+
+
+def _write_parquet(df, path, **kwargs):
+    """
+    Write a parquet file atomically (see `atomic_path`).
+    """
+    with atomic_path(path) as temp_path:
+        df.to_parquet(temp_path, index=False, **kwargs)
+
+
+def station_id(file_name):
+    """
+    Get the station ID (WSI) of a daily data file, e.g. 'dly-0-20000-0-11406.json' -> '0-20000-0-11406'.
+    """
+    return file_name[len('dly-'):-len('.json')]
+
+
+async def fetch_json_files(client):
+    """
+    List the daily data files published by CHMI; the list is kept in FILE_LIST_PATH and reused when the listing
+    is unavailable (DEFAULT_FILE_LIST_PATH is used if it has never been fetched).
+
+    :param client: httpx.AsyncClient used for the request.
+    :return: List of JSON file names.
+    """
     try:
-        # Add timeout to requests.get (e.g., 10 seconds)
-        response = requests.get(BASE_URL, timeout=10)
-        response.raise_for_status()  # Raise an exception for bad status codes
+        response = await client.get(BASE_URL)
+        response.raise_for_status()
         soup = BeautifulSoup(response.text, 'html.parser')
         json_files = [link['href'] for link in soup.find_all('a') if link.get('href', '').endswith('.json')]
-        with open(cache_file, 'w') as f:
-            f.write('\n'.join(json_files))
+        atomic_write(FILE_LIST_PATH, '\n'.join(json_files))
         return json_files
-    except requests.exceptions.Timeout:
-        print("Timeout occurred while fetching JSON file list.")
-        return []
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         print(f"Error fetching JSON file list: {e}")
-        return []
-
-async def download_file(session, url, filepath):
-    """Download single file with retry logic and timeout"""
-    max_attempts = 3
-    attempt = 1
-
-    while attempt <= max_attempts:
-        try:
-            if not filepath.exists():
-                # Set timeout for aiohttp request (e.g., 30 seconds total)
-                timeout = aiohttp.ClientTimeout(total=30)
-                async with session.get(url, timeout=timeout) as resp:
-                    resp.raise_for_status()
-                    content = await resp.read()
-                    async with aiofiles.open(filepath, 'wb') as f:
-                        await f.write(content)
-                print(f"Downloaded: {filepath.name}")
-            return
-        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
-            print(f"Attempt {attempt} failed for {url}: {e}")
-            if attempt == max_attempts:
-                print(f"Max attempts reached for {url}. Giving up.")
-                raise
-            attempt += 1
-            await asyncio.sleep(2 ** attempt)  # Exponential backoff
-
-async def download_missing_files(json_files):
-    """Download all missing files concurrently with progress and batching"""
-    async with aiohttp.ClientSession() as session:
-        tasks = []
-        total_files = len(json_files)
-        semaphore = asyncio.Semaphore(BATCH_SIZE)  # Limit concurrent downloads
-
-        async def bounded_download(url, filepath):
-            async with semaphore:  # Limit concurrency
-                await download_file(session, url, filepath)
-
-        for i, f in enumerate(json_files, 1):
-            filepath = DOWNLOAD_DIR / f
-            url = BASE_URL + f
-            try:
-                filepath.parent.mkdir(parents=True, exist_ok=True)
-                tasks.append(bounded_download(url, filepath))
-            except Exception as e:
-                print(f"Error preparing task for {f}: {e}")
-
-        if tasks:
-            for i, task in enumerate(asyncio.as_completed(tasks), 1):
-                try:
-                    await task
-                    print(f"Download progress: {i}/{total_files}")
-                except Exception as e:
-                    print(f"Task failed: {e}")
-        else:
-            print("No files to download.")
-
-
-async def load_json(file_path):
-    """Load JSON file asynchronously"""
-    async with aiofiles.open(file_path, 'r', encoding='utf-8') as f:
-        return json.loads(await f.read())
-
-
-def process_metadata(meta_loc_data):
-    """Process metadata into DataFrame"""
-    header = meta_loc_data['data']['data']['header'].split(',')
-    values = meta_loc_data['data']['data']['values']
-
-    loc_df = pd.DataFrame(values, columns=header)
+    for path in (FILE_LIST_PATH, DEFAULT_FILE_LIST_PATH):
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                return [line.strip() for line in f if line.strip()]
+    return []
+
+
+def parse_metadata(content):
+    """
+    Parse the CHMI station metadata (meta1.json): one row per station location and validity period.
+
+    :param content: Body of the metadata file.
+    :return: DataFrame with STATION_COLUMNS.
+    """
+    data = json.loads(content)['data']['data']
+    loc_df = pd.DataFrame(data['values'], columns=data['header'].split(','))
     loc_df = loc_df[['WSI', 'BEGIN_DATE', 'END_DATE', 'GEOGR1', 'GEOGR2']].rename(
         columns={
-            'WSI': 'wsi',
+            'WSI': 'station',
             'BEGIN_DATE': 'begin_date',
             'END_DATE': 'end_date',
             'GEOGR1': 'lon',
@@ -119,143 +101,202 @@ def process_metadata(meta_loc_data):
         }
     )
 
+    # Open-ended periods (year 3999) are capped to the last date pandas can represent
     for date_col in ['begin_date', 'end_date']:
-        loc_df[date_col] = pd.to_datetime(
-            loc_df[date_col].where(~loc_df[date_col].str.contains('3999'), '2262-01-01T00:00:00Z')
-        )
-
-    return loc_df
-
-
-async def process_file(filepath, loc_df):
-    """Extract and merge raw data from a single file"""
-    start_time = time.time()
+        dates = loc_df[date_col].where(~loc_df[date_col].str.contains('3999'), '2262-01-01T00:00:00Z')
+        loc_df[date_col] = pd.to_datetime(dates, utc=True).dt.tz_localize(None)
+    loc_df[['lat', 'lon']] = loc_df[['lat', 'lon']].apply(pd.to_numeric, errors='coerce')
+    return loc_df[STATION_COLUMNS]
+
+
+def parse_station_file(content):
+    """
+    Parse a CHMI daily data file into daily values: precipitation (SRA) is summed and temperature (T) averaged.
+
+    :param content: Body of the JSON file.
+    :return: DataFrame with 'date' and one column per element, sorted by date.
+    """
+    data = json.loads(content)['data']['data']
+    if not data['values']:
+        return _empty_values()
+    df = pd.DataFrame(data['values'], columns=data['header'].split(','))
+    df = df.loc[df['ELEMENT'].isin(ELEMENTS), ['ELEMENT', 'DT', 'VAL']]
+    df['date'] = pd.to_datetime(df['DT'], utc=True, errors='coerce').dt.tz_localize(None).dt.normalize()
+    df['VAL'] = pd.to_numeric(df['VAL'], errors='coerce')
+    df = df.dropna(subset=['date', 'VAL'])
+    if df.empty:
+        return _empty_values()
+
+    daily = df.groupby(['date', 'ELEMENT'])['VAL'].agg(['sum', 'mean']).reset_index()
+    daily['VAL'] = daily['sum'].where(daily['ELEMENT'] == 'SRA', daily['mean'])
+    daily = daily.pivot(index='date', columns='ELEMENT', values='VAL').reindex(columns=ELEMENTS)
+    return daily.rename_axis(columns=None).reset_index().astype({element: 'float64' for element in ELEMENTS})
+
+
+def read_manifest(store_dir=STORE_DIR):
+    """
+    Read the manifest of the ingested files.
+
+    :return: Dict {file name: SHA-256 of the content ingested}, empty if nothing has been ingested.
+    """
     try:
-        data = await load_json(filepath)
-        header = data['data']['data']['header'].split(',')
-        values = data['data']['data']['values']
-
-        if not values:
-            print(f"Skipping {filepath.name}: No data values found")
-            return pd.DataFrame(columns=['station', 'element', 'dt', 'val', 'lat', 'lon'])
-
-        df = pd.DataFrame(values, columns=header)
-        df = df.rename(columns={
-            'STATION': 'station',
-            'ELEMENT': 'element',
-            'DT': 'dt',
-            'VAL': 'val'
-        })[['station', 'element', 'dt', 'val']]
-
-        if df.empty or df[['station', 'element', 'dt', 'val']].replace('', pd.NA).isna().all().all():
-            print(f"Skipping {filepath.name}: All columns empty or NA")
-            return pd.DataFrame(columns=['station', 'element', 'dt', 'val', 'lat', 'lon'])
-
-        df = df[df['element'].isin(['SRA', 'T'])]
-        if df.empty:
-            print(f"Skipping {filepath.name}: No 'SRA' or 'T' elements found")
-            return pd.DataFrame(columns=['station', 'element', 'dt', 'val', 'lat', 'lon'])
-
-        df['dt'] = pd.to_datetime(df['dt'], errors='coerce')
-        df['dt'] = df['dt'].where(df['dt'].dt.year <= datetime.now().year, pd.to_datetime(CURRENT_DATE))
-        df['val'] = pd.to_numeric(df['val'], errors='coerce')
-
-        # Merge with location data immediately
-        merged_df = (df.merge(loc_df, left_on='station', right_on='wsi', how='left')
-                     .query('dt >= begin_date and dt <= end_date')
-                     .drop(['wsi', 'begin_date', 'end_date'], axis=1))
-
-        print(f"Processed: {filepath.name} in {time.time() - start_time:.2f}s (Rows: {len(merged_df)})")
-        return merged_df
-
-    except Exception as e:
-        print(f"Error processing {filepath.name}: {e}")
-        return pd.DataFrame(columns=['station', 'element', 'dt', 'val', 'lat', 'lon'])
-
-
-async def process_batch(files, loc_df):
-    """Process batch of files and collect raw data"""
-    semaphore = asyncio.Semaphore(5)
-    async with semaphore:
-        start_time = time.time()
-        total_files = len(files)
-        batch_dfs = []
-        tasks = [process_file(f, loc_df) for f in files]
-        for i, task in enumerate(asyncio.as_completed(tasks), 1):
-            df = await task
-            if not df.empty and not df.isna().all().all():
-                batch_dfs.append(df)
-            print(f"Batch progress: {i}/{total_files} (Collected rows: {sum(len(d) for d in batch_dfs)})")
-        batch_df = pd.concat(batch_dfs, ignore_index=True) if batch_dfs else pd.DataFrame(
-            columns=['station', 'element', 'dt', 'val', 'lat', 'lon'])
-        print(f"Batch completed in {time.time() - start_time:.2f}s (Total rows: {len(batch_df)})")
-    return batch_df
-
-
-async def read_data(metadata_loc_file, max_files=None):
-    """Main execution function with single final pivot and aggregation"""
-    start_time = time.time()
-    meta_loc = await load_json(metadata_loc_file)
-    loc_df = process_metadata(meta_loc)
-    print(f"Metadata processed in {time.time() - start_time:.2f}s")
-
-    json_files = await fetch_json_files()
-
-    if max_files is not None:
-        json_files = json_files[:max_files]
-        print(f"Limited to {len(json_files)} files for testing.")
-
-    await download_missing_files(json_files)
-
-    filepaths = [DOWNLOAD_DIR / f for f in json_files]
-    batches = [filepaths[i:i + BATCH_SIZE] for i in range(0, len(filepaths), BATCH_SIZE)]
-
-    print(f"Total batches to process: {len(batches)}")
-    all_dfs = []
-    for i, batch in enumerate(batches):
-        batch_start = time.time()
-        batch_df = await process_batch(batch, loc_df)
-        if not batch_df.empty:
-            all_dfs.append(batch_df)
-        print(
-            f"Completed batch {i + 1}/{len(batches)} in {time.time() - batch_start:.2f}s (Cumulative time: {time.time() - start_time:.2f}s)")
-
-    # Merge all data once
-    merge_start = time.time()
-    merged_df = pd.concat(all_dfs, ignore_index=True) if all_dfs else pd.DataFrame(
-        columns=['station', 'element', 'dt', 'val', 'lat', 'lon'])
-    print(f"Merged all data in {time.time() - merge_start:.2f}s (Rows: {len(merged_df)})")
-
-    # Single pivot and aggregation
-    if not merged_df.empty:
-        pivot_start = time.time()
-        result = (merged_df.pivot(index=['station', 'dt', 'lat', 'lon'],
-                                  columns='element',
-                                  values='val')
-                  .reset_index()
-                  .rename(columns={'SRA': 'precipitation [mm]', 'T': 'temperature [°c]'}))
-        print(f"Final pivot took {time.time() - pivot_start:.2f}s")
-
-        for col in FINAL_COLS[4:]:
-            if col not in result:
-                result[col] = pd.NA
-
-        result['date'] = result['dt'].dt.date
-        agg_start = time.time()
-        final_df = (result.groupby(['station', 'date', 'lat', 'lon'], observed=True)
-        .agg({'precipitation [mm]': 'sum', 'temperature [°c]': 'mean'})
-        .reset_index()
-        .rename(columns={'station': 'station_ID'})[FINAL_COLS])
-        print(f"Final aggregation took {time.time() - agg_start:.2f}s")
-    else:
-        final_df = pd.DataFrame(columns=FINAL_COLS)
-
-    print(f"Final shape: {final_df.shape}")
-    print(f"Total processing time: {time.time() - start_time:.2f}s")
-    final_df.to_csv('CHMI_merged_data.csv', index=False)
-    return final_df
-
-
-if __name__ == "__main__":
-    final_df = asyncio.run(read_data('meta1.json'))
-    print(final_df.head())
+        with open(os.path.join(store_dir, 'ingested.json'), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_manifest(manifest, store_dir=STORE_DIR):
+    """
+    Store the manifest of the ingested files.
+    """
+    atomic_write(os.path.join(store_dir, 'ingested.json'), json.dumps(manifest))
+
+
+def write_stations(stations, store_dir=STORE_DIR):
+    """
+    Store the station metadata.
+    """
+    _write_parquet(stations, os.path.join(store_dir, 'stations.parquet'))
+
+
+def write_values(station, values, store_dir=STORE_DIR):
+    """
+    Store the daily values of a station, sorted by date so that date filters skip whole row groups.
+    Re-ingesting a station replaces its file.
+    """
+    _write_parquet(values.sort_values('date'), _values_path(station, store_dir), row_group_size=ROW_GROUP_SIZE)
+
+
+def read_stations(store_dir=STORE_DIR):
+    """
+    Read the stored station metadata.
+
+    :return: DataFrame with STATION_COLUMNS, or None if CHMI data have not been ingested.
+    """
+    path = os.path.join(store_dir, 'stations.parquet')
+    return pd.read_parquet(path) if os.path.exists(path) else None
+
+
+def read_values(stations, elements, time_range, store_dir=STORE_DIR):
+    """
+    Read the stored daily values of the given stations within a time range.
+
+    Date predicates are pushed down to Parquet, so only the matching row groups are decoded.
+
+    :param stations: Collection of station IDs.
+    :param elements: List of element codes to be read (e.g. ['SRA']).
+    :param time_range: Tuple of the start and end dates (str, YYYY-mm-dd).
+    :param store_dir: Folder holding the store.
+    :return: DataFrame with 'station', 'date' and the element columns.
+    """
+    start, end = pd.Timestamp(time_range[0]), pd.Timestamp(time_range[1])
+    frames = []
+    for station in stations:
+        path = _values_path(station, store_dir)
+        if not os.path.exists(path):
+            continue
+        df = pd.read_parquet(path, columns=['date'] + elements, filters=[('date', '>=', start), ('date', '<=', end)])
+        frames.append(df.assign(station=station))
+    if not frames:
+        return pd.DataFrame(columns=['station', 'date'] + elements)
+    return pd.concat(frames, ignore_index=True)[['station', 'date'] + elements]
+
+
+async def ingest(max_files=None, store_dir=STORE_DIR, full=False):
+    """
+    Convert the CHMI daily JSON archive into the local columnar store (one file of daily values per station).
+
+    Files are downloaded through the local mirror (conditional requests) and parsed in the shared process pool.
+    Re-ingesting is incremental: files whose content has not changed since they were ingested (see
+    `read_manifest`) are skipped, so running the ingest regularly keeps the store up to date at a low cost.
+
+    :param max_files: Optional limit on the number of files ingested (for testing).
+    :param store_dir: Folder holding the store.
+    :param full: If True, all files are parsed and written again.
+    :return: List of the stations written.
+    """
+    limits = httpx.Limits(max_connections=MAX_CONCURRENT_DOWNLOADS, max_keepalive_connections=MAX_CONCURRENT_DOWNLOADS)
+    async with httpx.AsyncClient(timeout=TIMEOUT, limits=limits) as client:
+        metadata = await cached_get(client, METADATA_URL, MIRROR_DIR)
+        if metadata is None:
+            print("CHMI station metadata could not be downloaded.")
+            return []
+        stations = await run_in_process(parse_metadata, metadata)
+        await asyncio.to_thread(write_stations, stations, store_dir)
+
+        json_files = await fetch_json_files(client)
+        if max_files is not None:
+            json_files = json_files[:max_files]
+
+        manifest = await asyncio.to_thread(read_manifest, store_dir)
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_DOWNLOADS)
+
+        async def ingest_file(file_name):
+            content = await cached_get(client, BASE_URL + file_name, MIRROR_DIR, semaphore=semaphore)
+            if content is None:
+                raise httpx.HTTPError(f"{file_name} could not be downloaded")
+            digest = hashlib.sha256(content).hexdigest()
+            if not full and manifest.get(file_name) == digest and os.path.exists(
+                    _values_path(station_id(file_name), store_dir)):
+                return None
+            values = await run_in_process(parse_station_file, content)
+            await asyncio.to_thread(write_values, station_id(file_name), values, store_dir)
+            return digest
+
+        results = await asyncio.gather(*[ingest_file(file_name) for file_name in json_files], return_exceptions=True)
+
+    written = []
+    for file_name, result in zip(json_files, results):
+        if isinstance(result, Exception):
+            print(f"Error ingesting {file_name}: {result}")
+            continue
+        if result is not None:
+            manifest[file_name] = result
+            written.append(station_id(file_name))
+    await asyncio.to_thread(write_manifest, manifest, store_dir)
+    print(f"CHMI: {len(written)}/{len(json_files)} stations ingested, the others are unchanged or failed")
+    return written
+
+
+async def read_data(spatial_range, time_range, data_range, level):
+    """
+    Read daily CHMI meteorological data from the local columnar store (see `chmi_ingest.py`).
+
+    :param spatial_range: A tuple containing the spatial range (N, S, E, W) defining the bounding box.
+    :param time_range: A tuple containing the start and end dates (str, YYYY-mm-dd).
+    :param data_range: A list of data categories requested (e.g., ['precipitation']).
+    :param level: S2Cell level.
+    :return: A pandas DataFrame indexed by date, with (parameter, S2CELL) columns.
+    """
+    stations = await asyncio.to_thread(read_stations, STORE_DIR)
+    if stations is None:
+        warnings.warn("CHMI data have not been ingested, run API_readers/CHMI_Meteo/chmi_ingest.py first.")
+        return None
+
+    # Station locations within the bounding box
+    selected = StationRegistry(stations).select(spatial_range, level)
+    if selected is None:
+        return None
+
+    data_requested = [k for k, v in DATA_ALIASES.items() if v in data_range]
+    values = await asyncio.to_thread(read_values, selected['station'].unique(), data_requested, time_range,
+                                    STORE_DIR)
+
+    # Keep the location of each station valid at the date of the record
+    df = values.merge(selected[['station', 'begin_date', 'end_date', 'S2CELL']], on='station')
+    df = df[(df['date'] >= df['begin_date']) & (df['date'] <= df['end_date'])]
+    df = df.dropna(subset=data_requested, how='all')
+    if df.empty:
+        warnings.warn("No data found for the selected stations.")
+        return None
+
+    # Average overlapping
+    df = df.assign(Timestamp=df['date'].dt.date)
+    grouped = df.groupby(['S2CELL', 'Timestamp'])
+    if (grouped.size() > 1).any():
+        warnings.warn("Some data were aggregated")
+    df = grouped[data_requested].mean()
+
+    df = df.rename(GLOBAL_MAPPING, axis=1)
+    return df.pivot_table(index='Timestamp', columns='S2CELL')
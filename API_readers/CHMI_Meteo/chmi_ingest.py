@@ -0,0 +1,11 @@
+import argparse
+import asyncio
+from API_readers.CHMI_Meteo.CHMI_meteo import ingest
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest the CHMI daily JSON archive into the local columnar store.")
+    parser.add_argument('--max-files', type=int, default=None, help="Limit the number of files (for testing).")
+    parser.add_argument('--full', action='store_true', help="Ingest all files again, changed or not.")
+    args = parser.parse_args()
+
+    asyncio.run(ingest(args.max_files, full=args.full))
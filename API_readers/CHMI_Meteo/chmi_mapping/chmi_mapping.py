@@ -0,0 +1,11 @@
+# aliases for the data fields (CHMI element codes)
+DATA_ALIASES = {
+    'T': 'temperature',
+    'SRA': 'precipitation'
+}
+
+# global mapping of element codes to descriptions and units
+GLOBAL_MAPPING = {
+    'T': "Temperature [°C]",
+    'SRA': "Precipitation total [mm]",
+}
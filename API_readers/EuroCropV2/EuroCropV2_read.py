@@ -1,4 +1,6 @@
+import asyncio
 import os
+import warnings
 import pandas as pd
 from typing import Tuple, List
 
@@ -6,6 +8,10 @@ from API_readers.EuroCropV2.utils.extractors import extract_data_by_bbox, extrac
 from API_readers.EuroCropV2.utils.preparation import data_agregation, data_melting
 from API_readers.EuroCropV2.mappings.EuroCropV2_mappings import GLOBAL_MAPPING
 
+DATA_DIR = os.path.join(os.getcwd(), "API_readers", "EuroCropV2", "data")
+CSV_PATH = os.path.join(DATA_DIR, "points.csv")
+PARQUET_PATH = os.path.join(DATA_DIR, "points.parquet")
+
 async def read_data(
     spatial_range: Tuple[float, float, float, float],
     time_range: Tuple[str, str],
@@ -16,11 +22,12 @@ async def read_data(
     Read, filter, and transform EuroCropV2 data into a time-series format.
 
     This function executes a full data processing pipeline:
-    1. Loads raw data from a CSV file.
-    2. Filters data within a spatial bounding box.
-    3. Selects columns corresponding to a given time range.
-    4. Aggregates data into S2 cells.
-    5. Transforms yearly data into a daily time series.
+    1. Queries the points within a spatial bounding box, reading only the
+       columns of the given time range (sorted Parquet file, or the raw CSV file
+       if it has not been converted).
+    2. Keeps the columns corresponding to the time range.
+    3. Aggregates data into S2 cells.
+    4. Transforms yearly data into a daily time series.
 
     Parameters
     ----------
@@ -48,15 +55,13 @@ async def read_data(
     - `data_range` is currently unused but kept for API compatibility.
     """
 
-    data_path = os.path.join(
-        os.getcwd(),
-        "API_readers",
-        "EuroCropV2",
-        "data",
-        "points.csv",
-    )
+    data_path = PARQUET_PATH
+    if not os.path.exists(data_path):
+        warnings.warn("EuroCropV2 points have not been converted to Parquet, "
+                      "run API_readers/EuroCropV2/utils/conversion.py; reading the CSV file.")
+        data_path = CSV_PATH
 
-    extracted_data = extract_data_by_bbox(data_path, spatial_range)
+    extracted_data = await asyncio.to_thread(extract_data_by_bbox, data_path, spatial_range, time_range)
 
     if extracted_data.empty:
         return pd.DataFrame()
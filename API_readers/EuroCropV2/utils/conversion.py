@@ -0,0 +1,68 @@
+import argparse
+import os
+import shutil
+import tempfile
+import duckdb
+from utils.atomic_write import atomic_path
+from utils.station_registry import leaf_cells
+
+# Rows per Parquet row group; rows are sorted by S2Cell, so a row group covers a compact area
+ROW_GROUP_SIZE = 100_000
+BATCH_SIZE = 1_000_000
+
+
+def quote_path(path: str) -> str:
+    """
+    Quote a file path as a SQL string literal.
+    """
+    return "'" + path.replace("'", "''") + "'"
+
+
+def convert_points(csv_path: str, parquet_path: str, batch_size: int = BATCH_SIZE) -> None:
+    """
+    Convert the EuroCropV2 points CSV file into a Parquet file sorted by S2Cell (one-time conversion).
+
+    Each point gets its leaf S2Cell ID ('s2' column); the S2Cell of any level is derived from it with
+    `parent_cells`. Rows are sorted by this ID, which follows the S2 (Hilbert) curve, so that bounding box
+    filters on 'lat' and 'lon' skip the row groups lying outside the box.
+
+    Parameters
+    ----------
+    csv_path : str
+        Path to the input CSV file (with 'lat' and 'lon' columns).
+    parquet_path : str
+        Path to the output Parquet file; it is replaced once the conversion is complete.
+    batch_size : int
+        Number of rows converted at once.
+    """
+    os.makedirs(os.path.dirname(parquet_path) or '.', exist_ok=True)
+    staging_dir = tempfile.mkdtemp(dir=os.path.dirname(parquet_path) or '.',
+                                   prefix=f".{os.path.basename(parquet_path)}.", suffix='.staging')
+    try:
+        with duckdb.connect() as con:
+            reader = con.execute(f"SELECT * FROM read_csv({quote_path(csv_path)})").fetch_record_batch(batch_size)
+            for i, batch in enumerate(reader):
+                df = batch.to_pandas()
+                # Same precision as prepare_coordinates, so that both give the same selections and cells
+                df["lat"] = df["lat"].astype("float32")
+                df["lon"] = df["lon"].astype("float32")
+                df["s2"] = leaf_cells(df["lat"].to_numpy(dtype="float64"), df["lon"].to_numpy(dtype="float64"))
+                df.to_parquet(os.path.join(staging_dir, f"part-{i}.parquet"), index=False)
+
+            with atomic_path(parquet_path) as temp_path:
+                con.execute(f"""
+                    COPY (SELECT * FROM read_parquet({quote_path(os.path.join(staging_dir, '*.parquet'))}) ORDER BY s2)
+                    TO {quote_path(temp_path)} (FORMAT PARQUET, ROW_GROUP_SIZE {int(ROW_GROUP_SIZE)})
+                """)
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    data_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), "data")
+    parser = argparse.ArgumentParser(description="Convert the EuroCropV2 points CSV file into a sorted Parquet file.")
+    parser.add_argument("--csv", default=os.path.join(data_dir, "points.csv"), help="Input CSV file.")
+    parser.add_argument("--parquet", default=os.path.join(data_dir, "points.parquet"), help="Output Parquet file.")
+    args = parser.parse_args()
+
+    convert_points(args.csv, args.parquet)
@@ -1,24 +1,75 @@
+import hashlib
+import threading
 import pandas as pd
 import duckdb
+from API_readers.EuroCropV2.utils.conversion import quote_path
 
+# Coordinates and leaf S2Cell ID of the points
+BASE_COLUMNS = ["lon", "lat", "s2"]
 
-def extract_data_by_bbox(path:str, spatial_range:tuple) -> pd.DataFrame:
+
+# DuckDB connection kept for the process, with one view per points file
+_CONNECTION = None
+_VIEWS = {}
+_LOCK = threading.Lock()
+
+
+def get_connection() -> duckdb.DuckDBPyConnection:
+    """
+    Get the DuckDB connection shared by the requests of this process (created on first use).
+    """
+    global _CONNECTION
+    with _LOCK:
+        if _CONNECTION is None:
+            _CONNECTION = duckdb.connect()
+    return _CONNECTION
+
+
+def points_view(path: str) -> str:
+    """
+    Get the name of the view over a points file (Parquet or CSV), created once per file.
+
+    Parameters
+    ----------
+    path : str
+        Path to the points file.
+
+    Returns
+    -------
+    str
+        Name of the view.
+    """
+    con = get_connection()
+    with _LOCK:
+        view = _VIEWS.get(path)
+        if view is None:
+            view = "points_" + hashlib.sha1(path.encode("utf-8")).hexdigest()[:16]
+            reader = "read_parquet" if path.endswith(".parquet") else "read_csv"
+            con.execute(f"CREATE OR REPLACE VIEW {view} AS SELECT * FROM {reader}({quote_path(path)})")
+            _VIEWS[path] = view
+    return view
+
+
+def extract_data_by_bbox(path: str, spatial_range: tuple, time_range: tuple = None) -> pd.DataFrame:
     """
-    Extract data from a CSV file within a given geographic bounding box.
+    Extract data from a points file within a given geographic bounding box.
 
-    The function uses DuckDB to efficiently query a CSV file and filter rows
-    based on latitude and longitude constraints.
+    The function queries the file through a view of the shared DuckDB connection with a parameterized
+    query. With the sorted Parquet file (see `conversion.py`), the row groups outside the bounding box
+    are skipped.
 
     Parameters
     ----------
     path : str
-        Path to the input CSV file.
+        Path to the input Parquet or CSV file.
     spatial_range : tuple of float
         Bounding box defined as (N, S, E, W), where:
         - N : North latitude (max latitude)
         - S : South latitude (min latitude)
         - E : East longitude (max longitude)
         - W : West longitude (min longitude)
+    time_range : tuple of str, optional
+        If given, only the columns of the years in the range are read (see `extract_years`).
 
     Returns
     -------
@@ -27,24 +78,53 @@ def extract_data_by_bbox(path:str, spatial_range:tuple) -> pd.DataFrame:
 
     Notes
     -----
-    - This function assumes the CSV file contains 'lat' and 'lon' columns.
+    - This function assumes the file contains 'lat' and 'lon' columns.
     - DuckDB is used for performance when working with large files.
     """
 
     north, south, east, west = spatial_range
+    view = points_view(path)
 
-    with duckdb.connect() as con:
+    with get_connection().cursor() as cursor:
+        columns = [row[0] for row in cursor.execute(f"DESCRIBE {view}").fetchall()]
+        if time_range is not None:
+            columns = select_columns(columns, time_range)
+        selection = ", ".join('"' + col.replace('"', '""') + '"' for col in columns)
         query = f"""
-        SELECT *
-        FROM read_csv('{path}')
-        WHERE lat BETWEEN {south} AND {north}
-          AND lon BETWEEN {west} AND {east}
+        SELECT {selection}
+        FROM {view}
+        WHERE lat BETWEEN ? AND ?
+          AND lon BETWEEN ? AND ?
         """
-        result = con.execute(query).df()
+        result = cursor.execute(query, [south, north, west, east]).df()
 
     return result
 
 
+def select_columns(columns: list, time_range: tuple) -> list:
+    """
+    Select the coordinate columns, the S2Cell column (if any) and the columns of the years in a range.
+
+    Parameters
+    ----------
+    columns : list of str
+        Column names.
+    time_range : tuple of str
+        Tuple specifying the time range (start, end), e.g. ("2018-01-01", "2022-12-31").
+
+    Returns
+    -------
+    list of str
+        Selected column names.
+    """
+
+    year_from, year_to = (int(t[:4]) for t in time_range)
+    years = tuple(str(year) for year in range(year_from, year_to + 1))
+
+    base_cols = [col for col in BASE_COLUMNS if col in columns]
+    return base_cols + [col for col in columns if col not in BASE_COLUMNS and col.endswith(years)]
+
+
 def extract_years(df: pd.DataFrame, time_range:tuple) -> pd.DataFrame:
     """
     Extract columns corresponding to a given year range from a DataFrame.
@@ -65,7 +145,7 @@ def extract_years(df: pd.DataFrame, time_range:tuple) -> pd.DataFrame:
     -------
     pd.DataFrame
         Filtered DataFrame containing:
-        - 'lon', 'lat'
+        - 'lon', 'lat' (and 's2' if present)
         - columns matching the selected year range
 
     Notes
@@ -74,14 +154,7 @@ def extract_years(df: pd.DataFrame, time_range:tuple) -> pd.DataFrame:
     - All None values are converted to NaN for compatibility with numeric operations.
     """
 
-    base_cols = ["lon", "lat"]
-
-    year_from, year_to = (int(t[:4]) for t in time_range)
-    years = tuple(str(year) for year in range(year_from, year_to + 1))
-
-    year_cols = [col for col in df.columns if col.endswith(years)]
-
-    result = df[base_cols + year_cols].copy()
+    result = df[select_columns(list(df.columns), time_range)].copy()
 
     # Ensure missing values are represented as NaN instead of None
     result = result.replace({None: float("nan")})
@@ -1,13 +1,16 @@
 import pandas as pd
 from utils.coordinates_to_cells import prepare_coordinates
+from utils.station_registry import parent_cells, to_cell_ids
+from utils.categorical import mode_by_group
 
 def data_agregation(extracted_data, spatial_range, level):
     """
     Aggregate spatial data into S2 cells and compute representative values.
 
     The function maps coordinates to S2 cells and aggregates data per cell
-    using the statistical mode (most frequent value). If no mode is found,
-    None is returned for that group.
+    using the statistical mode (most frequent value), computed for all cells
+    at once with `mode_by_group`. If no mode is found, NaN is returned for
+    that group.
 
     Parameters
     ----------
@@ -26,16 +29,18 @@ def data_agregation(extracted_data, spatial_range, level):
 
     Notes
     -----
-    - Uses `prepare_coordinates` to assign S2 cell identifiers.
+    - S2 cells are derived from the precomputed leaf cell IDs ('s2' column) when
+      present, otherwise `prepare_coordinates` assigns them.
     - Mode is used instead of mean to preserve categorical or discrete data.
     """
 
-    df = prepare_coordinates(extracted_data, spatial_range, level)
-    df = (
-        df.set_index("S2CELL")
-        .groupby(level=0)
-        .agg(lambda x: x.mode().iloc[0] if not x.mode().empty else None)
-    )
+    if "s2" in extracted_data.columns:
+        # Cells derived from the leaf S2Cell IDs precomputed by the conversion
+        df = extracted_data.drop(columns="s2")
+        df["S2CELL"] = to_cell_ids(parent_cells(extracted_data["s2"].to_numpy(dtype="uint64"), level))
+    else:
+        df = prepare_coordinates(extracted_data, spatial_range, level)
+    df = mode_by_group(df, "S2CELL")
 
     return df
 
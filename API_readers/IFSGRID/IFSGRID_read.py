@@ -1,12 +1,16 @@
+import os
+import warnings
 import pandas as pd
-from API_readers.IFSGRID.utils.extraction import stack_values
+from API_readers.IFSGRID.utils.build import STORE_PATH
+from API_readers.IFSGRID.utils.extraction import stack_values, read_store
 from API_readers.IFSGRID.utils.preparation import (
     check_overlap, 
     build_bbox, 
     aggregate_spatial, 
+    aggregate_cells,
     expand_time_dimension
 )
-from API_readers.IFSGRID.mappings.IFSGRID_mappings import GLOBAL_MAPPING
+from API_readers.IFSGRID.mappings.IFSGRID_mappings import DATA_ALIASES, GLOBAL_MAPPING
 async def read_data(
         spatial_range:tuple, time_range:tuple, data_range:list, level:int
     ):
@@ -41,13 +45,24 @@ async def read_data(
     if start_date is None:
         return None
     
-    bbox_geom = build_bbox(spatial_range)
-    factors_data = stack_values(data_range, bbox_geom)
+    if os.path.exists(STORE_PATH):
+        codes = [code for code, factor in DATA_ALIASES.items() if factor in data_range]
+        factors_data = read_store(STORE_PATH, spatial_range, codes)
 
-    if factors_data.empty:
-        return None
-    
-    aggregated_df = aggregate_spatial(factors_data, spatial_range, level)
+        if factors_data.empty:
+            return None
+
+        aggregated_df = aggregate_cells(factors_data, level)
+    else:
+        warnings.warn("The IFSGRID table has not been built, run `python -m API_readers.IFSGRID.utils.build`; "
+                      "reading the shapefiles.")
+        bbox_geom = build_bbox(spatial_range)
+        factors_data = stack_values(data_range, bbox_geom)
+
+        if factors_data.empty:
+            return None
+
+        aggregated_df = aggregate_spatial(factors_data, spatial_range, level)
     final_df = expand_time_dimension(aggregated_df, start_date, end_date)
 
     final_df.columns = pd.MultiIndex.from_tuples(
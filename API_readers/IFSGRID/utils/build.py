@@ -0,0 +1,111 @@
+import os
+import geopandas as gpd
+import pandas as pd
+from API_readers.IFSGRID.mappings.IFSGRID_mappings import DATA_ALIASES
+from API_readers.IFSGRID.utils.extraction import factor_mapping_extractor
+from utils.atomic_write import atomic_path
+from utils.station_registry import leaf_cells
+
+STORE_PATH = os.path.join('API_readers', 'IFSGRID', 'data', 'ifsgrid.parquet')
+# Rows per Parquet row group; rows are sorted by S2Cell, so a row group covers a compact area
+ROW_GROUP_SIZE = 100_000
+# Equal-area projection of Europe used to compute the centroids
+CENTROID_EPSG = 3035
+
+
+def layer_files() -> dict:
+    """
+    Group the codes of DATA_ALIASES by the shapefile holding them.
+
+    Returns
+    -------
+    dict
+        Dictionary mapping shapefile paths to lists of feature codes.
+    """
+    files = {}
+    for factor in dict.fromkeys(DATA_ALIASES.values()):
+        for code, path in factor_mapping_extractor(factor).items():
+            files.setdefault(path, []).append(code)
+    return files
+
+
+def extract_layer(shp_path: str, codes: list) -> pd.DataFrame:
+    """
+    Extract the centroids and values of all geometries of a shapefile.
+
+    Parameters
+    ----------
+    shp_path : str
+        Path to the input shapefile.
+    codes : list of str
+        Attribute columns to extract.
+
+    Returns
+    -------
+    pd.DataFrame
+        Long DataFrame with 'lat', 'lon' (centroids in EPSG:4326), 's2'
+        (leaf S2Cell ID of the centroid), 'code' and 'value' columns.
+    """
+    gdf = gpd.read_file(shp_path)
+    if gdf.crs is None:
+        raise ValueError("Input data has no CRS defined.")
+
+    centroids = gdf.geometry.to_crs(epsg=CENTROID_EPSG).centroid.to_crs(epsg=4326)
+    # Same precision as prepare_coordinates, so that both give the same selections and cells
+    lat = centroids.y.to_numpy(dtype="float32")
+    lon = centroids.x.to_numpy(dtype="float32")
+    s2 = leaf_cells(lat.astype("float64"), lon.astype("float64"))
+
+    frames = []
+    for code in codes:
+        if code not in gdf.columns:
+            print(shp_path, f"Column '{code}' not found in dataset.")
+            continue
+        frames.append(pd.DataFrame({
+            "lat": lat,
+            "lon": lon,
+            "s2": s2,
+            "code": code,
+            "value": pd.to_numeric(gdf[code], errors="coerce").to_numpy(),
+        }))
+    if not frames:
+        return pd.DataFrame(columns=["lat", "lon", "s2", "code", "value"])
+    return pd.concat(frames, ignore_index=True)
+
+
+def build_store(store_path: str = STORE_PATH) -> None:
+    """
+    Build the indexed IFSGRID table from the shapefiles (offline step).
+
+    Each shapefile is read once. The centroids and values of all its
+    layers are stored in a single Parquet file with the leaf S2Cell ID of
+    each centroid ('s2'), from which the S2Cell of any level is derived with
+    `parent_cells`. Rows are sorted by this ID, so bounding box filters on
+    'lat' and 'lon' skip the row groups lying outside the box.
+
+    Parameters
+    ----------
+    store_path : str
+        Path to the output Parquet file; it is replaced once the build is
+        complete.
+    """
+    frames = []
+    for shp_path, codes in layer_files().items():
+        try:
+            layer = extract_layer(shp_path, codes)
+        except Exception as e:
+            print(shp_path, e)
+            continue
+        if not layer.empty:
+            frames.append(layer)
+
+    df = pd.concat(frames, ignore_index=True).dropna(subset=["lat", "lon", "value"])
+    df["code"] = df["code"].astype("category")
+    df = df.sort_values(["s2", "code"], ignore_index=True)
+
+    with atomic_path(store_path) as temp_path:
+        df.to_parquet(temp_path, index=False, row_group_size=ROW_GROUP_SIZE)
+
+
+if __name__ == "__main__":
+    build_store()
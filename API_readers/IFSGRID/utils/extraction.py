@@ -138,4 +138,42 @@ def stack_values(data_range:list, bbox:Polygon) -> pd.DataFrame:
     if factor_data_frame.empty:
         return pd.DataFrame()
     else: 
-        return factor_data_frame
\ No newline at end of file
+        return factor_data_frame
+
+
+def read_store(
+    store_path: str,
+    spatial_range: tuple,
+    codes: list
+) -> pd.DataFrame:
+    """
+    Read the values of the given codes whose centroids lie within a
+    bounding box from the indexed IFSGRID table (see `build.py`).
+
+    Parameters
+    ----------
+    store_path : str
+        Path to the Parquet table.
+    spatial_range : tuple of float (north, south, east, west)
+        Geographic extent in EPSG:4326 coordinate system.
+    codes : list of str
+        Feature codes to read.
+
+    Returns
+    -------
+    pd.DataFrame
+        Long DataFrame with 'lat', 'lon', 's2', 'code' and 'value' columns.
+
+    Notes
+    -----
+    - The bounding box and codes are pushed down to Parquet, so row groups
+      outside of the box are skipped.
+    """
+    north, south, east, west = spatial_range
+    filters = [
+        ("lat", ">=", south), ("lat", "<=", north),
+        ("lon", ">=", west), ("lon", "<=", east),
+        ("code", "in", list(codes)),
+    ]
+    return pd.read_parquet(store_path, filters=filters)
+
@@ -2,6 +2,7 @@ from datetime import datetime, date
 from shapely.geometry import box, Polygon
 import pandas as pd
 from utils.coordinates_to_cells import prepare_coordinates
+from utils.station_registry import parent_cells, to_cell_ids
 
 def check_overlap(period:tuple) -> tuple:
     """
@@ -86,6 +87,39 @@ def aggregate_spatial(
     return df
 
 
+def aggregate_cells(df:pd.DataFrame, level:int) -> pd.DataFrame:
+    """
+    Aggregate the long IFSGRID table into S2 cells at a given level.
+
+    Cells are derived from the precomputed leaf S2Cell IDs, and values are
+    joined on cell ID rather than on floating-point coordinates.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Long DataFrame with 's2', 'code' and 'value' columns.
+    level : int
+        S2 cell resolution level.
+
+    Returns
+    -------
+    pd.DataFrame
+        DataFrame with an S2CELL column and the mean value of each code
+        computed per cell.
+    """
+    cells = parent_cells(df["s2"].to_numpy(dtype="uint64"), level)
+    df = (
+        df.assign(S2CELL=cells, code=df["code"].astype(str))
+          .groupby(["S2CELL", "code"])["value"]
+          .mean()
+          .unstack("code")
+          .rename_axis(columns=None)
+          .reset_index()
+    )
+    df["S2CELL"] = to_cell_ids(df["S2CELL"].to_numpy(dtype="uint64"))
+    return df
+
+
 def expand_time_dimension(
         df:pd.DataFrame, start_date:datetime.date, end_date:datetime.date
     ) -> pd.DataFrame:
@@ -1,44 +1,121 @@
+import asyncio
+import json
 import logging
-from io import StringIO
+import os
+import time
+from io import BytesIO
 from urllib.parse import urljoin
 import httpx
 import pandas as pd
 from bs4 import BeautifulSoup
 from tqdm.asyncio import tqdm as async_tqdm
 from API_readers.UA_sw_quality.UA_sw_quality_mappings.UA_sw_quality_mapping import new_headers, DATA_ALIASES
-from utils.coordinates_to_cells import prepare_coordinates
+from utils.atomic_write import atomic_write
+from utils.download_cache import cached_get
+from utils.process_pool import run_in_process
+from utils.station_registry import StationRegistry
 
 
 base_url = 'https://data.gov.ua/dataset/surface-water-monitoring'
+CACHE_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'cache')
+CATALOG_TTL = 24 * 3600  # seconds
+MAX_CONCURRENT_DOWNLOADS = 4
 
 
-async def download_file_content(client, base_url):
+def _catalog_path():
+    return os.path.join(CACHE_DIR, 'catalog.json')
+
+
+def read_catalog():
+    """
+    Read the cached list of CSV links, if it is younger than CATALOG_TTL.
+
+    :return: List of CSV urls, or None if the catalog has to be scraped again.
+    """
+    try:
+        with open(_catalog_path(), 'r', encoding='utf-8') as f:
+            catalog = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if time.time() - catalog['fetched'] > CATALOG_TTL:
+        return None
+    return catalog['links']
+
+
+def write_catalog(links):
+    atomic_write(_catalog_path(), json.dumps({'fetched': time.time(), 'links': links}))
+
+
+async def scrape_catalog(client):
+    """
+    Scrape the links to the CSV files of the dataset page.
+
+    :param client: httpx.AsyncClient used for the request.
+    :return: List of CSV urls.
+    """
     response = await client.get(base_url)
     response.raise_for_status()
-    return response.content
+    soup = BeautifulSoup(response.content, 'html.parser')
 
+    # Find all links to CSV files with class "resource-url-analytics"
+    csv_links = []
+    for link in soup.find_all('a', class_='resource-url-analytics'):
+        href = link.get('href')
+        if href and href.endswith('.csv') and 'output' in href:
+            csv_links.append(urljoin(base_url, href))
+    return csv_links
 
-# Function to clean CSV content
-def load_and_clean_data(csv_content):
-    try:
-        df = pd.read_csv(StringIO(csv_content.decode('UTF-8-SIG')), delimiter=';', encoding='UTF-8-SIG',
-                         on_bad_lines='skip')
-        # drop unnecessary columns (w Ukrainian names)
-        df.drop(df.columns[[1, 2, 3, 4]], axis=1, inplace=True)
 
-        # Convert 'Controle_Date' to datetime format (yyyy-mm-dd)
-        df['Controle_Date'] = pd.to_datetime(df['Controle_Date'], format='%Y-%m-%d', errors='coerce')
+async def get_catalog(client):
+    """
+    Get the links to the CSV files, scraped at most once per CATALOG_TTL.
+    """
+    csv_links = await asyncio.to_thread(read_catalog)
+    if csv_links is None:
+        csv_links = await scrape_catalog(client)
+        await asyncio.to_thread(write_catalog, csv_links)
+    return csv_links
 
-        # Drop any unnamed columns
-        df = df.loc[:, ~df.columns.str.contains('^Unnamed')]
 
-        return df
+# Function to parse and clean CSV content (run in a worker process)
+def load_and_clean_data(csv_content, spatial_range, time_range):
+    """
+    Parse a CSV file from its bytes into the fixed schema of `new_headers`, keeping only the records of the stations
+    inside the bounding box and within the time range.
+
+    :param csv_content: Body of the CSV file.
+    :param spatial_range: Tuple (N, S, E, W) defining the bounding box.
+    :param time_range: Tuple (start, end) of timestamps for filtering.
+    :return: DataFrame with the `new_headers` columns, or None if the file cannot be read.
+    """
+    try:
+        df = pd.read_csv(BytesIO(csv_content), delimiter=';', encoding='UTF-8-SIG', on_bad_lines='skip')
     except Exception as e:
         print(f"Failed to read CSV content: {e}")
         return None
 
+    # drop unnecessary columns (w Ukrainian names) and any unnamed columns
+    df = df.drop(df.columns[[1, 2, 3, 4]], axis=1)
+    df = df.loc[:, ~df.columns.str.contains('^Unnamed')]
+    if len(df.columns) != len(new_headers):
+        print("Warning: Number of columns does not match the number of custom headers.")
+        return None
+    df.columns = new_headers
+
+    # Fixed schema: dates (yyyy-mm-dd) and numbers
+    df['date'] = pd.to_datetime(df['date'], format='%Y-%m-%d', errors='coerce')
+    numeric_columns = [col for col in new_headers if col != 'date']
+    df[numeric_columns] = df[numeric_columns].apply(pd.to_numeric, errors='coerce').astype('float64')
+
+    # Stations inside the bounding box, records within the time range
+    n, s, e, w = spatial_range
+    time_from, time_to = pd.to_datetime(time_range[0]), pd.to_datetime(time_range[1])
+    df = df[(df['lat'] <= n) & (df['lat'] >= s) & (df['lon'] <= e) & (df['lon'] >= w) &
+            (df['date'] >= time_from) & (df['date'] <= time_to)]
+    return df.dropna(how='all', subset=numeric_columns[3:])
+
 
-# Async function to scrape the website, download CSV files, clean them, and return a combined DataFrame
+# Async function to get the catalog and the CSV files, clean them, and return a combined DataFrame
 async def read_data(spatial_range, time_range, data_range, level):
     """
         Read and process SURFACE WATER QUALITY data, filtering by spatial and time ranges, and return a MultiIndex DataFrame.
@@ -50,54 +127,39 @@ async def read_data(spatial_range, time_range, data_range, level):
         :return: DataFrame with MultiIndex ['date', 'S2CELL'] and numeric measurement columns.
         """
     print("DOWNLOADING: Ukrainian surface water quality data")
-    async with httpx.AsyncClient(timeout=30) as client:
-        response = await client.get(base_url)
-        soup = BeautifulSoup(response.content, 'html.parser')
-
-        # Find all links to CSV files with class "resource-url-analytics"
-        csv_links = []
-        for link in soup.find_all('a', class_='resource-url-analytics'):
-            href = link.get('href')
-            if href and href.endswith('.csv') and 'output' in href:
-                csv_links.append(urljoin(base_url, href))
-
-        # Download and clean CSVs concurrently
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_DOWNLOADS)
+    limits = httpx.Limits(max_connections=MAX_CONCURRENT_DOWNLOADS, max_keepalive_connections=MAX_CONCURRENT_DOWNLOADS)
+    async with httpx.AsyncClient(timeout=30, limits=limits, follow_redirects=True) as client:
+        csv_links = await get_catalog(client)
+
+        # Download (conditional requests on the local copies) and parse CSVs concurrently
         all_data = []
 
         async def process_csv(csv_url):
-            csv_content = await download_file_content(client, csv_url)
-            return load_and_clean_data(csv_content)
+            csv_content = await cached_get(client, csv_url, CACHE_DIR, semaphore=semaphore)
+            if csv_content is None:
+                print(f"Failed to download {csv_url}")
+                return None
+            return await run_in_process(load_and_clean_data, csv_content, spatial_range, time_range)
 
         for coro in async_tqdm.as_completed([process_csv(url) for url in csv_links], desc="Processing CSV files"):
             cleaned_df = await coro
-            if cleaned_df is not None:
+            if cleaned_df is not None and not cleaned_df.empty:
                 all_data.append(cleaned_df)
 
+    if not all_data:
+        logging.info("No data within spatial and time ranges.")
+        return pd.DataFrame()
+
     # Combine all DataFrames into a single DataFrame
     combined_df = pd.concat(all_data, ignore_index=True)
-    cleaned_df.dropna(how='all', inplace=True)
-
-    if len(combined_df.columns) == len(new_headers):
-        combined_df.columns = new_headers
-    else:
-        print("Warning: Number of columns does not match the number of custom headers.")
 
-    unique_points = combined_df[['point_id', 'lat', 'lon']].drop_duplicates()
-    unique_points = unique_points[pd.to_numeric(unique_points[['lat','lon']].stack(), errors='coerce')
-                .unstack()
-                .notna()
-                .all(axis=1)]
-    coordinates = prepare_coordinates(coordinates=unique_points, spatial_range=spatial_range, level=level)
+    unique_points = combined_df[['point_id', 'lat', 'lon']].drop_duplicates().dropna()
+    coordinates = StationRegistry(unique_points).select(spatial_range, level)
     if coordinates is None or coordinates.empty:
         logging.info("No coordinates within spatial range.")
         return pd.DataFrame()
 
-    valid_ids = coordinates['point_id'].unique()
-    combined_df = combined_df[combined_df['point_id'].isin(valid_ids)]
-
-    time_from, time_to = pd.to_datetime(time_range[0]), pd.to_datetime(time_range[1])
-    combined_df = combined_df[(combined_df['date'] >= time_from) & (combined_df['date'] <= time_to)]
-
     # Select numeric columns based on data_range
     category_columns = {col for col, cat in DATA_ALIASES.items() if cat in data_range}
     available_columns = [col for col in category_columns if col in combined_df.columns]
@@ -105,10 +167,6 @@ async def read_data(spatial_range, time_range, data_range, level):
         logging.warning("No data columns found for the requested categories.")
         return pd.DataFrame()
 
-    # Ensure numeric columns
-    cols_to_convert = [col for col in new_headers if col != "date"]
-    combined_df[cols_to_convert] = combined_df[cols_to_convert].apply(pd.to_numeric, errors='coerce')
-
     final_df = combined_df[['point_id', 'date'] + new_headers]
     final_df = final_df.loc[:, ~final_df.columns.duplicated()]
     final_df = final_df.merge(coordinates[['point_id', 'S2CELL']], on='point_id')
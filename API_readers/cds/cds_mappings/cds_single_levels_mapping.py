@@ -34,3 +34,25 @@ GLOBAL_MAPPING = {
     'sp': "Surface pressure [Pa]",
     'ssrd': "Surface solar radiation downwards [J/m^2]"
 }
+
+
+# reduction used when resampling hourly values to daily ones (variables not listed are averaged)
+DAILY_AGGREGATION = {
+    't2m': 'mean',
+    'tp': 'sum',
+    'sf': 'sum',
+    'swvl1': 'mean',
+    'e': 'sum',
+    'evavt': 'sum',
+    'u10': 'mean',
+    'v10': 'mean',
+    'sp': 'mean',
+    'ssrd': 'sum'
+}
+
+# size of the lazy (dask) chunks along the time axis - one month of hourly steps
+TIME_CHUNK = 24 * 31
+
+# native ERA5 grid, used for the cached grid-point -> S2Cell lookup tables
+GRID_NAME = 'era5'
+GRID_RESOLUTION = 0.25
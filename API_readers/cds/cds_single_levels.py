@@ -1,14 +1,33 @@
 import os.path
 import cdsapi
 import xarray as xr
-import pandas as pd
 from datetime import datetime, timedelta
-from API_readers.cds.cds_mappings.cds_single_levels_mapping import DATA_ALIASES, GLOBAL_MAPPING
-from utils.coordinates_to_cells import prepare_coordinates
+from API_readers.cds.cds_mappings.cds_single_levels_mapping import DATA_ALIASES, GLOBAL_MAPPING, DAILY_AGGREGATION, \
+    TIME_CHUNK, GRID_NAME, GRID_RESOLUTION
+from API_readers.cds.cds_utils.cds_storage import request_scratch_dir, extract_members
+from utils.coordinates_to_cells import prepare_grid_coordinates
 import warnings
 import asyncio
-import zipfile
-import shutil
+
+
+def resample_daily(ds):
+    """
+    Resample an hourly ERA5 dataset to daily values, reducing each variable according to DAILY_AGGREGATION.
+
+    Accumulated variables (e.g. precipitation) are summed, state variables (e.g. temperature) are averaged.
+    The operation stays lazy when the dataset is backed by dask chunks.
+
+    :param ds: xarray Dataset with a 'valid_time' dimension at hourly resolution.
+    :return: xarray Dataset with one step per day.
+    """
+    daily = {}
+    for var in ds.data_vars:
+        resampled = ds[var].resample(valid_time='1D')
+        if DAILY_AGGREGATION.get(var, 'mean') == 'sum':
+            daily[var] = resampled.sum(min_count=1)
+        else:
+            daily[var] = resampled.mean()
+    return xr.Dataset(daily)
 
 
 async def read_data(spatial_range, time_range, data_range, level):
@@ -50,10 +69,7 @@ async def read_data(spatial_range, time_range, data_range, level):
     months = sorted(list(months))
     days = sorted(list(days))
 
-    folder_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'temp_storage')
-    file_name = dataset + "_temp_data.zip"
-    temp_file_path = os.path.join(folder_path, file_name)
-    # Request the data and keep it in memory
+    # Request the data
     request = {
             'product_type': ["reanalysis"],
             'variable': data_requested,  # Specify variables
@@ -65,42 +81,37 @@ async def read_data(spatial_range, time_range, data_range, level):
             "download_format": "zip",
             'area': [north, west, south, east],  # Spatial extent: North, West, South, East
         }
-    c.retrieve(dataset,request).download(temp_file_path)
-
-    # Unzip files
-    with zipfile.ZipFile(temp_file_path, 'r') as zip_ref:
-        zip_ref.extractall(folder_path)
-    extracted_files = [os.path.join(folder_path, f) for f in os.listdir(folder_path) if f.endswith('.nc')]
-    datasets = []
-    for f in extracted_files:
-        with xr.open_dataset(f) as dataset:
-            datasets.append(dataset.load())
-    ds = xr.merge(datasets)
+    with request_scratch_dir(dataset) as folder_path:
+        temp_file_path = os.path.join(folder_path, dataset + "_temp_data.zip")
+        await asyncio.to_thread(c.retrieve, dataset, request, temp_file_path)
+
+        # Unzip only the expected NetCDF members into the request's own folder
+        extracted_files = extract_members(temp_file_path, folder_path)
+
+        # Open lazily (dask chunks) and reduce hourly values to daily ones before leaving xarray
+        datasets = [xr.open_dataset(f, chunks={'valid_time': TIME_CHUNK}) for f in extracted_files]
+        try:
+            ds = xr.merge(datasets)
+            ds = ds.drop_vars(['expver', 'number'], errors='ignore')
+            ds = ds.sel(valid_time=slice(str(start), f"{end} 23:59:59"))
+            ds = resample_daily(ds).compute()
+        finally:
+            for nc in datasets:
+                nc.close()
 
     # Convert xarray Dataset to pandas DataFrame
     df = ds.to_dataframe().reset_index()
 
     # Cleaning
-    df = df[~df.isna()]
-    df = df.drop(['expver', 'number'], axis=1)
-    df = df.drop_duplicates()
+    df = df.dropna(how='all', subset=list(ds.data_vars))
 
     # Naming
     df = df.rename(GLOBAL_MAPPING, axis=1)
     df = df.rename({'latitude': 'lat', 'longitude': 'lon', 'valid_time': 'Timestamp'}, axis=1)
-
-    # To daily
-    df['day'] = df['Timestamp'].dt.date
-    df = df.groupby(['day', 'lat', 'lon']).mean().reset_index()
-    df = df.drop(['day'], axis=1)
-
-    # Temporal cut
-    df['Timestamp'] = pd.to_datetime(df['Timestamp'])
     df['Timestamp'] = df['Timestamp'].dt.date
-    df = df[(df['Timestamp'] >= start) & (df['Timestamp'] <= end)]
 
-    # S2Cell Mapping
-    df = prepare_coordinates(df, spatial_range, level)
+    # S2Cell Mapping (cached lookup of the fixed ERA5 grid)
+    df = prepare_grid_coordinates(df, spatial_range, level, GRID_NAME, GRID_RESOLUTION)
 
     # Average overlapping
     original_size = df.shape[0]
@@ -112,17 +123,13 @@ async def read_data(spatial_range, time_range, data_range, level):
     if "Temperature [°C]" in df.columns:
         df["Temperature [°C]"] = df["Temperature [°C]"] - 273.15
 
-    # Recalculate precipitation to a daily sum
+    # Recalculate precipitation from metres to millimetres
     if 'Precipitation total [mm]' in df.columns:
-        df['Precipitation total [mm]'] = df['Precipitation total [mm]']*(24*60*60)
+        df['Precipitation total [mm]'] = df['Precipitation total [mm]'] * 1000
 
     df = df.drop(['lat', 'lon'], axis=1)
 
     # Pivot the DataFrame
     df = df.pivot_table(index='Timestamp', columns='S2CELL')
 
-    # Cleanup
-    os.remove(temp_file_path)
-    [os.remove(x) for x in extracted_files]
-
     return df
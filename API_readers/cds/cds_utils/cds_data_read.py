@@ -4,6 +4,7 @@ import xarray as xr
 import pandas as pd
 from datetime import datetime
 from API_readers.cds.cds_mappings.cds_single_levels_mapping import DATA_ALIASES, GLOBAL_MAPPING
+from API_readers.cds.cds_utils.cds_storage import request_scratch_dir
 from utils.coordinates_to_cells import prepare_coordinates
 from utils.interpolate_data import interpolate
 import warnings
@@ -43,27 +44,27 @@ def cds_read_data(spatial_range, time_range, data_range, level, dataset):
     else:
         days = list(range(1,32))
 
-    folder_path = os.path.join(os.path.dirname(os.path.realpath(__file__)),'temp_storage')
-    file_name = dataset+"_temp_data.nc"
-    temp_file_path = os.path.join(folder_path, file_name)
-    # Request the data and keep it in memory
-    response = c.retrieve(
-        dataset,  # Dataset name
-        {
-            'variable': data_requested,  # Specify variables
-            'year': list(map(str,years)),  # Specify year(s)
-            'month': [str(i).zfill(2) for i in months],  # Specify month(s)
-            'day': [str(i).zfill(2) for i in days], # Specify day(s)
-            'hour': [f"{hour:02}:00" for hour in range(24)],
-            'format': 'netcdf',
-            'grid':[1.0, 1.0], # File format
-            'area': [north,west,south,east],  # Spatial extent: North, West, South, East
-        },
-        temp_file_path
-    )
+    # Request the data into a scratch folder private to this request
+    with request_scratch_dir(dataset) as folder_path:
+        temp_file_path = os.path.join(folder_path, dataset + "_temp_data.nc")
+        response = c.retrieve(
+            dataset,  # Dataset name
+            {
+                'variable': data_requested,  # Specify variables
+                'year': list(map(str,years)),  # Specify year(s)
+                'month': [str(i).zfill(2) for i in months],  # Specify month(s)
+                'day': [str(i).zfill(2) for i in days], # Specify day(s)
+                'hour': [f"{hour:02}:00" for hour in range(24)],
+                'format': 'netcdf',
+                'grid':[1.0, 1.0], # File format
+                'area': [north,west,south,east],  # Spatial extent: North, West, South, East
+            },
+            temp_file_path
+        )
 
-    # Open tempfile
-    ds = xr.open_dataset(temp_file_path)
+        # Open tempfile
+        with xr.open_dataset(temp_file_path) as ds:
+            ds = ds.load()
 
     # Convert xarray Dataset to pandas DataFrame
     df = ds.to_dataframe().reset_index()
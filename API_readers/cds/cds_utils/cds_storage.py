@@ -0,0 +1,55 @@
+import os
+import shutil
+import tempfile
+import zipfile
+from contextlib import contextmanager
+
+# Root of the CDS scratch space; every request works in its own subdirectory
+TEMP_STORAGE = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), 'temp_storage')
+
+
+@contextmanager
+def request_scratch_dir(dataset):
+    """
+    Create a scratch directory private to a single request and remove it afterwards.
+
+    Concurrent requests for the same dataset never share download or extraction paths.
+
+    :param dataset: CDS dataset name, used as the directory prefix.
+    :return: Path to the scratch directory.
+    """
+    os.makedirs(TEMP_STORAGE, exist_ok=True)
+    scratch_dir = tempfile.mkdtemp(prefix=f"{dataset}_", dir=TEMP_STORAGE)
+    try:
+        yield scratch_dir
+    finally:
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+
+
+def extract_members(zip_path, target_dir, suffix='.nc'):
+    """
+    Stream the expected members of a downloaded archive into the target directory.
+
+    Only members whose names end with `suffix` are written; anything else in the archive is skipped. Members keep
+    their relative path, so that members with the same name in different folders do not overwrite each other;
+    members pointing outside the target directory are rejected.
+
+    :param zip_path: Path to the downloaded zip archive.
+    :param target_dir: Directory the members are written to.
+    :param suffix: File name suffix of the expected members.
+    :return: List of paths to the extracted files.
+    """
+    extracted_files = []
+    with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+        for member in zip_ref.infolist():
+            if member.is_dir() or not member.filename.endswith(suffix):
+                continue
+            target_path = os.path.normpath(os.path.join(target_dir, member.filename))
+            if os.path.commonpath([os.path.abspath(target_dir), os.path.abspath(target_path)]) != \
+                    os.path.abspath(target_dir):
+                raise ValueError(f"Archive member outside of the target directory: {member.filename}")
+            os.makedirs(os.path.dirname(target_path), exist_ok=True)
+            with zip_ref.open(member) as source, open(target_path, 'wb') as target:
+                shutil.copyfileobj(source, target)
+            extracted_files.append(target_path)
+    return extracted_files
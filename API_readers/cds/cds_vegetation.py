@@ -5,9 +5,8 @@ import pandas as pd
 from datetime import datetime
 from utils.coordinates_to_cells import prepare_coordinates
 import warnings
-import zipfile
-import glob
 from API_readers.cds.cds_mappings.cds_vegetation_mapping import GLOBAL_MAPPING, DATA_ALIASES
+from API_readers.cds.cds_utils.cds_storage import request_scratch_dir, extract_members
 import asyncio
 
 
@@ -42,48 +41,35 @@ async def read_data(spatial_range, time_range, data_range, level):
 
     data_requested = list([k for k, v in DATA_ALIASES.items() if v in data_range])
 
-    folder_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'temp_storage')
-    file_name = dataset + "_temp_data.zip"
-    temp_file_path = os.path.join(folder_path, file_name)
-
     # Prepare the request parameters
-    response = c.retrieve(
-        dataset,  # Dataset name
-        {
+    request = {
         'product_family': ["evapotranspiration_indicators"],
         "variable": data_requested,
         'year': years,
         'month': months,
         'day': days,
-        },
-        temp_file_path
-    )
-
-    # Unzip the downloaded data
-    with zipfile.ZipFile(temp_file_path, 'r') as zip_ref:
-        zip_ref.extractall(folder_path)
+        }
 
-    # Now read the extracted NetCDF files
-    nc_files = glob.glob(os.path.join(folder_path, '*.nc'))
+    with request_scratch_dir(dataset) as folder_path:
+        temp_file_path = os.path.join(folder_path, dataset + "_temp_data.zip")
+        await asyncio.to_thread(c.retrieve, dataset, request, temp_file_path)
 
-    # Check if any NetCDF files were extracted
-    if not nc_files:
-        raise FileNotFoundError("No NetCDF files found after extracting the zip file.")
+        # Unzip only the expected NetCDF members into the request's own folder
+        nc_files = extract_members(temp_file_path, folder_path)
 
-    # Open and concatenate all NetCDF files
-    ds = [xr.open_dataset(nc_file).sel(lat_var=slice(north, south), lon_var=slice(west, east)) for nc_file in nc_files]
+        # Check if any NetCDF files were extracted
+        if not nc_files:
+            raise FileNotFoundError("No NetCDF files found after extracting the zip file.")
 
-    # Select the desired spatial subset
-    ds = [dd.to_dataframe().reset_index() for dd in ds]
+        # Open the NetCDF files, select the desired spatial subset and convert to pandas
+        ds = []
+        for nc_file in nc_files:
+            with xr.open_dataset(nc_file) as nc:
+                ds.append(nc.sel(lat_var=slice(north, south), lon_var=slice(west, east)).to_dataframe().reset_index())
 
-    # Convert xarray Dataset to pandas DataFrame
+    # Concatenate into a single pandas DataFrame
     df = pd.concat(ds)
 
-    # Clean up temporary files
-    os.remove(temp_file_path)
-    for f in nc_files:
-        os.remove(f)
-
     # Rename columns if necessary
     if 'time' in df.columns:
         df.rename(columns={'time': 'Timestamp'}, inplace=True)
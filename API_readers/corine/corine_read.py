@@ -6,6 +6,7 @@ from PIL import Image
 from io import BytesIO
 from utils.interpolate_data import how_many
 from utils.coordinates_to_cells import prepare_coordinates
+from utils.categorical import majority_by_group
 from API_readers.corine.corine_mappings.corine_mapping import PARAMETERS_SELECTION
 from datetime import datetime, date
 import asyncio
@@ -82,8 +83,8 @@ async def read_data(spatial_range, time_range, data_range, level):
                 # Convert data to DataFrame asynchronously
                 df = pd.DataFrame.from_dict(data_rows)
                 df = prepare_coordinates(df, spatial_range, level)
-                df = df.set_index('S2CELL')
-                df = df.groupby(level=0).mean().reset_index()
+                # Majority vote of the pixel classes (RGBA colours) per cell
+                df = majority_by_group(df, 'S2CELL', [col for col in PARAMETERS_SELECTION if col in df.columns]).reset_index()
 
                 # Explode to days
                 if start.year > year_start:
@@ -97,7 +98,6 @@ async def read_data(spatial_range, time_range, data_range, level):
                 days = pd.date_range(explode_start, explode_end, freq='D')
                 df = pd.concat([df.assign(Timestamp=dates.date()) for dates in days])
 
-                df = df.drop(['lat', 'lon'], axis=1)
                 stacked_df.append(df)
 
     # Concatenate and pivot data asynchronously
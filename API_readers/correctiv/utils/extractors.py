@@ -1,13 +1,15 @@
 import pandas as pd
-import geopandas as gpd
+
+# Columns read from the parquet file
+READ_COLUMNS = ['latitude', 'longitude', 'year', 'month', 'min_gwl', 'mean_gwl', 'max_gwl']
 
 
 def spatial_extraction(
         data: str,
         spatial_range: tuple
-    ) -> gpd.GeoDataFrame:
+    ) -> pd.DataFrame:
     """
-    Load spatial data from a parquet file and clip it to a bounding box.
+    Load the points of a parquet file within a bounding box.
 
     Additionally creates a monthly datetime column based on 'year' and 'month'.
 
@@ -20,26 +22,29 @@ def spatial_extraction(
 
     Returns
     -------
-    gpd.GeoDataFrame
-        Clipped GeoDataFrame with an added 'date' column (datetime64[ns]),
-        representing the first day of each month.
+    pd.DataFrame
+        Points within the bounding box, with an added 'date' column
+        (datetime64[ns]) representing the first day of each month.
 
     Notes
     -----
-    - Uses GeoPandas `.cx` indexer for spatial filtering.
-    - Returns a copy to avoid SettingWithCopyWarning.
+    - The bounding box is pushed down to Parquet as filters on the
+      'latitude' and 'longitude' columns, so row groups outside of it are
+      skipped and only the matching rows are decoded.
+    - Only READ_COLUMNS are read; geometries are not decoded.
     """
-    gdf = gpd.read_parquet(data)
-
     N, S, E, W = spatial_range
-    bbox = (W, S, E, N)
-    gdf_clipped = gdf.cx[bbox[0]:bbox[2], bbox[1]:bbox[3]].copy()
+    filters = [
+        ('longitude', '>=', W), ('longitude', '<=', E),
+        ('latitude', '>=', S), ('latitude', '<=', N),
+    ]
+    df = pd.read_parquet(data, columns=READ_COLUMNS, filters=filters)
 
-    gdf_clipped['date'] = pd.to_datetime(
-        gdf_clipped[['year', 'month']].assign(day=1)
+    df['date'] = pd.to_datetime(
+        df[['year', 'month']].assign(day=1)
     )
 
-    return gdf_clipped
+    return df
 
 
 def time_extraction_wide(
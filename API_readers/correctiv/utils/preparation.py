@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 
 def data_melting(data: pd.DataFrame) -> pd.DataFrame:
@@ -26,31 +27,21 @@ def data_melting(data: pd.DataFrame) -> pd.DataFrame:
 
     Notes
     -----
-    - Each monthly value is repeated for all days within its month.
+    - Each monthly value is repeated for all days within its month, with
+      index arithmetic (repeat plus a day offset) instead of per-month frames.
     - Assumes that each ('S2CELL', 'date') group contains a single row.
     - If multiple rows exist per group, only the first one is used.
     - No interpolation is performed (step-wise constant values).
     """
-    daily_frames = []
-
-    for (cell, date), group in data.groupby(['S2CELL', 'date']):
-        value = group.iloc[0]
-
-        days = pd.date_range(
-            start=date,
-            end=date + pd.offsets.MonthEnd(0),
-            freq='D'
-        )
-
-        repeated = pd.DataFrame({
-            'S2CELL': cell,
-            'date': days,
-            'min_gwl': value['min_gwl'],
-            'mean_gwl': value['mean_gwl'],
-            'max_gwl': value['max_gwl'],
-        })
-
-        daily_frames.append(repeated)
-
-    df_daily = pd.concat(daily_frames, ignore_index=True)
-    return df_daily
\ No newline at end of file
+    data = data.drop_duplicates(['S2CELL', 'date'])
+
+    # Number of days from each date to the end of its month
+    days = (((data['date'] + pd.offsets.MonthEnd(0)) - data['date']).dt.days + 1).to_numpy()
+
+    # Repeat each monthly row once per day, and shift the repeated dates by
+    # their position within the month
+    columns = ['S2CELL', 'date', 'min_gwl', 'mean_gwl', 'max_gwl']
+    df_daily = data[columns].iloc[np.repeat(np.arange(len(data)), days)]
+    offsets = np.arange(days.sum()) - np.repeat(np.cumsum(days) - days, days)
+    df_daily = df_daily.assign(date=df_daily['date'].to_numpy() + pd.to_timedelta(offsets, unit='D').to_numpy())
+    return df_daily.reset_index(drop=True)
@@ -1,3 +1,4 @@
+import os
 import pandas as pd
 import httpx
 import asyncio
@@ -5,23 +6,24 @@ import zipfile
 import io
 import logging
 from typing import Optional, Any
-from utils.coordinates_to_cells import prepare_coordinates
+from utils.download_cache import cached_get, read_mirror
+from utils.station_registry import load_registry
 from API_readers.epa_ireland.epa_ireland_mappings.epa_ireland_mapping import DATA_ALIASES, GLOBAL_MAPPING
 
 coordinates = 'API_readers/epa_ireland/constants/EPA_coordinates.csv'
-initial_df = pd.read_csv(coordinates, sep=',', header=0)
+CACHE_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'cache')
+MAX_CONCURRENT_DOWNLOADS = 8
 
 
-async def process_link(client: httpx.AsyncClient, row: pd.Series) -> Optional[pd.DataFrame]:
-    id = row['id']
-    link = row['download_link']
+def parse_station_zip(content: bytes, row: pd.Series) -> Optional[pd.DataFrame]:
+    """
+    Parse the zipped daily series of a station.
 
+    :param content: Body of the station zip file.
+    :param row: Station row of the registry.
+    :return: DataFrame of the station series, or None if the file cannot be read.
+    """
     try:
-        print(f"Downloading data for {id} from {link}")
-        async with client.stream('GET', link) as response:
-            response.raise_for_status()
-            content = await response.aread()
-
         with zipfile.ZipFile(io.BytesIO(content)) as z:
             csv_filename = z.namelist()[0]  # Assumes one CSV per ZIP
             with z.open(csv_filename) as csv_file:
@@ -34,25 +36,61 @@ async def process_link(client: httpx.AsyncClient, row: pd.Series) -> Optional[pd
                     header=0,
                     parse_dates=['timestamp']
                 )
-                df['id'] = id
-                df['lat'] = row['lat']
-                df['lon'] = row['lon']
+    except (zipfile.BadZipFile, ValueError, IndexError) as e:
+        print(f"Error processing {row['id']}: {str(e)}")
+        return None
+
+    df['id'] = row['id']
+    df['lat'] = row['lat']
+    df['lon'] = row['lon']
 
-                # Calculate depth to groundwater
-                df['groundwater depth [m b.g.l]'] = row['measuring_point_height'] - df['groundwater level [m]']
+    # Calculate depth to groundwater
+    df['groundwater depth [m b.g.l]'] = row['measuring_point_height'] - df['groundwater level [m]']
+    return df
 
-                return df
 
-    except Exception as e:
-        print(f"Error processing {id} from {link}: {str(e)}")
+async def process_link(client: httpx.AsyncClient, row: pd.Series, time_range: tuple,
+                       semaphore: asyncio.Semaphore) -> Optional[pd.DataFrame]:
+    """
+    Get the series of a station within the time range, from the local cache when it already covers the range,
+    else with a conditional GET (the cached copy is served when the server answers 304 Not Modified).
+
+    :param client: httpx.AsyncClient used for the requests.
+    :param row: Station row of the registry.
+    :param time_range: A tuple of the start and end dates.
+    :param semaphore: asyncio.Semaphore bounding the number of concurrent downloads.
+    :return: DataFrame of the station series within the time range, or None.
+    """
+    id = row['id']
+    link = row['download_link']
+    time_from, time_to = pd.to_datetime(time_range[0]), pd.to_datetime(time_range[1])
+
+    df = None
+    content = await read_mirror(link, CACHE_DIR)
+    if content is not None:
+        df = await asyncio.to_thread(parse_station_zip, content, row)
+    if df is None or df.empty or df['timestamp'].max() < time_to:
+        try:
+            print(f"Downloading data for {id} from {link}")
+            content = await cached_get(client, link, CACHE_DIR, semaphore=semaphore)
+        except httpx.HTTPError as e:
+            print(f"Error processing {id} from {link}: {str(e)}")
+            content = None
+        if content is not None:
+            df = await asyncio.to_thread(parse_station_zip, content, row)
+    if df is None:
         return None
 
+    return df[(df['timestamp'] >= time_from) & (df['timestamp'] <= time_to)]
 
-# Async function to fetch all data
-async def fetch_all_data():
-    async with httpx.AsyncClient(timeout=30.0) as client:
+
+# Async function to fetch the data of the selected stations
+async def fetch_all_data(stations: pd.DataFrame, time_range: tuple):
+    limits = httpx.Limits(max_connections=MAX_CONCURRENT_DOWNLOADS, max_keepalive_connections=MAX_CONCURRENT_DOWNLOADS)
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_DOWNLOADS)
+    async with httpx.AsyncClient(timeout=30.0, limits=limits, follow_redirects=True) as client:
         tasks = []
-        for _, row in initial_df.iterrows():
+        for _, row in stations.iterrows():
             link = row['download_link']
             id = row['id']
 
@@ -60,7 +98,7 @@ async def fetch_all_data():
                 print(f"Skipping {id}: Invalid or missing download link")
                 continue
 
-            tasks.append(process_link(client, row))
+            tasks.append(process_link(client, row, time_range, semaphore))
 
         results = await asyncio.gather(*tasks, return_exceptions=True)
         return results
@@ -68,12 +106,21 @@ async def fetch_all_data():
 
 async def read_data(spatial_range, time_range, data_range, level):
     print("DOWNLOADING: EPA GROUNDWATER QUANTITY DATA")
-    results = await fetch_all_data()
+    # Stations within the spatial range, with their S2Cells (registry loaded once per process)
+    registry = await asyncio.to_thread(load_registry, coordinates)
+    stations = registry.select(spatial_range, level)
+
+    # Handle case where coordinates are empty or None
+    if stations is None or stations.empty:
+        return pd.DataFrame()
+
+    # Only the selected stations are downloaded
+    results = await fetch_all_data(stations, time_range)
     all_data = []
 
     # Process each result and apply initial filters
     for result in results:
-        if result is None:
+        if result is None or isinstance(result, Exception):
             continue
         df = result
 
@@ -92,18 +139,6 @@ async def read_data(spatial_range, time_range, data_range, level):
     final_df = final_df.drop('groundwater level [m]', axis=1)
     final_df = final_df.rename(columns={'timestamp': 'Timestamp'})
 
-    # Prepare coordinates for spatial filtering
-    unique_points = final_df[['id', 'lat', 'lon']].drop_duplicates()
-    coordinates = prepare_coordinates(coordinates=unique_points, spatial_range=spatial_range, level=level)
-
-    # Handle case where coordinates are empty or None
-    if coordinates is None or coordinates.empty:
-        return pd.DataFrame()
-
-    # Filter DataFrame based on valid IDs from coordinates
-    valid_ids = coordinates['id'].unique()
-    final_df = final_df[final_df['id'].isin(valid_ids)]
-
     # Apply additional time filter to ensure consistency
     time_from, time_to = pd.to_datetime(time_range[0]), pd.to_datetime(time_range[1])
     final_df = final_df[(final_df['Timestamp'] >= time_from) & (final_df['Timestamp'] <= time_to)]
@@ -120,7 +155,7 @@ async def read_data(spatial_range, time_range, data_range, level):
     final_df = final_df[['id', 'Timestamp'] + measurement_columns]
 
     # Merge with coordinates to include S2CELL
-    final_df = final_df.merge(coordinates[['id', 'S2CELL']], on='id')
+    final_df = final_df.merge(stations[['id', 'S2CELL']], on='id')
 
     final_df.Timestamp = pd.to_datetime(final_df.Timestamp).dt.date
 
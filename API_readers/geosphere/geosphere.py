@@ -1,32 +1,84 @@
+import asyncio
+import time
 import httpx
 import pandas as pd
 from io import StringIO
-from utils.coordinates_to_cells import prepare_coordinates
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
+from utils.station_registry import StationRegistry
+from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type, retry_if_exception, \
+    RetryError
 from API_readers.geosphere.geosphere_mapping.geosphere_mapping import GLOBAL_MAPPING, DATA_ALIASES
 import warnings
 from datetime import datetime
 
+RESOURCE_ID = "klima-v2-1d"
+METADATA_TTL = 24 * 3600  # seconds
+STATIONS_PER_REQUEST = 20
+MAX_CONCURRENT_REQUESTS = 4
+TIMEOUT = 60.0  # seconds
+RETRY_STATUS = (429, 500, 502, 503, 504)
 
-async def fetch_station_metadata(resource_id="klima-v2-1d"):
+# Station registries of the resources, with the time they were fetched
+_STATIONS = {}
+
+
+def _is_transient(exception):
+    """
+    Check whether an HTTP error status is worth retrying (rate limit or server error).
+    """
+    return isinstance(exception, httpx.HTTPStatusError) and exception.response.status_code in RETRY_STATUS
+
+
+async def fetch_station_metadata(resource_id=RESOURCE_ID, client=None):
     """
     Fetch metadata for all stations.
     """
     url = f"https://dataset.api.hub.geosphere.at/v1/station/historical/{resource_id}/metadata"
-    async with httpx.AsyncClient() as client:
+    if client is None:
+        async with httpx.AsyncClient() as client:
+            response = await client.get(url)
+    else:
         response = await client.get(url)
-        response.raise_for_status()
-        data = response.json()['stations']
+    response.raise_for_status()
+    data = response.json()['stations']
     data = pd.DataFrame(data)
     return data[['id', 'name', 'lat', 'lon']]
 
 
+async def get_station_registry(resource_id=RESOURCE_ID, client=None):
+    """
+    Get the station registry of a resource; the metadata are fetched again once they are older than METADATA_TTL.
+
+    :param resource_id: Geosphere dataset, e.g. 'klima-v2-1d'.
+    :param client: Optional httpx.AsyncClient used for the request.
+    :return: StationRegistry of the stations.
+    """
+    fetched, registry = _STATIONS.get(resource_id, (None, None))
+    if registry is None or time.time() - fetched > METADATA_TTL:
+        metadata_df = await fetch_station_metadata(resource_id, client=client)
+        registry = StationRegistry(metadata_df)
+        _STATIONS[resource_id] = (time.time(), registry)
+    return registry
+
+
+def parse_station_data(text, parameters):
+    """
+    Parse a CSV answer of the API with fixed dtypes.
+
+    :param text: CSV body with 'station', 'time' and the parameter columns.
+    :param parameters: List of parameter codes requested.
+    :return: DataFrame of the records.
+    """
+    return pd.read_csv(StringIO(text), dtype={'station': str, **{parameter: 'float64' for parameter in parameters}},
+                       parse_dates=['time'])
+
+
 @retry(
     stop=stop_after_attempt(5),  # Retry up to 5 times
     wait=wait_exponential(multiplier=1, min=1, max=10),  # Exponential backoff
-    retry=retry_if_exception_type(httpx.RequestError),  # Retry on HTTP request errors
+    # Retry on HTTP request errors and transient error statuses
+    retry=retry_if_exception_type(httpx.RequestError) | retry_if_exception(_is_transient),
 )
-async def fetch_station_data(resource_id, station_ids, time_range, parameters):
+async def fetch_station_data(resource_id, station_ids, time_range, parameters, client=None):
     """
     Fetch data for a list of stations.
     """
@@ -39,11 +91,30 @@ async def fetch_station_data(resource_id, station_ids, time_range, parameters):
         "station_ids": ",".join(map(str, station_ids)),
         "output_format": 'csv'
     }
-    async with httpx.AsyncClient() as client:
+    if client is None:
+        async with httpx.AsyncClient() as client:
+            response = await client.get(url, params=params)
+    else:
         response = await client.get(url, params=params)
-        response.raise_for_status()
-        data = pd.read_csv(StringIO(response.text))
-    return data
+    response.raise_for_status()
+    return await asyncio.to_thread(parse_station_data, response.text, parameters)
+
+
+def split_requests(station_ids, time_range, stations_per_request=STATIONS_PER_REQUEST):
+    """
+    Split a request in (batch of stations x calendar year) chunks.
+
+    :param station_ids: List of station IDs.
+    :param time_range: A tuple of the start and end dates (str, YYYY-mm-dd).
+    :param stations_per_request: Maximum number of stations of a chunk.
+    :return: List of (station IDs, (start date, end date)) tuples.
+    """
+    start, end = pd.Timestamp(time_range[0]), pd.Timestamp(time_range[1])
+    years = [(max(start, pd.Timestamp(year=year, month=1, day=1)), min(end, pd.Timestamp(year=year, month=12, day=31)))
+             for year in range(start.year, end.year + 1)]
+    batches = [station_ids[i:i + stations_per_request] for i in range(0, len(station_ids), stations_per_request)]
+    return [(batch, ("{:%Y-%m-%d}".format(year_start), "{:%Y-%m-%d}".format(year_end)))
+            for batch in batches for year_start, year_end in years]
 
 
 async def read_data(spatial_range, time_range, data_range, level):
@@ -55,58 +126,67 @@ async def read_data(spatial_range, time_range, data_range, level):
     :return: pandas DataFrame containing the requested data.
     """
 
-    north, south, east, west = spatial_range
     start, end = time_range
     start = datetime.strptime(start, '%Y-%m-%d').date()
     end = datetime.strptime(end, '%Y-%m-%d').date()
     data_requested = list([k for k, v in DATA_ALIASES.items() if v in data_range])
 
-    # Step 1: Fetch station metadata
-    metadata_df = await fetch_station_metadata()
+    limits = httpx.Limits(max_connections=MAX_CONCURRENT_REQUESTS, max_keepalive_connections=MAX_CONCURRENT_REQUESTS)
+    async with httpx.AsyncClient(limits=limits, timeout=TIMEOUT) as client:
+        # Step 1: Station metadata (cached)
+        registry = await get_station_registry(RESOURCE_ID, client=client)
 
-    # Step 2: Filter stations within the bounding box
-    filtered_stations = metadata_df[
-        (metadata_df["lat"] >= south) &
-        (metadata_df["lat"] <= north) &
-        (metadata_df["lon"] >= west) &
-        (metadata_df["lon"] <= east)
-        ]
+        # Step 2: Filter stations within the bounding box, with their S2Cells
+        filtered_stations = registry.select(spatial_range, level)
 
-    if filtered_stations.empty:
-        print("No stations found within the specified bounding box.")
-        return None
+        if filtered_stations is None:
+            print("No stations found within the specified bounding box.")
+            return None
 
-    station_ids = filtered_stations["id"].tolist()
+        station_cells = filtered_stations[["id", "S2CELL"]].assign(id=filtered_stations["id"].astype(str))
+        station_ids = filtered_stations["id"].tolist()
 
-    # Step 3: Fetch data for the filtered stations
-    data_df = await fetch_station_data("klima-v2-1d", station_ids, time_range, data_requested)
+        # Step 3: Fetch data for the filtered stations, by (station batch x year) chunks, each chunk being cleaned
+        # and merged with the station S2Cells as soon as it arrives
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
 
-    # Step 4: Combine and return the data
-    if data_df.empty:
-        print("No data found for the selected stations.")
-        return None
+        async def fetch_chunk(batch, chunk_range):
+            async with semaphore:
+                chunk = await fetch_station_data(RESOURCE_ID, batch, chunk_range, data_requested, client=client)
+
+            # CLEAN
+            chunk = chunk[~chunk.isna().any(axis=1)].copy()
+            if 'precipitation' in data_range:
+                chunk.loc[chunk['rr'] < 0, 'rr'] = 0
+
+            # Merge with metadata to include station S2Cells
+            chunk = chunk.merge(station_cells, left_on="station", right_on='id', how="inner")
 
-    # CLEAN
-    data_df = data_df[~data_df.isna().any(axis=1)]
-    if 'precipitation' in data_range:
-        data_df['rr'][data_df['rr'] < 0] = 0
+            # To daily
+            chunk['Timestamp'] = pd.to_datetime(chunk['time']).dt.date
+            return chunk[['S2CELL', 'Timestamp'] + data_requested]
 
-    # Merge with metadata to include station coordinates
-    data_df = data_df.merge(
-        filtered_stations[["id", "lat", "lon"]],
-        left_on="station", right_on='id',
-        how="left"
-    )
+        chunks = split_requests(station_ids, time_range)
+        results = await asyncio.gather(*[fetch_chunk(batch, chunk_range) for batch, chunk_range in chunks],
+                                       return_exceptions=True)
 
-    # To daily
-    data_df['Timestamp'] = pd.to_datetime(data_df['time']).dt.date
-    data_df = data_df.drop(['time'], axis=1)
+    data_dfs = []
+    for (batch, chunk_range), result in zip(chunks, results):
+        # Only network failures are skipped, any other error (e.g. in the cleaning) is raised
+        if isinstance(result, (httpx.HTTPError, RetryError)):
+            warnings.warn(f"Geosphere data of {len(batch)} stations for {chunk_range} could not be fetched: {result}")
+            continue
+        if isinstance(result, BaseException):
+            raise result
+        data_dfs.append(result)
 
-    # S2Cell Mapping
-    data_df = prepare_coordinates(data_df, spatial_range, level)
+    # Step 4: Combine and return the data
+    data_df = pd.concat(data_dfs, ignore_index=True) if data_dfs else pd.DataFrame()
+    if data_df.empty:
+        print("No data found for the selected stations.")
+        return None
 
     # Naming
-    data_df = data_df[['S2CELL', 'Timestamp'] + data_requested]
     data_df = data_df.rename(GLOBAL_MAPPING, axis=1)
 
     # Temporal cut
@@ -1,18 +1,74 @@
+import os
 import re
+import json
+import time
 import pandas as pd
 import numpy as np
 import httpx
 from bs4 import BeautifulSoup
-from tqdm import tqdm
+from tqdm.asyncio import tqdm as async_tqdm
 from API_readers.gios.gios_mappings import gios_mapping
 from datetime import datetime
 import warnings
-from utils.coordinates_to_cells import prepare_coordinates
+from utils.station_registry import load_registry
+from utils.atomic_write import atomic_path, atomic_write
 import asyncio
 
+CACHE_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'cache')
+FIRST_CAMPAIGN = 1995
+CAMPAIGN_INTERVAL = 5  # years between two monitoring campaigns
+RECHECK_TTL = 30 * 24 * 3600  # seconds between two checks for a campaign that is due but not yet published
+MAX_CONCURRENT_REQUESTS = 4
+TIMEOUT = 60.0  # seconds
+
 
 # TODO: time wrapping bug
-async def extract_point_ids(url):
+def expected_campaign():
+    """
+    Year of the latest monitoring campaign that may have been published (campaigns take place every five years).
+    """
+    return FIRST_CAMPAIGN + (datetime.now().year - FIRST_CAMPAIGN) // CAMPAIGN_INTERVAL * CAMPAIGN_INTERVAL
+
+
+def is_fresh(meta):
+    """
+    Check whether a cache entry is up to date: it holds the latest campaign that may have been published, or it was
+    checked recently.
+
+    :param meta: Metadata dict of the entry: 'campaign' (latest campaign year) and 'checked' (time of the check).
+    """
+    return meta['campaign'] >= expected_campaign() or time.time() - meta['checked'] < RECHECK_TTL
+
+
+def read_cache(name):
+    """
+    Read a cache entry.
+
+    :param name: Name of the entry, e.g. 'point_123'.
+    :return: Tuple (DataFrame or None, metadata dict) or (None, None) if the entry is missing.
+    """
+    path = os.path.join(CACHE_DIR, name)
+    try:
+        with open(path + '.json', 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        df = pd.read_parquet(path + '.parquet') if os.path.exists(path + '.parquet') else None
+    except (OSError, ValueError):
+        return None, None
+    return df, meta
+
+
+def write_cache(name, df, meta):
+    """
+    Write a cache entry; files are written to temporary files first and moved into place.
+    """
+    path = os.path.join(CACHE_DIR, name)
+    if df is not None:
+        with atomic_path(path + '.parquet') as temp_path:
+            df.to_parquet(temp_path)
+    atomic_write(path + '.json', json.dumps(meta))
+
+
+async def extract_point_ids(url, client=None):
     """
     Extracts point IDs from the hyperlinks found on a webpage.
 
@@ -23,7 +79,10 @@ async def extract_point_ids(url):
     :param url: A string representing the URL of the webpage to scrape.
     :return: A comma-separated string of point IDs extracted from the links on the page.
     """
-    async with httpx.AsyncClient() as client:
+    if client is None:
+        async with httpx.AsyncClient() as client:
+            page = await client.get(url)
+    else:
         page = await client.get(url)
     soup = BeautifulSoup(page.text, "html.parser")
     links = soup.find_all('a')
@@ -32,7 +91,42 @@ async def extract_point_ids(url):
     return ','.join(point_ids)
 
 
-async def scrape_point_data(point_id, parameter_values, parameter_order):
+async def get_point_ids(url, client):
+    """
+    Get the IDs of the measurement points, scraped once per campaign.
+
+    :param url: A string representing the URL of the webpage listing the points.
+    :param client: httpx.AsyncClient used for the request.
+    :return: List of point IDs (int).
+    """
+    _, meta = await asyncio.to_thread(read_cache, 'points')
+    if meta is None or not is_fresh(meta):
+        point_ids = await extract_point_ids(url, client=client)
+        meta = {'point_ids': list(map(int, point_ids.split(','))), 'campaign': expected_campaign(),
+                'checked': time.time()}
+        await asyncio.to_thread(write_cache, 'points', None, meta)
+    return meta['point_ids']
+
+
+async def get_point_data(point_id, parameter_values, parameter_order, client, semaphore):
+    """
+    Get the parsed soil measurement data of a point, from the local cache while no newer campaign can have been
+    published, else scraped (see `scrape_point_data`) and cached with the year of its latest campaign.
+
+    :return: A pandas DataFrame as returned by `scrape_point_data`.
+    """
+    name = f'point_{point_id}'
+    df, meta = await asyncio.to_thread(read_cache, name)
+    if df is not None and is_fresh(meta):
+        return df
+    async with semaphore:
+        df = await scrape_point_data(point_id, parameter_values, parameter_order, client=client)
+    campaign = int(pd.to_numeric(df['year'], errors='coerce').max()) if not df.empty else FIRST_CAMPAIGN
+    await asyncio.to_thread(write_cache, name, df, {'campaign': campaign, 'checked': time.time()})
+    return df
+
+
+async def scrape_point_data(point_id, parameter_values, parameter_order, client=None):
     """
     Scrapes soil measurement data for a specified point ID from a GIOS webpage.
 
@@ -47,7 +141,10 @@ async def scrape_point_data(point_id, parameter_values, parameter_order):
              with columns for point ID, year, and the specified parameters.
     """
     url = f'https://www.gios.gov.pl/chemizm_gleb/index.php?mod=pomiary&p={point_id}'
-    async with httpx.AsyncClient() as client:
+    if client is None:
+        async with httpx.AsyncClient() as client:
+            page = await client.get(url)
+    else:
         page = await client.get(url)
     soup = BeautifulSoup(page.text, "html.parser")
 
@@ -106,14 +203,12 @@ async def read_data(spatial_range, time_range, data_range, level):
     lowest_range = min([x[0] for x in between_years])
     highest_range = max([x[1] for x in between_years])
 
-    coors = await asyncio.to_thread(pd.read_csv, r'API_readers/gios/constants/gios_coordinates.csv')
-
-    coordinates = prepare_coordinates(coordinates=coors, spatial_range=spatial_range, level=level)
+    registry = await asyncio.to_thread(load_registry, r'API_readers/gios/constants/gios_coordinates.csv')
+    coordinates = registry.select(spatial_range, level)
     if coordinates is None:
         return None
 
     point_id_url = 'https://www.gios.gov.pl/chemizm_gleb/index.php?mod=pomiary'
-    point_ids = await extract_point_ids(point_id_url)
 
     all_dataframes = []
     data_requested = set([k for k, v in gios_mapping.DATA_ALIASES.items() if v in data_range])
@@ -122,12 +217,18 @@ async def read_data(spatial_range, time_range, data_range, level):
 
     # Keeping the same order for the parameters
     parameter_order = parameter_values.copy()
-    point_ids = point_ids.split(',')
-    point_ids = list(map(int, point_ids))
-    point_ids = list(set(point_ids).intersection(set(coordinates.id)))
 
-    for point_id in tqdm(point_ids, total=len(point_ids)):
-        df = await scrape_point_data(point_id, parameter_values, parameter_order)
+    # One pooled client, bounded number of concurrent requests; points are served by the cache when up to date
+    limits = httpx.Limits(max_connections=MAX_CONCURRENT_REQUESTS, max_keepalive_connections=MAX_CONCURRENT_REQUESTS)
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+    async with httpx.AsyncClient(limits=limits, timeout=TIMEOUT) as client:
+        point_ids = await get_point_ids(point_id_url, client)
+        point_ids = list(set(point_ids).intersection(set(coordinates.id)))
+        point_dfs = await async_tqdm.gather(
+            *[get_point_data(point_id, parameter_values, parameter_order, client, semaphore) for point_id in point_ids]
+        )
+
+    for df in point_dfs:
         # Filter data layers
         columns_to_select = list(df.columns[:2]) + list(set(df.columns).intersection(set(parameter_selection)))
         df = df.loc[:, columns_to_select]
@@ -1,4 +1,7 @@
 import asyncio
+import glob
+import hashlib
+import os
 import httpx
 import pandas as pd
 import logging
@@ -6,10 +9,14 @@ import nest_asyncio
 from bs4 import BeautifulSoup
 from urllib.parse import urljoin
 from io import BytesIO
+from contextlib import suppress
 from tqdm.asyncio import tqdm
 from pyproj import Transformer
 from API_readers.gios_gw.gios_gw_mappings.gios_gw_mapping import selected_columns, DATA_ALIASES, schema
-from utils.coordinates_to_cells import prepare_coordinates
+from utils.atomic_write import atomic_path
+from utils.download_cache import cached_get
+from utils.process_pool import run_in_process
+from utils.station_registry import StationRegistry
 
 # Apply nest_asyncio for interactive environments
 nest_asyncio.apply()
@@ -20,6 +27,8 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 # Initialize transformer for coordinate conversion
 transformer = Transformer.from_crs("EPSG:2180", "EPSG:4326", always_xy=True)
 URL = 'https://mjwp.gios.gov.pl/wyniki-badan/wyniki-badan-2023.html'
+CACHE_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'cache')
+MAX_CONCURRENT_DOWNLOADS = 4
 
 
 async def find_subpage_links(url: str, client: httpx.AsyncClient) -> list:
@@ -52,20 +61,74 @@ async def find_xlsx_links(url: str, client: httpx.AsyncClient) -> list:
         return []
 
 
-async def process_xlsx(url: str, client: httpx.AsyncClient) -> pd.DataFrame:
-    """Download and read an Excel file into a DataFrame."""
+def table_path(url: str, content: bytes) -> str:
+    """Path of the columnar cache file of a workbook, keyed by its URL and the hash of its content."""
+    url_key = hashlib.sha1(url.encode('utf-8')).hexdigest()[:16]
+    content_key = hashlib.sha256(content).hexdigest()[:16]
+    return os.path.join(CACHE_DIR, 'tables', f"{url_key}_{content_key}.parquet")
+
+
+def convert_workbook(content: bytes, path: str) -> None:
+    """
+    Parse a workbook into the standard schema and store it as a parquet file (run in a worker process).
+    Cache files of previous versions of the same workbook are removed.
+
+    :param content: Body of the xlsx file.
+    :param path: Path of the parquet file (see `table_path`).
+    """
+    df = pd.read_excel(BytesIO(content))
+    valid_columns = [col for col in selected_columns.keys() if col in df.columns]
+    df = df[valid_columns].rename(columns=selected_columns)
+    df = standardize_dataframe(df, schema)
+    df = df.dropna(how='all')
+    logging.info(f"Converted workbook with shape {df.shape} to {path}.")
+
+    with atomic_path(path) as temp_path:
+        df.to_parquet(temp_path, index=False)
+    for old_path in glob.glob(path.rsplit('_', 1)[0] + '_*.parquet'):
+        if old_path != path:
+            # Another worker may be removing the same old version
+            with suppress(FileNotFoundError):
+                os.remove(old_path)
+
+
+def read_table(path: str, columns: list, spatial_range, time_range) -> pd.DataFrame:
+    """
+    Read the needed columns of a converted workbook, for the records inside the bounding box and the time range.
+
+    :param path: Path of the parquet file.
+    :param columns: Measurement columns requested.
+    :param spatial_range: Tuple (N, S, E, W) defining the bounding box.
+    :param time_range: Tuple (start, end) of timestamps for filtering.
+    :return: DataFrame with 'id', 'date', 'lat', 'lon' and the requested columns.
+    """
+    n, s, e, w = spatial_range
+    time_from, time_to = pd.to_datetime(time_range[0]), pd.to_datetime(time_range[1])
+    filters = [('lat', '>=', s), ('lat', '<=', n), ('lon', '>=', w), ('lon', '<=', e),
+               ('date', '>=', time_from), ('date', '<=', time_to)]
+    return pd.read_parquet(path, columns=['id', 'date', 'lat', 'lon'] + columns, filters=filters)
+
+
+async def process_xlsx(url: str, client: httpx.AsyncClient, semaphore: asyncio.Semaphore) -> str:
+    """
+    Download an Excel file (conditional request on the local copy) and convert it once into a columnar cache file.
+
+    :return: Path of the cache file, or None if the file could not be downloaded or read.
+    """
     try:
-        response = await client.get(url)
-        response.raise_for_status()
-        loop = asyncio.get_running_loop()
-        df = await loop.run_in_executor(None, pd.read_excel, BytesIO(response.content))
-        logging.info(f"Processed file from {url} with shape {df.shape}.")
-        return df
+        content = await cached_get(client, url, os.path.join(CACHE_DIR, 'mirror'), semaphore=semaphore)
+        if content is None:
+            logging.error(f"Error fetching xlsx file {url}")
+            return None
+        path = table_path(url, content)
+        if not os.path.exists(path):
+            await run_in_process(convert_workbook, content, path)
+        return path
     except httpx.RequestError as e:
         logging.error(f"Error fetching xlsx file {url}: {e}")
     except Exception as e:
         logging.error(f"Error processing xlsx file {url}: {e}")
-    return pd.DataFrame()
+    return None
 
 
 def convert_coords(df: pd.DataFrame) -> pd.DataFrame:
@@ -103,7 +166,7 @@ def standardize_dataframe(df, schema):
                 df[col] = pd.to_numeric(df[col], errors='coerce')
                 if dtype == 'int':
                     df[col] = df[col].astype('Int64')
-            elif dtype == 'Timestamp':
+            elif dtype in ['Timestamp', 'datetime']:
                 df[col] = pd.to_datetime(df[col], format='%d.%m.%Y', errors='coerce')
             elif dtype == 'category':
                 df[col] = df[col].astype('category')
@@ -135,57 +198,50 @@ async def read_data(spatial_range, time_range, data_range, level):
             logging.warning("No xlsx links found.")
             return pd.DataFrame()
 
-        all_data = []
-        for xlsx_url, _ in tqdm(xlsx_links, desc="Processing files"):
-            df = await process_xlsx(xlsx_url, client)
-            if not df.empty:
-                valid_columns = [col for col in selected_columns.keys() if col in df.columns]
-                if valid_columns:
-                    df = df[valid_columns].rename(columns=selected_columns)
-                    df = standardize_dataframe(df, schema)
-                    # Only append if DataFrame has non-NA data for measurement columns
-                    measurement_cols = [col for col in df.columns if col not in ['id', 'date', 'lat', 'lon']]
-                    if measurement_cols and not df[measurement_cols].isna().all().all():
-                        all_data.append(df)
-                    else:
-                        logging.info(f"Skipped empty or all-NA DataFrame from {xlsx_url}")
-
-        if not all_data:
-            logging.warning("No valid data collected from any file.")
-            return pd.DataFrame()
-
-        final_df = pd.concat(all_data, ignore_index=True)
-        final_df.dropna(how='all', inplace=True)
-
-        unique_points = final_df[['id', 'lat', 'lon']].drop_duplicates()
-        coordinates = prepare_coordinates(coordinates=unique_points, spatial_range=spatial_range, level=level)
-        if coordinates is None or coordinates.empty:
-            logging.info("No coordinates within spatial range.")
-            return pd.DataFrame()
-
-        valid_ids = coordinates['id'].unique()
-        final_df = final_df[final_df['id'].isin(valid_ids)]
-
-        time_from, time_to = pd.to_datetime(time_range[0]), pd.to_datetime(time_range[1])
-        final_df = final_df[(final_df['date'] >= time_from) & (final_df['date'] <= time_to)]
-
-        # Select numeric columns based on data_range
-        category_columns = {col for col, cat in DATA_ALIASES.items() if cat in data_range}
-        available_columns = [col for col in category_columns if col in final_df.columns]
-        if not available_columns:
-            logging.warning("No data columns found for the requested categories.")
-            return pd.DataFrame()
-
-        # Ensure numeric columns
-        final_df[available_columns] = final_df[available_columns].apply(pd.to_numeric, errors='coerce')
-
-        final_df = final_df[['id', 'date'] + available_columns]
-        final_df = final_df.merge(coordinates[['id', 'S2CELL']], on='id')
-        final_df = final_df.rename({'date':'Timestamp'},axis=1)
-
-        # Set MultiIndex
-        final_df = final_df.set_index(['Timestamp', 'S2CELL'])
-
-        # Pivot the DataFrame asynchronously
-        final_df_pivot = final_df.pivot_table(index='Timestamp', columns='S2CELL')
-        return final_df_pivot
+        # Download and convert the workbooks concurrently
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_DOWNLOADS)
+        paths = await tqdm.gather(*[process_xlsx(xlsx_url, client, semaphore) for xlsx_url, _ in xlsx_links],
+                                  desc="Processing files")
+
+    # Select numeric columns based on data_range
+    category_columns = {col for col, cat in DATA_ALIASES.items() if cat in data_range}
+    available_columns = [col for col in category_columns if col in schema]
+    if not available_columns:
+        logging.warning("No data columns found for the requested categories.")
+        return pd.DataFrame()
+
+    # Read only the needed columns and records from the converted workbooks
+    all_data = []
+    for path in paths:
+        if path is None:
+            continue
+        df = await asyncio.to_thread(read_table, path, available_columns, spatial_range, time_range)
+        # Only append if DataFrame has non-NA data for measurement columns
+        if not df.empty and not df[available_columns].isna().all().all():
+            all_data.append(df)
+
+    if not all_data:
+        logging.warning("No valid data collected from any file.")
+        return pd.DataFrame()
+
+    final_df = pd.concat(all_data, ignore_index=True)
+
+    unique_points = final_df[['id', 'lat', 'lon']].drop_duplicates()
+    coordinates = StationRegistry(unique_points).select(spatial_range, level)
+    if coordinates is None or coordinates.empty:
+        logging.info("No coordinates within spatial range.")
+        return pd.DataFrame()
+
+    # Ensure numeric columns
+    final_df[available_columns] = final_df[available_columns].apply(pd.to_numeric, errors='coerce')
+
+    final_df = final_df[['id', 'date'] + available_columns]
+    final_df = final_df.merge(coordinates[['id', 'S2CELL']], on='id')
+    final_df = final_df.rename({'date':'Timestamp'},axis=1)
+
+    # Set MultiIndex
+    final_df = final_df.set_index(['Timestamp', 'S2CELL'])
+
+    # Pivot the DataFrame asynchronously
+    final_df_pivot = final_df.pivot_table(index='Timestamp', columns='S2CELL')
+    return final_df_pivot
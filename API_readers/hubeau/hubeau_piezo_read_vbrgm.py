@@ -1,6 +1,8 @@
 import pandas as pd
 from API_readers.hubeau.hubeau_mappings.hubeau_mapping_piezo import MAPPING
+from API_readers.hubeau.hubeau_store import read_stations
 from utils.coordinates_to_cells import prepare_coordinates
+from utils.station_registry import load_registry
 import warnings
 from utils.data_operators import flatten_list
 import asyncio
@@ -10,45 +12,30 @@ import asyncio
 import hubeaupyutils as hub
 
 
-async def fetch_data(api, pt_id, he_period_bounds, data_requested_varnames, verbose_level):
+async def fetch_data(client, pt_ids, date_debut, verbose_level):
     """
-    Asynchronous function to fetch data for a specific point.
+    Asynchronous function to fetch all data of a list of points from a start date, requested by batches of stations.
     """
     if verbose_level >= 1:
-        print(f"Fetching data for point ID: {pt_id} for variables: {data_requested_varnames}")
-
-    try:
-        # Fetch data using the hub API (Note: Here argument names are specific to the hubeaupyutils lib functions,
-        # and thus differ from the online HubEau API parameters.)
-        df = await asyncio.to_thread(
-            api.get_data,
-            code_station=pt_id,
-            start_date=he_period_bounds[0],
-            end_date=he_period_bounds[1],
-            only_valid_data=True, # Remark: This will also filter out "dynamic" water levels... but that is okay for
-            # the purposes of the study.
-            add_real_time=False,
-            verbose=(verbose_level >= 2)
-        )
-
-        # Column names of df at this stage (output from 1 api.get_data call):
-        #   date & indice as 2 indexes; and a value regular column
-
-        # Ensure proper DataFrame formatting Remark: Those column names and contents result from special formatting
-        # of the output by hubeaupyutils lib's "piezometry" wrapper (e.g., 'indice').
-        if not df.empty:
-            df = df.rename_axis(['date_mesure','xINDICEx']).reset_index().drop(columns=['xINDICEx']).rename(columns={"value": "niveau_nappe_eau"})
-            df['code_bss_old'] = pt_id
-            if verbose_level >= 2:
-                print(f"Data fetched for point {pt_id}:")
-                print(df.head())
-        
-        # Output table column names (if not empty): date_mesure, niveau_nappe_eau, code_bss_old.
-        return df
-    except Exception as e:
-        if verbose_level >= 1:
-            print(f"Error fetching data for point {pt_id}: {e}")
-        return None
+        print(f"Fetching data for {len(pt_ids)} point IDs from {date_debut}")
+
+    # Fetch data using the shared async HubEau client (Note: Here argument names are those of the online HubEau
+    # API parameters, as in the hubeaupyutils "piezometry" wrapper.)
+    return await client.get_data_by_station(
+        'piezometry',
+        station_param='code_bss',
+        codes=pt_ids,
+        station_field='code_bss',
+        date_debut_mesure=date_debut,
+        date_params=('date_debut_mesure', 'date_fin_mesure'), # (one record per day)
+        # Fields transmitted by HubEau (fixed schema of the page batches), including those of the validity filter:
+        columns=['code_bss', 'date_mesure', 'niveau_nappe_eau', 'qualification', 'code_nature_mesure'],
+        fields=['date_mesure', 'niveau_nappe_eau'],
+        only_valid_data=True, # Remark: This will also filter out "dynamic" water levels... but that is okay for
+        # the purposes of the study.
+        verbose=(verbose_level >= 2),
+        **hub.DEFAULT_PARAMS
+    )
 
 
 async def read_data(spatial_range, time_range, data_range, level, nmax_pts=None, verbose_level=0):
@@ -133,8 +120,9 @@ async def read_data(spatial_range, time_range, data_range, level, nmax_pts=None,
         print("\nPOINTS...\n")
         print("Selecting France GW LEVEL monitoring points (Piezometers) inside the Spatial Range...")
 
-    coors = pd.read_csv(r'API_readers/hubeau/constants/farmwise_gwquantity_piezos_sel_for_hubeau.csv')
-    coordinates = prepare_coordinates(coordinates=coors, spatial_range=spatial_range, level=level)
+    registry = await asyncio.to_thread(load_registry,
+                                       r'API_readers/hubeau/constants/farmwise_gwquantity_piezos_sel_for_hubeau.csv')
+    coordinates = registry.select(spatial_range, level)
 
     # Exiting here if no point was selected (0 point found in the specified spatial_range):
     if coordinates is None:
@@ -184,18 +172,21 @@ async def read_data(spatial_range, time_range, data_range, level, nmax_pts=None,
     if (verbose_level >= 1):
         print("\nDOWNLOADING: HubEau (France) GW Quantity (GW LEVEL) data...\n")
 
-    # Initialisation of the hubeaupyutils API object
-    api = hub.init_api('piezometry')
-
-    # Prepare tasks for asynchronous data fetching
-    tasks = [
-        fetch_data(api, pt_id, he_period_bounds, data_requested_varnames, verbose_level)
-        for pt_id in pt_ids_lst
-    ]
-    responses = await asyncio.gather(*tasks)
-
-    # Collect and process responses
-    accum_dfs = [df for df in responses if df is not None and not df.empty]
+    # Asynchronous data fetching through one pool of connections (batches of stations, bounded concurrency, retries)
+    # Only the records after the last stored ones are downloaded, the others are served by the local store
+    async with hub.AsyncHubeauClient() as client:
+        data = await read_stations('piezometry', pt_ids_lst, he_period_bounds,
+                                   lambda codes, date_debut: fetch_data(client, codes, date_debut, verbose_level))
+
+    # Data of each point (date as index; and a niveau_nappe_eau regular column)
+    for pt_id, df in data.items():
+        df = df.rename_axis('date_mesure').reset_index()
+        df['code_bss_old'] = pt_id
+        if verbose_level >= 2:
+            print(f"Data of point {pt_id}:")
+            print(df.head())
+        accum_dfs.append(df)
+    # Column names of accum_dfs tables: date_mesure, niveau_nappe_eau, code_bss_old.
 
     if not accum_dfs:
         return None
@@ -0,0 +1,151 @@
+import asyncio
+from contextlib import suppress
+import hashlib
+import json
+import os
+import warnings
+import httpx
+import pandas as pd
+from utils.atomic_write import atomic_path, atomic_write
+
+STORE_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'store')
+
+
+def dataset_key(name, codes):
+    """
+    Name the store folder of a dataset synchronised for a set of parameter codes, so that a change of the requested
+    parameters starts a new store instead of serving incomplete series.
+
+    :param name: Name of the HubEau dataset (e.g. 'groundwater_qual').
+    :param codes: List of parameter codes.
+    :return: Folder name, e.g. 'groundwater_qual_1a2b3c4d'.
+    """
+    key = hashlib.sha1(','.join(sorted(map(str, codes))).encode('utf-8')).hexdigest()[:8]
+    return f"{name}_{key}"
+
+
+def _station_paths(dataset, code, store_dir):
+    """
+    Build the paths of the stored series of a station and of its metadata file.
+
+    :param dataset: Name of the HubEau dataset (e.g. 'piezometry').
+    :param code: Station code (may contain '/', hence the hashed file name).
+    :param store_dir: Folder holding the store.
+    :return: Tuple (series path, metadata path).
+    """
+    key = hashlib.sha1(str(code).encode('utf-8')).hexdigest()
+    series_path = os.path.join(store_dir, dataset, key + '.parquet')
+    return series_path, os.path.join(store_dir, dataset, key + '.json')
+
+
+def read_station(dataset, code, store_dir=STORE_DIR):
+    """
+    Read the stored series of a station.
+
+    :param dataset: Name of the HubEau dataset.
+    :param code: Station code.
+    :param store_dir: Folder holding the store.
+    :return: Tuple (DataFrame indexed by date, metadata dict) or (None, None) if the station is not stored.
+    """
+    series_path, meta_path = _station_paths(dataset, code, store_dir)
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        df = pd.read_parquet(series_path) if os.path.exists(series_path) else pd.DataFrame()
+    except (OSError, ValueError):
+        return None, None
+    return df, meta
+
+
+def write_station(dataset, code, df, meta, store_dir=STORE_DIR):
+    """
+    Store the series of a station and its metadata; both are written to temporary files first and moved into place.
+
+    :param dataset: Name of the HubEau dataset.
+    :param code: Station code.
+    :param df: DataFrame indexed by date.
+    :param meta: Metadata dict: 'start' (first date covered), 'mark' (date of the last record or None)
+                 and 'checked' (date of the last synchronisation).
+    :param store_dir: Folder holding the store.
+    """
+    series_path, meta_path = _station_paths(dataset, code, store_dir)
+    if df.empty:
+        with suppress(FileNotFoundError):
+            os.remove(series_path)
+    else:
+        with atomic_path(series_path) as temp_path:
+            df.to_parquet(temp_path)
+    atomic_write(meta_path, json.dumps({'code': str(code), **meta}))
+
+
+async def read_stations(dataset, codes, time_range, fetch, store_dir=None):
+    """
+    Serve the series of HubEau stations from the local store, downloading only what is missing.
+
+    A station is synchronised up to the day it was last checked. When the requested range ends after that day, only
+    the records from its high-water mark (month of the last stored record) onwards are downloaded and replace the
+    stored tail. Stations requested before their first stored date are downloaded again from the requested start.
+    Stations sharing the same download start date are fetched together. Stations missing from a download are left
+    untouched (neither rewritten nor marked as checked), so that a failed request never truncates the store.
+
+    :param dataset: Name of the HubEau dataset (a folder of the store).
+    :param codes: List of station codes.
+    :param time_range: A tuple of the start and end dates (str, YYYY-mm-dd).
+    :param fetch: Async callable (codes, date_debut) returning a dict {station code: DataFrame indexed by date} of
+                  all records from date_debut onwards.
+    :param store_dir: Folder holding the store (STORE_DIR by default).
+    :return: Dict {station code: DataFrame indexed by date within time_range}, stations without data are missing.
+    :raises: Any error of `fetch` other than httpx.HTTPError and RuntimeError (HubEau errors).
+    """
+    store_dir = store_dir or STORE_DIR
+    start, end = pd.Timestamp(time_range[0]), pd.Timestamp(time_range[1])
+    today = pd.Timestamp.now().normalize()
+    codes = list(dict.fromkeys(map(str, codes)))
+
+    stored = {}
+    groups = {}
+    for code in codes:
+        df, meta = await asyncio.to_thread(read_station, dataset, code, store_dir)
+        stored[code] = (df, meta)
+        if meta is None or start < pd.Timestamp(meta['start']):
+            groups.setdefault(start, []).append(code)
+        elif end > pd.Timestamp(meta['checked']):
+            mark = pd.Timestamp(meta['mark'] or meta['start'])
+            groups.setdefault(max(mark.replace(day=1), pd.Timestamp(meta['start'])), []).append(code)
+
+    date_debuts = list(groups)
+    responses = await asyncio.gather(*[fetch(groups[date_debut], "{:%Y-%m-%d}".format(date_debut))
+                                       for date_debut in date_debuts], return_exceptions=True)
+
+    for date_debut, response in zip(date_debuts, responses):
+        if isinstance(response, (httpx.HTTPError, RuntimeError)):
+            warnings.warn(f"HubEau not responding, stored {dataset} data are used: {response}")
+            continue
+        if isinstance(response, BaseException):
+            raise response
+        for code in groups[date_debut]:
+            if code not in response:
+                continue
+            df, meta = stored[code]
+            new = response[code]
+            if df is not None and not df.empty:
+                # Downloaded records replace the stored tail
+                new = pd.concat([df[df.index < date_debut], new])
+            new = new.sort_index()
+            meta = {
+                'start': "{:%Y-%m-%d}".format(min(date_debut, pd.Timestamp(meta['start'])) if meta else date_debut),
+                'mark': "{:%Y-%m-%d}".format(new.index.max()) if not new.empty else None,
+                'checked': "{:%Y-%m-%d}".format(today)
+            }
+            await asyncio.to_thread(write_station, dataset, code, new, meta, store_dir)
+            stored[code] = (new, meta)
+
+    data = {}
+    for code in codes:
+        df, meta = stored[code]
+        if df is None or df.empty:
+            continue
+        df = df[(df.index >= start) & (df.index < end + pd.Timedelta(days=1))]
+        if not df.empty:
+            data[code] = df
+    return data
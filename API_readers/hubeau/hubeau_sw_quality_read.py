@@ -1,6 +1,8 @@
 import pandas as pd
 from API_readers.hubeau.hubeau_mappings.hubeau_mapping_sw_quality import MAPPING, CODES, PARAMETERS_MAPPING
+from API_readers.hubeau.hubeau_store import dataset_key, read_stations
 from utils.coordinates_to_cells import prepare_coordinates
+from utils.station_registry import load_registry
 import warnings
 from utils.data_operators import flatten_list
 import asyncio
@@ -8,45 +10,37 @@ import asyncio
 # Important reminder: "hubeaupyutils" is a library that must be installed running/using this API reader, cf. file "hubeaupyutils-main.tar.gz"
 import hubeaupyutils as hub
 
+# Estimated number of samples of a station per day (about one a month), used to keep requests below the
+# total size limit of HubEau (refused requests are split further by the client)
+SAMPLES_PER_DAY = 1 / 30
 
-async def fetch_data(api, pt_id, he_period_bounds, data_requested_codes, verbose_level):
+
+async def fetch_data(client, pt_ids, date_debut, data_codes, he_req_fields, bbox, verbose_level):
     """
-    Asynchronous function to fetch data for a specific point.
+    Asynchronous function to fetch all data of a list of points from a start date, requested by batches of stations
+    (or by bbox).
     """
     if verbose_level >= 1:
-        print(f"Fetching data for point ID: {pt_id} with parameters: {data_requested_codes}")
-
-    try:
-        # TMP DEV TEST here we test getting info on the monitoring STATION (before the Time Series data):
-        # dftest = api.get_station(code_station=pt_id)
-        # print(dftest)
-        
-        # Fetch data using the hub API
-        df = await asyncio.to_thread(
-            api.get_data,
-            code_station=pt_id,
-            code_parametre=data_requested_codes,
-            code_support='3', # Code 3 = 'Eau' (only data for water)
-            # Note that start_date, end_date arguments are not yet defined in api(HubQualRiv).get_data function,
-            # that is why we use the HubEau online API official argument names here:
-            date_debut_prelevement=he_period_bounds[0],
-            date_fin_prelevement=he_period_bounds[1],
-            # Ignore data qualified of Incorrect ou Uncertain:
-            code_qualification='0,1,4'
-            # NOT AVAILABLE in hub lib for this type of data: only_valid_data=True
-        )
-
-        # Ensure proper DataFrame formatting
-        if not df.empty:
-            df = df.rename_axis('date_debut_prelevement').reset_index()
-            if verbose_level >= 2:
-                print(f"Data fetched for point {pt_id}:")
-                print(df.head())
-        return df
-    except Exception as e:
-        if verbose_level >= 1:
-            print(f"Error fetching data for point {pt_id}: {e}")
-        return None
+        print(f"Fetching data for {len(pt_ids)} point IDs from {date_debut} with parameters: {data_codes}")
+
+    # Fetch data using the shared async HubEau client
+    return await client.get_data_by_station(
+        'river_qual',
+        station_param='code_station',
+        codes=pt_ids,
+        station_field='code_station',
+        bbox=bbox,
+        code_parametre=data_codes,
+        code_support='3', # Code 3 = 'Eau' (only data for water)
+        # HubEau online API official argument names are used here:
+        date_debut_prelevement=date_debut,
+        date_params=('date_debut_prelevement', 'date_fin_prelevement'),
+        records_per_day=len(data_codes) * SAMPLES_PER_DAY, # (one record per parameter and sample)
+        columns=he_req_fields, # (fixed schema of the page batches)
+        # Ignore data qualified of Incorrect ou Uncertain:
+        code_qualification='0,1,4'
+        # NOT AVAILABLE in hub lib for this type of data: only_valid_data=True
+    )
 
 
 async def read_data(spatial_range, time_range, data_range, level, nmax_pts=None, verbose_level=0):
@@ -61,9 +55,6 @@ async def read_data(spatial_range, time_range, data_range, level, nmax_pts=None,
     """
     url = 'https://hubeau.eaufrance.fr/api/v2/qualite_rivieres/analyse_pc' # NOT USED IN THIS SCRIPT (but indireclty via hub)
 
-    # NO MORE NEEDED: north, south, east, west = spatial_range
-    # NO MORE NEEDED: bbox = [west, south, east, north]  # Create bbox
-
     # Protection in case of bad type of argument data_range:
     # because without this conversion, next operations would fragment the string to a list of individual characters!
     if isinstance(data_range, str):
@@ -128,10 +119,12 @@ async def read_data(spatial_range, time_range, data_range, level, nmax_pts=None,
         print("\nPOINTS...\n")
         print("Selecting France SW monitoring STATIONS (points x long.,y lat.) inside the Spatial Range...")
 
-    coords = pd.read_csv(r'API_readers/hubeau/constants/farmwise_sw_quality_stations_sel_for_hubeau.csv')
-    # Renaming to make compatible with the function:
-    coords.rename(columns={'x_longitude':'lon', 'y_latitude':'lat'}, inplace=True)
-    coordinates = prepare_coordinates(coordinates=coords, spatial_range=spatial_range, level=level)
+    # (station codes are read as text, to keep their leading zeros, e.g. "01000274")
+    # (renaming the coordinates columns to the registry's 'lat' and 'lon')
+    registry = await asyncio.to_thread(load_registry,
+                                       r'API_readers/hubeau/constants/farmwise_sw_quality_stations_sel_for_hubeau.csv',
+                                       rename={'x_longitude': 'lon', 'y_latitude': 'lat'}, dtype={'code_station': str})
+    coordinates = registry.select(spatial_range, level)
 
     # Exiting here if no point was selected (0 point found in the specified spatial_range):
     if coordinates is None:
@@ -161,6 +154,11 @@ async def read_data(spatial_range, time_range, data_range, level, nmax_pts=None,
     # LIST of dataframes to accumulate what we get for the N points (inside the loop below)
     accum_dfs = []
 
+    # List of required fields in the output from HubEau, specified to reduce the nb of columns of data transmitted by
+    # HubEau, and thus to make the get ops faster (Remark: in the V2 API, the sampling date is 'date_prelevement')
+    he_req_fields = ['code_station', 'latitude', 'longitude', 'code_parametre', 'libelle_parametre', 'resultat',
+                     'symbole_unite', 'code_remarque', 'date_prelevement', 'libelle_support', 'libelle_fraction']
+
     # Date (extraction period) parameters for the HubEau query:
     # (input argument should be text dates YYYY-mm-dd, else datetime/timestamp compatible types)
     he_period_bounds = [None, None]  # (list, not tuple)
@@ -181,18 +179,34 @@ async def read_data(spatial_range, time_range, data_range, level, nmax_pts=None,
     if (verbose_level >= 1):
         print("\nDOWNLOADING: HubEau (France) SW Quality (Naïades) data...\n")
 
-    # Initialisation of the hubeaupyutils API object
-    api = hub.init_api('river_qual', version=2) # (Important to use V2!)
-
-    # Prepare tasks for asynchronous data fetching
-    tasks = [
-        fetch_data(api, pt_id, he_period_bounds, data_requested_codes, verbose_level)
-        for pt_id in pt_ids_lst
-    ]
-    responses = await asyncio.gather(*tasks)
-
-    # Collect and process responses
-    accum_dfs = [df for df in responses if (df is not None) and (not df.empty)]
+    # Bounding box of the query (used by HubEau when many points are selected):
+    north, south, east, west = spatial_range
+    bbox = [west, south, east, north]
+
+    # Asynchronous data fetching through one pool of connections (batches of stations, bounded concurrency, retries)
+    # Only the records after the last stored ones are downloaded, the others are served by the local store.
+    # Each requested FARMWISE parameter is stored separately, so that only its codes are downloaded and a parameter
+    # already synchronised is served by the store whatever the other parameters requested.
+    code_groups = list(dict.fromkeys(tuple(sorted(set(flatten_list([PARAMETERS_MAPPING[key]]))))
+                                     for key in sorted(data_requested_keys_set)))
+    async with hub.AsyncHubeauClient(version=2) as client: # (Important to use V2!)
+        responses = await asyncio.gather(*[
+            read_stations(dataset_key('river_qual', list(data_codes)), pt_ids_lst, he_period_bounds,
+                          lambda codes, date_debut, data_codes=list(data_codes): fetch_data(
+                              client, codes, date_debut, data_codes, he_req_fields, bbox, verbose_level))
+            for data_codes in code_groups
+        ])
+
+    # Ensure proper DataFrame formatting
+    for data_codes, data in zip(code_groups, responses):
+        for pt_id, df in data.items():
+            df = df.rename_axis('date_debut_prelevement').reset_index()
+            df = df[df['code_parametre'].astype(str).isin(data_codes)]
+            if verbose_level >= 2:
+                print(f"Data of point {pt_id}:")
+                print(df.head())
+            accum_dfs.append(df)
+    accum_dfs = [df for df in accum_dfs if not df.empty]
 
     if not accum_dfs:
         return None
@@ -1,6 +1,8 @@
 import pandas as pd
 from API_readers.hubeau.hubeau_mappings.hubeau_mapping_wq import MAPPING, CODES, PARAMETERS_MAPPING
+from API_readers.hubeau.hubeau_store import dataset_key, read_stations
 from utils.coordinates_to_cells import prepare_coordinates
+from utils.station_registry import load_registry
 import warnings
 from utils.data_operators import flatten_list
 import asyncio
@@ -8,36 +10,33 @@ import asyncio
 # Important reminder: "hubeaupyutils" is a library that must be installed running/using this API reader, cf. file "hubeaupyutils-main.tar.gz"
 import hubeaupyutils as hub
 
+# Estimated number of samples of a station per day (about one a month), used to keep requests below the
+# total size limit of HubEau (refused requests are split further by the client)
+SAMPLES_PER_DAY = 1 / 30
 
-async def fetch_data(api, pt_id, he_period_bounds, data_requested_codes, verbose_level):
+
+async def fetch_data(client, pt_ids, date_debut, data_codes, he_req_fields, bbox, verbose_level):
     """
-    Asynchronous function to fetch data for a specific point.
+    Asynchronous function to fetch all data of a list of points from a start date, requested by batches of stations
+    (or by bbox).
     """
     if verbose_level >= 1:
-        print(f"Fetching data for point ID: {pt_id} with parameters: {data_requested_codes}")
-
-    try:
-        # Fetch data using the hub API
-        df = await asyncio.to_thread(
-            api.get_data,
-            code_station=pt_id,
-            date_debut_prelevement=he_period_bounds[0],
-            date_fin_prelevement=he_period_bounds[1],
-            code_param=data_requested_codes,
-            only_valid_data=True
-        )
-
-        # Ensure proper DataFrame formatting
-        if not df.empty:
-            df = df.rename_axis('date_debut_prelevement').reset_index()
-            if verbose_level >= 2:
-                print(f"Data fetched for point {pt_id}:")
-                print(df.head())
-        return df
-    except Exception as e:
-        if verbose_level >= 1:
-            print(f"Error fetching data for point {pt_id}: {e}")
-        return None
+        print(f"Fetching data for {len(pt_ids)} point IDs from {date_debut} with parameters: {data_codes}")
+
+    # Fetch data using the shared async HubEau client ("bss_id" accepts old and new BSS codes)
+    return await client.get_data_by_station(
+        'groundwater_qual',
+        station_param='bss_id',
+        codes=pt_ids,
+        station_field='bss_id',
+        bbox=bbox,
+        date_debut_prelevement=date_debut,
+        date_params=('date_debut_prelevement', 'date_fin_prelevement'),
+        records_per_day=len(data_codes) * SAMPLES_PER_DAY, # (one record per parameter and sample)
+        code_param=data_codes,
+        columns=he_req_fields, # (fixed schema of the page batches)
+        only_valid_data=True
+    )
 
 
 async def read_data(spatial_range, time_range, data_range, level, nmax_pts=None, verbose_level=0):
@@ -52,9 +51,6 @@ async def read_data(spatial_range, time_range, data_range, level, nmax_pts=None,
     """
     url = 'https://hubeau.eaufrance.fr/api/v1/qualite_nappes/analyses'
 
-    # NO MORE NEEDED: north, south, east, west = spatial_range
-    # NO MORE NEEDED: bbox = [west, south, east, north]  # Create bbox
-
     # Protection in case of bad type of argument data_range:
     # because without this conversion, next operations would fragment the string to a list of individual characters!
     if isinstance(data_range, str):
@@ -123,8 +119,9 @@ async def read_data(spatial_range, time_range, data_range, level, nmax_pts=None,
         print("\nPOINTS...\n")
         print("Selecting France GW monitoring points inside the Spatial Range...")
 
-    coors = pd.read_csv(r'API_readers/hubeau/constants/farmwise_gwquality_points_sel_for_hubeau.csv')
-    coordinates = prepare_coordinates(coordinates=coors, spatial_range=spatial_range, level=level)
+    registry = await asyncio.to_thread(load_registry,
+                                       r'API_readers/hubeau/constants/farmwise_gwquality_points_sel_for_hubeau.csv')
+    coordinates = registry.select(spatial_range, level)
 
     # Exiting here if no point was selected (0 point found in the specified spatial_range):
     if coordinates is None:
@@ -179,18 +176,34 @@ async def read_data(spatial_range, time_range, data_range, level, nmax_pts=None,
     if (verbose_level >= 1):
         print("\nDOWNLOADING: HubEau (France) GW Quality data...\n")
 
-    # Initialisation of the hubeaupyutils API object
-    api = hub.init_api('groundwater_qual')
-
-    # Prepare tasks for asynchronous data fetching
-    tasks = [
-        fetch_data(api, pt_id, he_period_bounds, data_requested_codes, verbose_level)
-        for pt_id in pt_ids_lst
-    ]
-    responses = await asyncio.gather(*tasks)
-
-    # Collect and process responses
-    accum_dfs = [df for df in responses if df is not None and not df.empty]
+    # Bounding box of the query (used by HubEau when many points are selected):
+    north, south, east, west = spatial_range
+    bbox = [west, south, east, north]
+
+    # Asynchronous data fetching through one pool of connections (batches of stations, bounded concurrency, retries)
+    # Only the records after the last stored ones are downloaded, the others are served by the local store.
+    # Each requested FARMWISE parameter is stored separately, so that only its codes are downloaded and a parameter
+    # already synchronised is served by the store whatever the other parameters requested.
+    code_groups = list(dict.fromkeys(tuple(sorted(set(flatten_list([PARAMETERS_MAPPING[key]]))))
+                                     for key in sorted(data_requested_keys_set)))
+    async with hub.AsyncHubeauClient() as client:
+        responses = await asyncio.gather(*[
+            read_stations(dataset_key('groundwater_qual', list(data_codes)), pt_ids_lst, he_period_bounds,
+                          lambda codes, date_debut, data_codes=list(data_codes): fetch_data(
+                              client, codes, date_debut, data_codes, he_req_fields, bbox, verbose_level))
+            for data_codes in code_groups
+        ])
+
+    # Ensure proper DataFrame formatting
+    for data_codes, data in zip(code_groups, responses):
+        for pt_id, df in data.items():
+            df = df.rename_axis('date_debut_prelevement').reset_index()
+            df = df[df['code_param'].astype(str).isin(data_codes)]
+            if verbose_level >= 2:
+                print(f"Data of point {pt_id}:")
+                print(df.head())
+            accum_dfs.append(df)
+    accum_dfs = [df for df in accum_dfs if not df.empty]
 
     if not accum_dfs:
         return None
@@ -215,18 +228,23 @@ async def read_data(spatial_range, time_range, data_range, level, nmax_pts=None,
 
     # Selecting columns to discard some columns that are not used anymore (for now)
     df = df[['bss_id', 'latitude', 'longitude', 'nom_param', 'resultat', 'symbole_unite', 'date_debut_prelevement']]
-    # TODO (Marc) MAYBE: ADD 'code_remarque_analyse' ... but HOW, and what to do then in .pivot_table() !? (TO discuss in 2025)
+    # TODO (Marc) MAYBE: ADD 'code_remarque_analyse' ... but HOW, and what to do then in the aggregation !? (TO discuss in 2025)
 
     # Removing fully redundant data rows, if any (altough it should not)
     df = df.drop_duplicates()
 
+    # P2O5 to P, for each analysis expressed in mg(P2O5)/L:
+    p2o5_rows = (df['nom_param'] == 'Phosphore total') & (df['symbole_unite'] == 'mg(P2O5)/L')
+    df.loc[p2o5_rows, 'resultat'] *= 0.436
+    # TODO (TO discuss in 2025) Marc thinks it would be better & more robust workflow if we included the units info in the output. But for now, it is removed here.
+
     # DEVELOPER NOTE: I have chosen to aggregate with point_id, in case there would be unexcepted variability
     # in the point's coordinate values (although it should not).
     # Still we assume that for a given point (bss_id) we should always get the same lat,long (unique) coordinate values,
     # so that we can get a point's coordinates from its first values of 'latitude' and 'longitude' (see below).
 
-    # This reference DataFrame of point coordinates (df_ref_coords) will be used later to merge those coordinates back
-    # with the point they belong to. That is used here because we prefer to aggregate by point_id rather than lat,long.
+    # This reference DataFrame of point coordinates (df_ref_coords) is used to compute the S2CELL of each point once,
+    # rather than for each analysis.
     df_ref_coords = df[['bss_id', 'latitude', 'longitude']].rename(
         {'bss_id': 'point_id', 'latitude': 'lat', 'longitude': 'lon'}, axis=1).groupby(
         'point_id').first()  # (by key = "point_id")
@@ -234,98 +252,38 @@ async def read_data(spatial_range, time_range, data_range, level, nmax_pts=None,
         print("\nPOINT COORDINATES ref. DataFrame df_ref_coords =")
         print(df_ref_coords)
 
-    # Aggregating the data by Point ID and by Date,
-    # with aggregated value = mean of raw values, and info on measurement units = first (heading) most frequent (mode) text info)
-    df = pd.pivot_table(df, index=['bss_id', 'date_debut_prelevement'],
-                        columns='nom_param',
-                        values=['resultat', 'symbole_unite'],
-                        aggfunc={'resultat': 'mean', 'symbole_unite': lambda x: x.mode().head(
-                            1)}).reset_index()  # (protected in case of symbole_unite all empty = None)
-    df = df.rename({'bss_id': 'point_id', 'date_debut_prelevement': 'Timestamp'}, axis=1)
-
-    # Reminder of the DataFrame format at this stage:
-    # It looks like this (example):
-    #
-    #                point_id  Timestamp resultat                 symbole_unite
-    #    nom_param                        Nitrates Phosphore total      Nitrates Phosphore total
-    #    0          BSS000QSNW 2020-05-19     64.0             NaN     mg(NO3)/L             NaN
-    #    1          BSS000QSNW 2020-06-03     64.0           0.080     mg(NO3)/L         mg(P)/L
-    #
-    # That is, the columns have two levels: two outer 'groups' (resultat, symbole_unite) and
-    # as many inner columns inside those groups as there are parameters (here = 2 substances).
-
-    # TODO Marc please CHECK if this works!!? Not sure it does: 'resultat' column no more existing I think??
-    phosphore_column = [x for x in df.columns if "Phosphore total" in x]
-    if len(phosphore_column) > 0:  # P2O5 to P
-        df.loc[df.loc[:, ('symbole_unite', 'Phosphore total')] == 'mg(P2O5)/L', (
-        'resultat', 'Phosphore total')] *= 0.436  # (inplace multiplication)
-        df.loc[df.loc[:, ('symbole_unite', 'Phosphore total')] == 'mg(P2O5)/L', (
-        'symbole_unite', 'Phosphore total')] = "mg(P)/L"  # (updating the unit)
-
-    # Simplifying the DataFrame:
-    # TODO (TO discuss in 2025) Marc thinks it would be better & more robust workflow if we included the units info in the output. But for now, it is removed here:
-    df = df[[x for x in df.columns if 'unite' not in x[0]]]  # drop columns having a name "*unite*"
-    df = df.droplevel(0, axis=1)  # clear the "resultat" columns' grouping (multi-indexing) to get normal columns
-    df.columns = ['point_id', 'Timestamp'] + list(df.columns[
-                                                  2:])  # setting names for the first columns and use the others' (Reminder: column index starts at [0])
-
-    df = df.rename(MAPPING,
-                   axis=1)  # Map the values-of-interest columns with Parameter names, to English FARMWISE-defined parameter names
-
     # Computing S2CELLs from the point coordinates:
     tmp_prep_coords_df = prepare_coordinates(df_ref_coords, spatial_range, level)
-    # TODO QUESTION TO ASK ASAP: Should we use the input argument 'level' here (also) or only later in a "Data interpolation" step (not clear yet by the way; see below)
-
-    # Merging the DataFrame of obtained data, with the coordinates(lat,lon)+S2CELL table, to join those columns:
-    df = pd.merge(df, tmp_prep_coords_df, on='point_id', how='left')
-
-    # Spatial aggregation of the measured values, by S2CELL (of the level specified in function's arguments)
-    original_size = df.shape[0]  # for later diagnostic info display
-    df = df.groupby(['S2CELL', 'Timestamp']).agg({
-        'point_id': lambda x: x.nunique(),
-        # to help understand the degree of upscaling (averaging) that took place (if a coarse S2CELL level is used)
-        'lat': 'mean',  # average point coordinates if >1 points in that S2CELL
-        'lon': 'mean',  # ...
-        **{col: 'mean' for col in df.columns if col not in ['point_id', 'Timestamp', 'lat', 'lon', 'S2CELL']}
-        # mean value for each parameter (column of data)
-    }).rename({'point_id': 'nb_points'}, axis=1)
+    if tmp_prep_coords_df is None:
+        return None
+
+    # Long table of the analyses: one row per (S2CELL, Timestamp, parameter) record, with parameter names mapped to
+    # English FARMWISE-defined parameter names, as categorical codes
+    df = pd.DataFrame({
+        'S2CELL': df['bss_id'].map(tmp_prep_coords_df['S2CELL']),
+        'Timestamp': pd.to_datetime(df['date_debut_prelevement']).dt.date,
+        'parameter': df['nom_param'].astype('category').map(lambda name: MAPPING.get(name, name)).astype('category'),
+        'point_id': df['bss_id'],
+        'resultat': df['resultat']
+    }).dropna(subset=['S2CELL'])
+
+    # Spatial and temporal aggregation of the measured values in a single grouped reduction, by S2CELL (of the level
+    # specified in function's arguments), date and parameter: mean value, and number of points (to help understand
+    # the degree of upscaling (averaging) that took place, if a coarse S2CELL level is used)
+    df = df.groupby(['Timestamp', 'parameter', 'S2CELL'], observed=True, sort=False).agg(
+        value=('resultat', 'mean'),
+        nb_points=('point_id', 'nunique')
+    )
 
     # Diagnostic message:
     if (verbose_level >= 0):  # (show it whatever the verbose_level is, because it is an important User Warning)
-        if original_size != df.shape[0]:
+        if (df['nb_points'] > 1).any():
             warnings.warn("Some data were aggregated")
 
-    # Resample days
-    df.reset_index(inplace=True)
-
-    df = df.set_index("Timestamp").groupby('S2CELL').resample('1D').first()
-    # TODO QUESTION: What is this for? Is it really important that the time series in df have a regular 1-day time step here???
-
-    df = df.drop('S2CELL',
-                 axis=1)  # to remove the redundant not-index S2CELL column (now that a duplicate is included in the multi-index)
-    df = df.reset_index()
-    df.Timestamp = pd.to_datetime(df.Timestamp).dt.date
-
-    # TODO QUESTION: Marc does not feel comfortable with this fill operation! Actually, for each combination of ['S2CELL', 'Timestamp'],
-    # there can be a variable number of points with data available for a given parameter, so that the calculated AVERAGE lat,lon coords
-    # for the current S2CELL can vary!
-    # ==> Thus, I would like to know more about the Data Interpolation step that followed this (further below), which may be the reason
-    # for this fill operation I guess!? And if we all agree to abandon "Data Interpolation" for the HubEau POINT-scale time-series data,
-    # I will then suggest that we abandon that fill operation, as well as the daily resample to regular time step (see above)...
-    # ===========> TODO to DISCUSS ASAP... although if we do abandon Data Interpolation, those columns do not play any role thereafter.
-
-    # Removal of the diagnostic column "nb_points", to simplify next steps, notably the call to interpolate():
-    # TODO But this info may be kept in the output in a future version, if it is not a problem in the rest of the tool's workflow? (TO discuss in 2025)
-    df.drop('nb_points', axis=1, inplace=True)
-
-    # At this stage, df looks like:
-    # (columns:)   S2CELL  Timestamp  lat  lon  GW Nitrates (mg/L)  GW Total Phosphorus (mg/L) ...
-
-    df.drop(['lat', 'lon'], axis=1,
-            inplace=True)  # (to remove those two columns, and keep only the S2CELL spatial index)
-
-    # Pivot the DataFrame (to return a DataFrame with distinct increasing Dates in Rows,
+    # Canonical output: a DataFrame with distinct increasing Dates in Rows,
     # observed Parameter names as Column GROUPS, and S2CELLs (with some data for that paramter) as Columns in that group
-    df = df.pivot_table(index='Timestamp', columns='S2CELL')
+    df = df['value'].dropna().unstack(['parameter', 'S2CELL']).sort_index().sort_index(axis=1)
+    df.columns = df.columns.set_names([None, 'S2CELL'])
+    df.columns = df.columns.set_levels(df.columns.levels[0].astype(str), level=0)
 
     return df
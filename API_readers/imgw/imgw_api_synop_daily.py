@@ -1,3 +1,4 @@
+import os
 import httpx
 import pandas as pd
 import warnings
@@ -6,15 +7,119 @@ from urllib.parse import urljoin
 import re
 from zipfile import ZipFile
 import io
-from API_readers.imgw.imgw_mappings.synop_mapping import s_d_COLUMNS, s_d_SELECTION, s_d_t_COLUMNS, s_d_t_SELECTION, DATA_ALIASES, GLOBAL_MAPPING
-from tqdm import tqdm
-from utils.coordinates_to_cells import prepare_coordinates
-from utils.imgw_utils import create_timestamp_from_row, expand_range, get_years_between_dates
+from API_readers.imgw.imgw_mappings.synop_mapping import s_d_COLUMNS, s_d_SELECTION, s_d_t_COLUMNS, s_d_t_SELECTION, DATA_ALIASES, GLOBAL_MAPPING, \
+    s_d_DTYPES, s_d_t_DTYPES
+from utils.download_cache import cached_get
+from utils.station_registry import load_registry
+from utils.imgw_utils import create_timestamps, expand_range, get_years_between_dates, read_station_csv, \
+    read_archive, split_open_years
 from datetime import datetime
 import asyncio
 
 URL = "https://danepubliczne.imgw.pl/data/dane_pomiarowo_obserwacyjne/dane_meteorologiczne/dobowe/synop"
 SPACE_TIME_COLUMNS = ['Station code', 'Year', 'Month', 'Day', 'Code', 'lat', 'lon', 'Name']
+MIRROR_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'mirror')
+ARCHIVE_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'archive')
+MAX_CONCURRENT_DOWNLOADS = 8
+
+
+def _is_historical(folder):
+    """
+    Check whether an IMGW yearly folder covers only past years; such archives are never republished.
+
+    :param folder: Folder name, a single year ('2020') or a range of years ('1960_1965').
+    :return: True if the last year of the folder is before the current year.
+    """
+    return int(folder.split('_')[-1]) < datetime.now().year
+
+
+async def _list_archives(client, folder, semaphore):
+    """
+    List the zip archives published in an IMGW yearly folder.
+
+    :param client: httpx.AsyncClient used for the requests.
+    :param folder: Folder name, a single year ('2020') or a range of years ('1960_1965').
+    :param semaphore: asyncio.Semaphore bounding the number of concurrent requests.
+    :return: List of archive URLs (empty if the listing is unavailable).
+    """
+    url = urljoin(URL + '/', folder)
+    listing = await cached_get(client, url, MIRROR_DIR, revalidate=not _is_historical(folder), semaphore=semaphore)
+    if listing is None:
+        warnings.warn("IMGW server not responding")
+        return []
+    # Parse HTML to find file links
+    soup = BeautifulSoup(listing, 'html.parser')
+    links = soup.find_all('a')
+    file_names = [link['href'] for link in links if '.' in link['href']]
+    return [urljoin(url + '/', file_name) for file_name in file_names]
+
+
+async def download_archives(years):
+    """
+    Download (through the local mirror) all IMGW synop zip archives covering the given years.
+
+    :param years: List of years as strings.
+    :return: List of archive contents (None entries for failed downloads), or None if IMGW is not responding.
+    """
+    async with httpx.AsyncClient(follow_redirects=True) as client:
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_DOWNLOADS)
+        listing = await cached_get(client, URL, MIRROR_DIR, semaphore=semaphore)
+        if listing is None:
+            warnings.warn("IMGW server not responding")
+            return None
+
+        # Parse the HTML content
+        soup = BeautifulSoup(listing, 'html.parser')
+
+        # Find all links (assuming directory listing is in <a> tags)
+        links = soup.find_all('a')
+
+        # Extract folder names
+        folders = [link['href'].replace('/','') for link in links if link['href'].endswith('/')]
+        folders = [year for year in folders if re.match(r'^\d{4}(_\d{4})?$', year)]
+
+        # Expand names for searching
+        expanded_years = {}
+        for item in folders:
+            expanded_years.update(expand_range(item))
+
+        # Multi-year folders are listed once
+        read_folders = list(dict.fromkeys(expanded_years[x] for x in years if x in expanded_years))
+
+        # List all folders, then download all archives concurrently
+        zip_urls = await asyncio.gather(*[_list_archives(client, folder, semaphore) for folder in read_folders])
+        zip_urls = [(zip_url, folder) for folder, urls in zip(read_folders, zip_urls) for zip_url in urls]
+        return await asyncio.gather(*[
+            cached_get(client, zip_url, MIRROR_DIR, revalidate=not _is_historical(folder), semaphore=semaphore)
+            for zip_url, folder in zip_urls
+        ])
+
+
+def parse_archives(archives, s_d_selection, s_d_t_selection, station_codes=None):
+    """
+    Parse the s_d and s_d_t CSV files of downloaded IMGW synop archives.
+
+    :param archives: List of archive contents (None entries are skipped).
+    :param s_d_selection: Columns to be parsed from the s_d files.
+    :param s_d_t_selection: Columns to be parsed from the s_d_t files.
+    :param station_codes: Collection of station codes to be kept (None keeps all stations).
+    :return: Tuple of DataFrames (s_d, s_d_t).
+    """
+    s_d_files = []
+    s_d_t_files = []
+    for content in archives:
+        if content is None:
+            warnings.warn("IMGW server not responding")
+            continue
+        with ZipFile(io.BytesIO(content)) as zip_ref:
+            for name in zip_ref.namelist():
+                if '_t' in name:
+                    s_d_t_files.append(read_station_csv(zip_ref.open(name), s_d_t_COLUMNS, s_d_t_selection,
+                                                        s_d_t_DTYPES, station_codes))
+                else:
+                    s_d_files.append(read_station_csv(zip_ref.open(name), s_d_COLUMNS, s_d_selection,
+                                                      s_d_DTYPES, station_codes))
+    return pd.concat(s_d_files), pd.concat(s_d_t_files)
 
 
 async def read_data(spatial_range, time_range, data_range, level):
@@ -31,81 +136,46 @@ async def read_data(spatial_range, time_range, data_range, level):
     """
     print("DOWNLOADING: IMGW synop data")
 
-    # Load and process the coordinates CSV asynchronously
-    coors = pd.read_csv(r'API_readers/imgw/constants/imgw_coordinates.csv')
-    coors = coors[~coors.isna().any(axis=1)]
-    coordinates = prepare_coordinates(coordinates=coors, spatial_range=spatial_range, level=level)
+    # Select the stations from the registry (loaded once per process)
+    registry = await asyncio.to_thread(load_registry, r'API_readers/imgw/constants/imgw_coordinates.csv')
+    coordinates = registry.select(spatial_range, level)
     if coordinates is None:
         return None
 
     years = get_years_between_dates(*time_range)
     data_requested = set([k for k, v in DATA_ALIASES.items() if v in data_range])
 
-    async with httpx.AsyncClient(follow_redirects=True) as client:
-        response = await client.get(URL)
-        if response.status_code == 200:
-            # Parse the HTML content
-            soup = BeautifulSoup(response.text, 'html.parser')
-
-            # Find all links (assuming directory listing is in <a> tags)
-            links = soup.find_all('a')
-
-            # Extract folder names
-            folders = [link['href'].replace('/','') for link in links if link['href'].endswith('/')]
-            folders = [year for year in folders if re.match(r'^\d{4}(_\d{4})?$', year)]
-
-            # Expand names for searching
-            expanded_years = {}
-            for item in folders:
-                expanded_years.update(expand_range(item))
-
-            read_urls = [urljoin(URL+'/', expanded_years[x]) for x in years]
-        else:
-            warnings.warn("IMGW server not responding")
+    # Serve the closed years from the local archive when all of them have been ingested, otherwise scrape IMGW;
+    # years still being published are always scraped
+    closed_years, open_years = split_open_years(years, datetime.now().year)
+    station_codes = set(coordinates['Code'])
+    s_d_selection = list(data_requested.intersection(set(s_d_SELECTION))) + SPACE_TIME_COLUMNS
+    s_d_t_selection = list(data_requested.intersection(set(s_d_t_SELECTION))) + SPACE_TIME_COLUMNS
+    s_d = s_d_t = None
+    if closed_years:
+        s_d = await asyncio.to_thread(read_archive, os.path.join(ARCHIVE_DIR, 's_d'), station_codes, closed_years,
+                                      [col for col in s_d_SELECTION if col in s_d_selection])
+        s_d_t = await asyncio.to_thread(read_archive, os.path.join(ARCHIVE_DIR, 's_d_t'), station_codes,
+                                        closed_years, [col for col in s_d_t_SELECTION if col in s_d_t_selection])
+    archived = s_d is not None and s_d_t is not None
+    scraped_years = open_years if archived else years
+    if scraped_years:
+        archives = await download_archives(scraped_years)
+        if archives is None:
             return None
-
-    s_d_files = []
-    s_d_t_files = []
-
-    # Process URLs
-    async with httpx.AsyncClient(follow_redirects=True) as client:
-        for url in tqdm(read_urls,total=len(read_urls)):
-            response = await client.get(url)
-            if response.status_code == 200:
-                # Parse HTML to find file links
-                soup = BeautifulSoup(response.text, 'html.parser')
-                links = soup.find_all('a')
-                file_names = [link['href'] for link in links if '.' in link['href']]
-
-                for file_name in file_names:
-                    zip_url = urljoin(url + '/', file_name)
-                    zip_response = await client.get(zip_url)
-
-                    # Process zip files asynchronously
-                    with ZipFile(io.BytesIO(zip_response.content)) as zip_ref:
-                        for name in zip_ref.namelist():
-                            if '_t' in name:
-                                s_d_t_file = pd.read_csv(zip_ref.open(name), encoding='windows-1250', names=s_d_t_COLUMNS)
-                                data_selection = list(data_requested.intersection(set(s_d_t_SELECTION)))
-                                data_selection += SPACE_TIME_COLUMNS
-                                s_d_t_file = s_d_t_file.loc[:, s_d_t_file.columns.intersection(data_selection)]
-                                s_d_t_files.append(s_d_t_file)
-                            else:
-                                s_d_file = pd.read_csv(zip_ref.open(name), encoding='windows-1250', names=s_d_COLUMNS)
-                                data_selection = list(data_requested.intersection(set(s_d_SELECTION)))
-                                data_selection += SPACE_TIME_COLUMNS
-                                s_d_file = s_d_file.loc[:, s_d_file.columns.intersection(data_selection)]
-                                s_d_files.append(s_d_file)
-            else:
-                warnings.warn("IMGW server not responding")
-
-    # Concatenate dataframes
-    s_d = pd.concat(s_d_files)
-    s_d_t = pd.concat(s_d_t_files)
+        new_s_d, new_s_d_t = await asyncio.to_thread(parse_archives, archives, s_d_selection, s_d_t_selection,
+                                                     station_codes)
+        if archived:
+            # Keep only the open years, the closed ones come from the archive
+            open_years = [int(year) for year in open_years]
+            s_d = pd.concat([s_d, new_s_d[new_s_d['Year'].isin(open_years)]], ignore_index=True)
+            s_d_t = pd.concat([s_d_t, new_s_d_t[new_s_d_t['Year'].isin(open_years)]], ignore_index=True)
+        else:
+            s_d, s_d_t = new_s_d, new_s_d_t
 
     # Process timestamps and merge data asynchronously
-    s_d['Timestamp'] = s_d.apply(create_timestamp_from_row, axis=1)
-    s_d_t['Timestamp'] = s_d_t.apply(create_timestamp_from_row, axis=1)
+    s_d['Timestamp'] = create_timestamps(s_d)
+    s_d_t['Timestamp'] = create_timestamps(s_d_t)
     s_d['Timestamp'] = s_d['Timestamp'].dt.date
     s_d_t['Timestamp'] = s_d_t['Timestamp'].dt.date
 
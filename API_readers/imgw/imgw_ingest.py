@@ -0,0 +1,77 @@
+import argparse
+import asyncio
+import os
+from datetime import datetime
+from API_readers.imgw import imgw_api_synop_daily as synop
+from API_readers.imgw.imgw_mappings.synop_mapping import s_d_SELECTION, s_d_t_SELECTION
+from API_readers.imgw_hydro import imgw_api_hydro_daily as hydro
+from API_readers.imgw_hydro.imgw_mappings.imgw_hydro_mappings import WATER_SELECTED
+from utils.imgw_utils import current_hydrological_year, split_open_years, write_archive
+
+# Columns stored in the hydro archive
+HYDRO_COLUMNS = list(dict.fromkeys(WATER_SELECTED + hydro.SPACE_TIME_COLUMNS))
+
+
+async def ingest_synop(years):
+    """
+    Convert the IMGW synop archives (s_d and s_d_t) of the given years into the local columnar archive.
+
+    Multi-year folders are downloaded and written once; their years are skipped afterwards. The current year is
+    still being published and is never archived (readers scrape it on every request).
+
+    :param years: List of years as strings.
+    :return: List of the years written.
+    """
+    years, open_years = split_open_years(years, datetime.now().year)
+    if open_years:
+        print(f"IMGW synop {', '.join(open_years)} still published, skipped")
+    written = set()
+    for year in years:
+        if int(year) in written:
+            continue
+        archives = await synop.download_archives([year])
+        if archives is None:
+            continue
+        s_d, s_d_t = await asyncio.to_thread(synop.parse_archives, archives, s_d_SELECTION, s_d_t_SELECTION)
+        await asyncio.to_thread(write_archive, s_d_t, os.path.join(synop.ARCHIVE_DIR, 's_d_t'), 'Year')
+        written.update(await asyncio.to_thread(write_archive, s_d, os.path.join(synop.ARCHIVE_DIR, 's_d'), 'Year'))
+        print(f"IMGW synop {year} ingested")
+    return sorted(written)
+
+
+async def ingest_hydro(years):
+    """
+    Convert the IMGW hydro archives (codz) of the given hydrological years into the local columnar archive.
+
+    The current hydrological year is still being published and is never archived.
+
+    :param years: List of years as strings.
+    :return: List of the years written.
+    """
+    years, open_years = split_open_years(years, current_hydrological_year())
+    if open_years:
+        print(f"IMGW hydro {', '.join(open_years)} still published, skipped")
+    written = set()
+    for year in years:
+        archives = await hydro.download_archives([year])
+        if not archives:
+            continue
+        water = await asyncio.to_thread(hydro.parse_archives, archives, HYDRO_COLUMNS)
+        written.update(await asyncio.to_thread(write_archive, water, hydro.ARCHIVE_DIR, 'Hydrological year'))
+        print(f"IMGW hydro {year} ingested")
+    return sorted(written)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest IMGW synop and hydro archives into the local columnar store.")
+    parser.add_argument('--start', type=int, default=1951, help="First year to be ingested.")
+    parser.add_argument('--end', type=int, default=datetime.now().year - 1,
+                        help="Last year to be ingested (years still being published are skipped).")
+    parser.add_argument('--dataset', choices=['synop', 'hydro', 'all'], default='all')
+    args = parser.parse_args()
+
+    years = [str(year) for year in range(args.start, args.end + 1)]
+    if args.dataset in ('synop', 'all'):
+        asyncio.run(ingest_synop(years))
+    if args.dataset in ('hydro', 'all'):
+        asyncio.run(ingest_hydro(years))
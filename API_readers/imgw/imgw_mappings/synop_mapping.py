@@ -71,3 +71,22 @@ DATA_ALIASES = {
     "Average daily temperature [°C]": "temperature",
     "Daily precipitation total [mm]": "precipitation",
 }
+
+# explicit dtypes of the columns that can be selected for parsing
+s_d_DTYPES = {
+    "Station code": 'int64',
+    "Station name": 'string',
+    "Year": 'int16',
+    "Month": 'int8',
+    "Day": 'int8',
+    "Average daily temperature [°C]": 'float64',
+    "Daily precipitation total [mm]": 'float64'
+}
+
+s_d_t_DTYPES = {
+    "Station code": 'int64',
+    "Station name": 'string',
+    "Year": 'int16',
+    "Month": 'int8',
+    "Day": 'int8'
+}
@@ -1,3 +1,4 @@
+import os
 import httpx
 import pandas as pd
 import warnings
@@ -6,37 +7,26 @@ from urllib.parse import urljoin
 import re
 from zipfile import ZipFile
 import io
-from utils.coordinates_to_cells import prepare_coordinates
-from utils.imgw_utils import create_timestamp_from_row, get_years_between_dates
+from utils.imgw_utils import create_hydrological_timestamps, current_hydrological_year, \
+    get_hydrological_years_between_dates, read_station_csv, read_archive, split_open_years
+from utils.station_registry import load_registry
 from tqdm import tqdm
-from API_readers.imgw_hydro.imgw_mappings.imgw_hydro_mappings import WATER_COLUMNS, WATER_SELECTED, DATA_ALIASES
+from API_readers.imgw_hydro.imgw_mappings.imgw_hydro_mappings import WATER_COLUMNS, WATER_SELECTED, DATA_ALIASES, \
+    WATER_DTYPES
 import asyncio
 
 URL = r'https://danepubliczne.imgw.pl/data/dane_pomiarowo_obserwacyjne/dane_hydrologiczne/dobowe/'
 SPACE_TIME_COLUMNS = ['Station code', 'Hydrological year', 'Day', 'Calendar month']
+ARCHIVE_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'archive')
 
 
-async def read_data(spatial_range, time_range, data_range, level):
+async def download_archives(years):
     """
+    Download the IMGW hydro zip archives published for the given hydrological years.
 
-    :param spatial_range: A tuple containing the spatial range (N, S, E, W) defining the bounding box.
-    :param time_range: A tuple containing the start and end timestamps defining the time range.
-    :param data_range: A list of data types requested.
-                       Allowed data types: 'precipitation', 'sunlight', 'cloud cover', 'temperature',
-                       'wind', 'pressure', 'humidity'.
-    :param level: S2Cell level.
-    :return:
+    :param years: List of hydrological years as strings.
+    :return: List of archive contents, or None if IMGW is not responding.
     """
-    print("DOWNLOADING: IMGW hydro data")
-    # Load coordinates CSV asynchronously
-    coors = await asyncio.to_thread(pd.read_csv, r'API_readers/imgw_hydro/constants/imgw_coordinates.csv')
-    coordinates = prepare_coordinates(coordinates=coors, spatial_range=spatial_range, level=level)
-    if coordinates is None:
-        return None
-
-    years = get_years_between_dates(*time_range)
-    data_requested = set([k for k, v in DATA_ALIASES.items() if v in data_range])
-
     async with httpx.AsyncClient(follow_redirects=True) as client:
         response = await client.get(URL)
         if response.status_code == 200:
@@ -50,7 +40,7 @@ async def read_data(spatial_range, time_range, data_range, level):
             warnings.warn("IMGW server not responding")
             return None
 
-    water_files = []
+    archives = []
 
     # Process URLs asynchronously
     async with httpx.AsyncClient(follow_redirects=True) as client:
@@ -70,27 +60,75 @@ async def read_data(spatial_range, time_range, data_range, level):
                 for file_name in file_names:
                     zip_url = urljoin(url + '/', file_name)
                     zip_response = await client.get(zip_url)
+                    archives.append(zip_response.content)
+            else:
+                warnings.warn("IMGW server not responding")
+    return archives
+
+
+def parse_archives(archives, selection, station_codes=None):
+    """
+    Parse the codz CSV files of downloaded IMGW hydro archives.
+
+    :param archives: List of archive contents.
+    :param selection: Columns to be parsed.
+    :param station_codes: Collection of station codes to be kept (None keeps all stations).
+    :return: DataFrame with the parsed records.
+    """
+    water_files = []
+    for content in archives:
+        with ZipFile(io.BytesIO(content)) as zip_ref:
+            for name in zip_ref.namelist():
+                if 'codz' in name:
+                    water_files.append(read_station_csv(zip_ref.open(name), WATER_COLUMNS, selection, WATER_DTYPES,
+                                                        station_codes))
+    return pd.concat(water_files)
+
+
+async def read_data(spatial_range, time_range, data_range, level):
+    """
+
+    :param spatial_range: A tuple containing the spatial range (N, S, E, W) defining the bounding box.
+    :param time_range: A tuple containing the start and end timestamps defining the time range.
+    :param data_range: A list of data types requested.
+                       Allowed data types: 'precipitation', 'sunlight', 'cloud cover', 'temperature',
+                       'wind', 'pressure', 'humidity'.
+    :param level: S2Cell level.
+    :return:
+    """
+    print("DOWNLOADING: IMGW hydro data")
+    # Select the stations from the registry (loaded once per process)
+    registry = await asyncio.to_thread(load_registry, r'API_readers/imgw_hydro/constants/imgw_coordinates.csv')
+    coordinates = registry.select(spatial_range, level)
+    if coordinates is None:
+        return None
+
+    # IMGW hydro folders and archive partitions are named by hydrological year
+    years = get_hydrological_years_between_dates(*time_range)
+    data_requested = set([k for k, v in DATA_ALIASES.items() if v in data_range])
+
+    water_selection = list(data_requested.intersection(set(WATER_SELECTED)))
+    station_codes = set(coordinates['Unnamed: 0'])
+
+    # Serve the closed years from the local archive when all of them have been ingested, otherwise scrape IMGW;
+    # hydrological years still being published are always scraped
+    closed_years, open_years = split_open_years(years, current_hydrological_year())
+    water_files = None
+    if closed_years:
+        water_files = await asyncio.to_thread(read_archive, ARCHIVE_DIR, station_codes, closed_years,
+                                              [col for col in WATER_COLUMNS
+                                               if col in water_selection + SPACE_TIME_COLUMNS])
+    archived = water_files is not None
+    scraped_years = open_years if archived else years
+    if scraped_years:
+        archives = await download_archives(scraped_years)
+        if archives is None:
+            return None
+        scraped = await asyncio.to_thread(parse_archives, archives, water_selection + SPACE_TIME_COLUMNS,
+                                          station_codes)
+        water_files = pd.concat([water_files, scraped], ignore_index=True) if archived else scraped
 
-                    # Process zip files asynchronously
-                    with ZipFile(io.BytesIO(zip_response.content)) as zip_ref:
-                        for name in zip_ref.namelist():
-                            if 'codz' in name:
-                                water_data = await asyncio.to_thread(
-                                    lambda: pd.read_csv(zip_ref.open(name), encoding='windows-1250',
-                                                        names=WATER_COLUMNS)
-                                )
-                                water_selection = list(data_requested.intersection(set(WATER_SELECTED)))
-                                water_selection_spacetime = water_selection + SPACE_TIME_COLUMNS
-                                water_data = water_data.loc[:,
-                                             water_data.columns.intersection(water_selection_spacetime)]
-                                water_files.append(water_data)
-                else:
-                    warnings.warn("IMGW server not responding")
-
-        # Concatenate dataframes asynchronously
-    water_files = await asyncio.to_thread(pd.concat, water_files)
-    water_files = water_files.rename({'Calendar month': 'Month', 'Hydrological year': 'Year'}, axis=1)
-    water_files['Timestamp'] = await asyncio.to_thread(lambda: water_files.apply(create_timestamp_from_row, axis=1))
+    water_files['Timestamp'] = create_hydrological_timestamps(water_files)
     water_files = water_files.merge(coordinates, left_on='Station code', right_on='Unnamed: 0')
 
     # Define the columns to be excluded
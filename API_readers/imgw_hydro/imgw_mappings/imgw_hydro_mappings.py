@@ -23,3 +23,12 @@ DATA_ALIASES = {
     "Water level [cm]": 'surface water quantity',
     "Flow [m³/s]": 'surface water quantity'
 }
+
+WATER_DTYPES = {
+    "Station code": 'int64',
+    "Hydrological year": 'int16',
+    "Calendar month": 'int8',
+    "Day": 'int8',
+    "Water level [cm]": 'float64',
+    "Flow [m³/s]": 'float64'
+}
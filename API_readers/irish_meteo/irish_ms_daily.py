@@ -0,0 +1,206 @@
+import os
+import json
+import time
+import pandas as pd
+import httpx
+import asyncio
+import io
+import zipfile
+from typing import Dict, Iterable
+import re
+from tqdm.asyncio import tqdm
+from utils.atomic_write import atomic_write
+from utils.download_cache import cached_get
+from utils.station_registry import load_registry
+from API_readers.irish_meteo.irish_meteo_mappings.irish_meteo_mapping import DATA_ALIASES,GLOBAL_MAPPING
+
+BASE_URL = "https://cli.fusio.net/cli/climate_data/webdata/dly{}.zip"
+STATIONS_CSV = "API_readers/irish_meteo/EPA_ireland_stations.csv"
+CACHE_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'cache')
+LINK_STATUS_PATH = os.path.join(CACHE_DIR, 'link_status.json')
+LINK_STATUS_TTL = 7 * 24 * 3600  # seconds
+MAX_CONCURRENT_REQUESTS = 8
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+}
+
+
+def generate_links(stations: pd.DataFrame) -> pd.DataFrame:
+    selected_df = stations[["station name", "lat", "lon", "S2CELL"]].copy()
+    selected_df["download_link"] = selected_df["station name"].apply(
+        lambda x: BASE_URL.format(int(x)) if pd.notna(x) and x.strip() else "Invalid station name"
+    )
+    return selected_df
+
+
+def filter_open_stations(stations: pd.DataFrame, time_range) -> pd.DataFrame:
+    """
+    Keep the stations open during at least a part of the time range (open and close years of the stations list,
+    "(null)" standing for stations still open).
+    """
+    start_year, end_year = pd.to_datetime(time_range[0]).year, pd.to_datetime(time_range[1]).year
+    open_year = pd.to_numeric(stations["open year"], errors="coerce")
+    close_year = pd.to_numeric(stations["close year"], errors="coerce")
+    return stations[~(open_year > end_year) & ~(close_year < start_year)]
+
+
+def load_link_status() -> Dict[str, list]:
+    try:
+        with open(LINK_STATUS_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_link_status(status: Dict[str, list]) -> None:
+    atomic_write(LINK_STATUS_PATH, json.dumps(status))
+
+
+async def check_link(client: httpx.AsyncClient, url: str, semaphore: asyncio.Semaphore):
+    try:
+        async with semaphore:
+            response = await client.head(url, timeout=30)
+        return url, response.status_code
+    except httpx.RequestError:
+        return url, 0
+
+
+async def check_links(client: httpx.AsyncClient, urls: Iterable[str], semaphore: asyncio.Semaphore) -> Dict[str, int]:
+    """
+    Get the HTTP status of station links; statuses checked less than LINK_STATUS_TTL ago are reused, only the others
+    are checked with a HEAD request (network failures are not stored, so that they are checked again next time).
+    """
+    status = await asyncio.to_thread(load_link_status)
+    now = time.time()
+    expired = [url for url in dict.fromkeys(urls) if url not in status or now - status[url][1] > LINK_STATUS_TTL]
+    if expired:
+        results = await tqdm.gather(*[check_link(client, url, semaphore) for url in expired], desc="Checking links")
+        status.update({url: [code, now] for url, code in results if code != 0})
+        await asyncio.to_thread(save_link_status, status)
+        checked = dict(results)
+    else:
+        checked = {}
+    return {url: checked.get(url, status.get(url, [0])[0]) for url in urls}
+
+
+def parse_station_zip(content: bytes, station_id: str, lat: float, lon: float) -> pd.DataFrame:
+    try:
+        with zipfile.ZipFile(io.BytesIO(content)) as z:
+            csv_name = f"dly{station_id}.csv"
+            if csv_name not in z.namelist():
+                return pd.DataFrame()
+
+            with z.open(csv_name) as f:
+                lines = f.read().decode("utf-8").splitlines()
+    except zipfile.BadZipFile:
+        return pd.DataFrame()
+
+    date_pattern = re.compile(r"^\d{2}-[a-z]{3}-\d{4}", re.IGNORECASE)
+    header_idx = None
+    for i, line in enumerate(lines):
+        if date_pattern.match(line.split(",")[0]):
+            header_idx = i - 1
+            break
+    else:
+        return pd.DataFrame()
+
+    try:
+        df = pd.read_csv(
+            io.StringIO("\n".join(lines[header_idx:])),
+            engine="python",
+            on_bad_lines="skip"
+        )
+    except pd.errors.ParserError:
+        return pd.DataFrame()
+    if "date" not in df.columns or "rain" not in df.columns:
+        return pd.DataFrame()
+
+    df["date"] = pd.to_datetime(df["date"], format="%d-%b-%Y", errors="coerce")
+    processed_df = df[["date", "rain"]].copy()
+    processed_df["id"] = station_id
+    processed_df["lat"] = lat
+    processed_df["lon"] = lon
+    processed_df["precipitation [mm]"] = processed_df["rain"]
+    processed_df = processed_df[["id", "lat", "lon", "date", "precipitation [mm]"]]
+    return processed_df
+
+
+async def download_and_process(client: httpx.AsyncClient, row: pd.Series, semaphore: asyncio.Semaphore) -> pd.DataFrame:
+    url = row["download_link"]
+    station_id = row["station name"]
+
+    # Station files are mirrored locally and revalidated with a conditional GET
+    for attempt in range(3):
+        try:
+            content = await cached_get(client, url, CACHE_DIR, semaphore=semaphore)
+            break
+        except httpx.RequestError:
+            if attempt == 2:
+                return pd.DataFrame()
+            await asyncio.sleep(1)
+    if content is None:
+        return pd.DataFrame()
+
+    return await asyncio.to_thread(parse_station_zip, content, station_id, row["lat"], row["lon"])
+
+
+async def process_working_links(client: httpx.AsyncClient, df: pd.DataFrame,
+                                semaphore: asyncio.Semaphore) -> pd.DataFrame:
+    working_df = df[df["status"] == 200].copy()
+    if working_df.empty:
+        return pd.DataFrame()
+
+    tasks = [download_and_process(client, row, semaphore) for _, row in working_df.iterrows()]
+    results = await tqdm.gather(*tasks, desc="Processing stations")
+
+    valid_dfs = [result for result in results if isinstance(result, pd.DataFrame) and not result.empty]
+    return pd.concat(valid_dfs, ignore_index=True) if valid_dfs else pd.DataFrame()
+
+
+async def read_data(spatial_range, time_range, data_range, level):
+    # Stations within the spatial range and open during the time range (registry loaded once per process)
+    registry = await asyncio.to_thread(load_registry, STATIONS_CSV, rename={"latitude": "lat", "longitude": "lon"},
+                                       dtype={"station name": str})
+    stations = registry.select(spatial_range, level)
+    if stations is None:
+        return pd.DataFrame()
+    stations = filter_open_stations(stations, time_range)
+    if stations.empty:
+        return pd.DataFrame()
+    df = generate_links(stations)
+
+    limits = httpx.Limits(max_connections=MAX_CONCURRENT_REQUESTS, max_keepalive_connections=MAX_CONCURRENT_REQUESTS)
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+    async with httpx.AsyncClient(headers=HEADERS, limits=limits, timeout=30, follow_redirects=True) as client:
+        status = await check_links(client, df["download_link"], semaphore)
+        df_with_status = df.assign(status=df["download_link"].map(status))
+        combined_df = await process_working_links(client, df_with_status, semaphore)
+
+    if combined_df.empty:
+        return pd.DataFrame()
+
+    # S2CELLs of the stations, by station id
+    coordinates = df.rename(columns={"station name": "id"})
+
+    combined_df = combined_df.rename({'date': 'Timestamp'}, axis=1)
+
+    # --- Apply time filtering ---
+    time_from, time_to = pd.to_datetime(time_range[0]), pd.to_datetime(time_range[1])
+    combined_df['Timestamp'] = pd.to_datetime(combined_df['Timestamp'])
+    combined_df = combined_df[(combined_df['Timestamp'] >= time_from) & (combined_df['Timestamp'] <= time_to)]
+    combined_df['Timestamp'] = combined_df['Timestamp'].dt.date
+
+    combined_df['precipitation [mm]'] = pd.to_numeric(combined_df['precipitation [mm]'],errors='coerce')
+
+    # Merge with coordinates to add S2CELL
+    combined_df = combined_df.merge(coordinates[['id', 'S2CELL']], on='id')
+
+    # Pivot so final structure is aligned
+    combined_df = combined_df.set_index(['Timestamp', 'S2CELL'])
+    combined_df = combined_df.rename(GLOBAL_MAPPING, axis=1)
+    combined_df = combined_df[['Precipitation total [mm]']]
+
+    final_df_pivot = combined_df.pivot_table(index='Timestamp', columns='S2CELL')
+
+    return final_df_pivot
@@ -1,18 +1,145 @@
 from wetterdienst.provider.dwd.observation import DwdObservationRequest, DwdObservationResolution
+from wetterdienst.exceptions import FailedDownload, ProductFileNotFoundError
+import os
+import time
 import pandas as pd
-from utils.coordinates_to_cells import prepare_coordinates
+from utils.station_registry import StationRegistry
+from utils.atomic_write import atomic_path
 import warnings
 import asyncio
 import datetime as dt
 from API_readers.wetterdienst.wetterdienst_mapping.dwd_mapping import DATA_ALIASES, GLOBAL_MAPPING
 
+CACHE_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'cache')
+MAX_CONCURRENT_STATIONS = 4
+RECHECK_TTL = 30 * 24 * 3600  # seconds before a year cached without values is requested again
+VALUES_COLUMNS = ['station_id', 'parameter', 'date', 'value']
+# Errors of a station download (DWD or the network); any other error is raised
+FETCH_ERRORS = (FailedDownload, ProductFileNotFoundError, ConnectionError, TimeoutError)
 
-async def fetch_data(request):
+
+def _to_pandas(df):
+    """
+    Convert a wetterdienst result table to pandas (recent versions of wetterdienst use polars).
+    """
+    return df.to_pandas() if hasattr(df, 'to_pandas') else df
+
+
+def _empty_values():
+    """
+    Empty table of values (VALUES_COLUMNS) with their dtypes.
+    """
+    return pd.DataFrame({
+        'station_id': pd.Series(dtype='object'),
+        'parameter': pd.Series(dtype='object'),
+        'date': pd.Series(dtype='datetime64[ns]'),
+        'value': pd.Series(dtype='float64')
+    })
+
+
+def _cache_path(station_id, parameter, year, cache_dir):
+    """
+    Build the path of the cached values of a station, parameter and year.
+    """
+    return os.path.join(cache_dir, str(station_id), parameter, f"{year}.parquet")
+
+
+def first_open_year():
+    """
+    First year still being completed by DWD: recent values are moved to the historical archive only after a
+    quality check, so the previous year may still change early in the current year.
+    """
+    return dt.date.today().year - 1
+
+
+def read_cached(station_id, parameters, years, cache_dir):
+    """
+    Read the cached values of a station. Years cached without values are missing again once RECHECK_TTL has
+    elapsed, as DWD may publish them later.
+
+    :param station_id: DWD station ID.
+    :param parameters: List of parameter names.
+    :param years: List of years requested.
+    :param cache_dir: Folder holding the cache.
+    :return: Tuple (DataFrame of the cached values, sorted list of the years missing for at least one parameter).
+    """
+    frames, missing = [], set()
+    for parameter in parameters:
+        for year in years:
+            path = _cache_path(station_id, parameter, year, cache_dir)
+            if not os.path.exists(path):
+                missing.add(year)
+                continue
+            cached = pd.read_parquet(path)
+            if cached.empty and time.time() - os.path.getmtime(path) >= RECHECK_TTL:
+                missing.add(year)
+                continue
+            frames.append(cached.assign(station_id=str(station_id), parameter=parameter))
+    values = pd.concat(frames, ignore_index=True)[VALUES_COLUMNS] if frames else _empty_values()
+    return values, sorted(missing)
+
+
+def write_cached(values, station_id, parameters, years, cache_dir):
+    """
+    Cache the values of a station per parameter and year; years without values are cached empty, so that they are
+    not requested again before RECHECK_TTL has elapsed.
+
+    :param values: DataFrame of the station values (VALUES_COLUMNS) covering the whole years.
+    :param station_id: DWD station ID.
+    :param parameters: List of parameter names.
+    :param years: List of (complete) years to cache.
+    :param cache_dir: Folder holding the cache.
+    """
+    for parameter in parameters:
+        for year in years:
+            selection = (values['parameter'] == parameter) & (values['date'].dt.year == year)
+            with atomic_path(_cache_path(station_id, parameter, year, cache_dir)) as temp_path:
+                values.loc[selection, ['date', 'value']].reset_index(drop=True).to_parquet(temp_path)
+
+
+def fetch_station_values(station_id, parameters, start_date, end_date):
+    """
+    Fetch the daily values of a single station with wetterdienst (blocking).
+
+    :return: DataFrame of the values (VALUES_COLUMNS), dates being naive daily timestamps.
+    """
+    request = DwdObservationRequest(
+        parameter=parameters,
+        resolution=DwdObservationResolution.DAILY,
+        start_date=start_date,
+        end_date=end_date
+    ).filter_by_station_id(station_id=(station_id,))
+    values = pd.DataFrame(request.values.all().to_dict(with_metadata=False, with_stations=False)['values'],
+                          columns=VALUES_COLUMNS)
+    values['station_id'] = values['station_id'].astype(str)
+    values['date'] = pd.to_datetime(values['date'], utc=True).dt.tz_localize(None).dt.normalize()
+    values['value'] = values['value'].astype('float64')
+    return values
+
+
+async def fetch_station(station_id, parameters, years, semaphore, cache_dir):
     """
-    Fetch data asynchronously using Wetterdienst's DwdObservationRequest.
+    Get the values of a station for whole years, from the cache and from DWD for the years that are not cached.
+    Open years (see `first_open_year`) are never cached, as they are still being completed.
+
+    :return: DataFrame of the values (VALUES_COLUMNS).
     """
-    loop = asyncio.get_event_loop()
-    return await loop.run_in_executor(None, request.values.all)
+    values, missing = await asyncio.to_thread(read_cached, station_id, parameters, years, cache_dir)
+    open_year = first_open_year()
+    missing = sorted(set(missing) | {year for year in years if year >= open_year})
+    if not missing:
+        return values
+
+    start_date = dt.datetime(missing[0], 1, 1)
+    end_date = min(dt.datetime(missing[-1], 12, 31), dt.datetime.combine(dt.date.today(), dt.time()))
+    async with semaphore:
+        fetched = await asyncio.to_thread(fetch_station_values, station_id, parameters, start_date, end_date)
+    await asyncio.to_thread(write_cached, fetched, station_id, parameters,
+                            [year for year in missing if year < open_year], cache_dir)
+
+    # Cached years within the fetched span are replaced by the fetched values
+    values = values[(values['date'] < start_date) | (values['date'] > end_date)]
+    return pd.concat([values, fetched], ignore_index=True) if not values.empty else fetched
 
 
 async def read_data(spatial_range, time_range, data_range, level):
@@ -31,68 +158,57 @@ async def read_data(spatial_range, time_range, data_range, level):
     end_date = dt.datetime.strptime(end_date, '%Y-%m-%d')
     data_requested = list([k for k, v in DATA_ALIASES.items() if v in data_range])
 
-    # Create a request object
-    requests = DwdObservationRequest(
+    # Stations within the bounding box
+    request = DwdObservationRequest(
         parameter=data_requested,
         resolution=DwdObservationResolution.DAILY,
         start_date=start_date,
         end_date=end_date
     ).filter_by_bbox(west, south, east, north)
-
-    # Fetch data asynchronously
-    vals = await fetch_data(requests)
-    vals = vals.to_dict(with_metadata=False, with_stations=True)
-    vals_dict = vals['values']
-    stations = vals['stations']
-
-    df = pd.DataFrame().from_dict(vals_dict)
-    df_stations = pd.DataFrame().from_dict(stations)
-
-    if df.empty:
+    df_stations = await asyncio.to_thread(lambda: _to_pandas(request.df))
+    if df_stations.empty:
         warnings.warn("No stations found in the specified bounding box.")
         return None
 
-    # cleaning
-    df = pd.pivot_table(df, index=['station_id','date'], columns='parameter', values='value').reset_index()
-    df = df[~df.isna().any(axis=1)]
-
-    # get stations locations
-    df = df.merge(df_stations, left_on='station_id', right_on='station_id')
-    df = df[data_requested + ['latitude','longitude','date']]
-
-
-    df = df.rename(
-        columns={
-            'date': 'Timestamp',
-            'latitude': 'lat',
-            'longitude': 'lon',
-        }
-    )
-
     # Assign S2 cells
-    df = prepare_coordinates(df, spatial_range, level)
-
-    # Group by S2CELL, Timestamp, and Parameter
-    original_size = df.shape[0]
-    df = df.groupby(['S2CELL', 'Timestamp']+data_requested).mean().reset_index()
+    df_stations = df_stations.rename(columns={'latitude': 'lat', 'longitude': 'lon'})
+    df_stations['station_id'] = df_stations['station_id'].astype(str)
+    stations = StationRegistry(df_stations).select(spatial_range, level)
+    if stations is None:
+        return None
 
-    if original_size != df.shape[0]:
-        warnings.warn("Some data were aggregated")
+    # Per-station values, fetched in parallel and collected as they arrive
+    years = list(range(start_date.year, end_date.year + 1))
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_STATIONS)
+    tasks = [fetch_station(station_id, data_requested, years, semaphore, CACHE_DIR)
+             for station_id in stations['station_id']]
+    frames = []
+    for task in asyncio.as_completed(tasks):
+        try:
+            values = await task
+        except FETCH_ERRORS as e:
+            warnings.warn(f"DWD data of a station could not be fetched: {e}")
+            continue
+        frames.append(values[(values['date'] >= start_date) & (values['date'] <= end_date)])
+
+    df = pd.concat(frames, ignore_index=True) if frames else _empty_values()
+    df = df.dropna(subset=['value'])
+    if df.empty:
+        warnings.warn("No data found for the selected stations.")
+        return None
 
-    # Resample to daily intervals
-    df['Timestamp'] = pd.to_datetime(df['Timestamp'])
+    # One row per station and day, keeping the days with all parameters
+    df = df.pivot_table(index=['station_id', 'date'], columns='parameter', values='value')
+    df = df.reindex(columns=data_requested).dropna().reset_index()
 
-    df.set_index('Timestamp', inplace=True)
-    df = (
-        df.groupby(['S2CELL'] + data_requested)
-            .resample('1D')
-            .mean()
-            .reset_index()
-    )
-    df['Timestamp'] = df['Timestamp'].dt.date
-    df = df[(df['Timestamp'] >= start_date.date()) & (df['Timestamp'] <= end_date.date())]
+    # Daily aggregation of the stations by S2CELL, in a single grouped reduction
+    df['S2CELL'] = df['station_id'].map(stations.set_index('station_id')['S2CELL'])
+    df['Timestamp'] = df['date'].dt.date
+    grouped = df.groupby(['S2CELL', 'Timestamp'])
+    if (grouped.size() > 1).any():
+        warnings.warn("Some data were aggregated")
+    df = grouped[data_requested].mean()
 
-    df = df.drop(['lat', 'lon'], axis=1)
     df = df.rename(GLOBAL_MAPPING, axis=1)
 
     # Recalculate temperature to Celsius
@@ -100,7 +216,6 @@ async def read_data(spatial_range, time_range, data_range, level):
         df["Temperature [°C]"] = df["Temperature [°C]"] - 273.15
 
     # Pivot the DataFrame
-    df_pivot = df.pivot_table(
-        index='Timestamp', columns='S2CELL')
+    df_pivot = df.unstack('S2CELL').sort_index()
 
     return df_pivot
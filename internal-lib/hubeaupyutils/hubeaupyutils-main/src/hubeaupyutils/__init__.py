@@ -3,6 +3,7 @@
 
 from .hubeau import *
 from .wrappers import *
+from .async_hubeau import AsyncHubeauClient, HubeauRequestError, batch_codes, date_windows
 
 __version__ = '0.1.0'
 
@@ -0,0 +1,412 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+AsyncHubeauClient
+
+Asynchronous counterpart of HubeauUtils, intended to:
+- share one pool of keep-alive connections between many requests
+- bound the number of requests sent at the same time
+- retry transient failures with an exponential backoff
+- follow 206 (partial content) pages without blocking the event loop
+- request many stations at once (batches of codes or bbox), results being split back per station
+- keep each request below the total size limit of the APIs, splitting long periods in date windows
+"""
+
+import asyncio
+import httpx
+import pandas as pd
+
+from urllib.parse import quote
+from .hubeau import _AbstractHub, _check_parameters, get_api_description
+
+
+MAX_CONCURRENCY = 8
+RETRIES = 3
+BACKOFF = 1.0 # seconds, doubled at each new attempt
+TIMEOUT = 60.0 # seconds
+RETRY_STATUS = (429, 500, 502, 503, 504)
+MAX_CODES = 200 # max number of values in a list parameter of the APIs
+MAX_CODES_LENGTH = 1_500 # max length of an url-encoded list of codes, keeps urls below common server limits
+BBOX_MIN_STATIONS = 50 # from this number of stations, a bbox query is used (when available)
+MAX_RECORDS = 20_000 # total size limit of the APIs (all pages of one request)
+SIZE_LIMIT_STATUS = 400 # status answered when a request exceeds the total size limit
+
+
+class HubeauRequestError(RuntimeError):
+    """
+    Error status answered by the API for a request (after retries), kept in `status_code`.
+    """
+
+    def __init__(self, message, status_code):
+        super().__init__(message)
+        self.status_code = status_code
+
+    @property
+    def size_limit(self):
+        """ True if the request was refused because of the total size limit """
+        return self.status_code == SIZE_LIMIT_STATUS
+
+
+def batch_codes(codes, max_length=MAX_CODES_LENGTH, max_codes=MAX_CODES):
+    """
+    Split station codes in groups whose comma-separated, url-encoded list is at most `max_length` characters
+    and `max_codes` values long. Duplicated codes are requested once.
+    """
+    batches, batch, length = [], [], 0
+    for code in dict.fromkeys(map(str, codes)):
+        size = len(quote(code, safe='')) + 3 # with the url-encoded comma
+        if batch and (length + size > max_length or len(batch) == max_codes):
+            batches.append(batch)
+            batch, length = [], 0
+        batch.append(code)
+        length += size
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def date_windows(start, end, days):
+    """
+    Split the period from `start` to `end` (both included) in consecutive windows of at most `days` days.
+    Returns a list of (start, end) dates formatted as 'YYYY-mm-dd'.
+    """
+    start, end = pd.Timestamp(start).normalize(), pd.Timestamp(end).normalize()
+    step = pd.Timedelta(days=max(int(days), 1))
+    windows = []
+    while start <= end:
+        stop = min(start + step - pd.Timedelta(days=1), end)
+        windows.append((start.strftime('%Y-%m-%d'), stop.strftime('%Y-%m-%d')))
+        start = stop + pd.Timedelta(days=1)
+    return windows
+
+
+class AsyncHubeauClient:
+    """
+    AsyncHubeauClient
+    -----------------
+    Asynchronous object to request Hubeau'API endpoints, to be used as an async context manager:
+
+        async with AsyncHubeauClient(version=1) as client:
+            df = await client.get_data('piezometry', code_bss='07548X0009/F', only_valid_data=True)
+    """
+
+    def __init__(
+        self,
+        version=1,
+        max_concurrency=MAX_CONCURRENCY,
+        retries=RETRIES,
+        backoff=BACKOFF,
+        timeout=TIMEOUT,
+        bbox_min_stations=BBOX_MIN_STATIONS,
+        max_records=MAX_RECORDS
+    ):
+        self.hubeau_url        = "https://hubeau.eaufrance.fr/api/v{}/".format(version)
+        self.max_concurrency   = max_concurrency
+        self.retries           = retries
+        self.backoff           = backoff
+        self.timeout           = timeout
+        self.bbox_min_stations = bbox_min_stations
+        self.max_records       = max_records
+        self._client           = None
+        self._semaphore        = None
+
+    async def __aenter__(self):
+        limits = httpx.Limits(
+            max_connections=self.max_concurrency,
+            max_keepalive_connections=self.max_concurrency
+        )
+        self._client    = httpx.AsyncClient(limits=limits, timeout=self.timeout, follow_redirects=True)
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self._client.aclose()
+        self._client = None
+
+    async def _get(self, url, params=None, verbose=False):
+        """
+        Send one GET request, retrying transport errors and transient status codes (429, 5xx).
+
+        Parameters
+        ----------
+        url: str, the url to request
+        params: dict, query parameters (None for `next` urls, which already hold them)
+        verbose: bool, option to print details about retries.
+
+        Returns
+        -------
+        httpx.Response of the last attempt
+        """
+        for attempt in range(self.retries + 1):
+            try:
+                async with self._semaphore:
+                    answ = await self._client.get(url, params=params)
+                if answ.status_code not in RETRY_STATUS or attempt == self.retries:
+                    return answ
+                reason = f'Error code: {answ.status_code}'
+            except httpx.TransportError as e:
+                if attempt == self.retries:
+                    raise
+                reason = repr(e)
+            delay = self.backoff * 2 ** attempt
+            if verbose:
+                print(f'{reason}, retrying in {delay} s: {url}')
+            await asyncio.sleep(delay)
+
+    async def iter_pages(self, endpoint, operator, parameters={}, verbose=False):
+        """
+        Asynchronously iterate over the pages (lists of records) answered for one request,
+        following `next` urls while the API answers 206.
+
+        Parameters
+        ----------
+        endpoint: str, e.g. 'niveaux_nappes'
+        operator: str, e.g. 'chroniques'
+        parameters: dict, API parameters, cleaned with `_check_parameters`.
+        verbose: bool, option to print details about errors.
+
+        Raises
+        ------
+        HubeauRequestError if the API answers with an error status (e.g. 400 when the total size limit is reached)
+        """
+        url  = f'{self.hubeau_url}{endpoint}/{operator}'
+        answ = await self._get(url, params=_check_parameters(**parameters), verbose=verbose)
+
+        if verbose:
+            print(f'Requesting: {answ.url}')
+
+        while answ.status_code in [200, 206]:
+            body = answ.json()
+            yield body['data']
+            # a 206 without next page (edge case of the API) ends the iteration, as in `_curl_api`
+            if answ.status_code == 200 or not body.get('next'):
+                return
+            answ = await self._get(body['next'], verbose=verbose)
+
+        if verbose:
+            print(f'Error code: {answ.status_code},\n url = {answ.url}')
+            if answ.status_code == 400:
+                print('Total size limit might have been reached. (20 000 data).',
+                      'Possible solution : request with more parameters to cut the answer in smaller pieces.')
+        raise HubeauRequestError(
+            f"data retrieval failed for query with URL {answ.url} (error code: {answ.status_code})",
+            answ.status_code
+        )
+
+    async def iter_batches(self, endpoint, operator, parameters={}, columns=None, verbose=False):
+        """
+        Asynchronously iterate over the pages answered for one request, each converted to a pandas.DataFrame
+        as soon as it arrives (the raw json page is not kept).
+        All batches share the same columns: `columns` if given (they are also requested as the API `fields`
+        parameter), else the fields of the first non-empty page. Missing fields are NaN, others are dropped.
+        """
+        if columns is not None:
+            parameters = {**parameters, 'fields': columns}
+        async for page in self.iter_pages(endpoint, operator, parameters, verbose):
+            if len(page) == 0:
+                continue
+            if columns is None:
+                columns = list(dict.fromkeys(key for record in page for key in record))
+            yield pd.DataFrame(page, columns=columns)
+
+    async def get_from_api(self, endpoint, operator, parameters={}, columns=None, verbose=False):
+        """
+        Get all the records of one request as a pandas.DataFrame (empty if no data),
+        concatenating the page batches once (see `iter_batches`)
+        """
+        batches = [batch async for batch in self.iter_batches(endpoint, operator, parameters, columns, verbose)]
+        if len(batches) > 0:
+            return pd.concat(batches, ignore_index=True)
+        return pd.DataFrame() # return an empty data.frame to avoid type error if no data
+
+    async def get_data(
+        self,
+        api,
+        operator=None,
+        columns=None,
+        fields=[],
+        labels=[],
+        only_valid_data=False,
+        date_fmt='%Y-%m-%d',
+        verbose=False,
+        **kwargs
+    ):
+        """
+        Get consolidated data of an api (see `hubeau.API`), formatted as `_AbstractHub._get_data` does:
+        valid data filter, fields selection/renaming and date index.
+
+        Parameters
+        ----------
+        api: str, one of the keys of `hubeau.API`, e.g. 'piezometry', 'groundwater_qual', 'river_qual'
+        operator: str, Optionnal. By default, the observations operator of the api.
+        columns: list of str, Optionnal. Fields requested to the API (see `iter_batches`), all by default.
+        kwargs: any parameters of the API request
+
+        Returns
+        -------
+        pandas.DataFrame with data
+        """
+        description = get_api_description(api)
+        if operator is None:
+            operator = description.get('operator_obs')
+
+        df = await self.get_from_api(description.get('endpoint'), operator, kwargs, columns, verbose)
+        return self._format_data(df, api, fields, labels, only_valid_data, date_fmt)
+
+    async def _get_batch(self, endpoint, operator, station_param, codes, parameters, columns=None, date_params=None,
+                         verbose=False):
+        """
+        Get the records of a batch of stations; the batch is halved when the API refuses the request because of
+        the total size limit. The date window of a single station refused is halved in the same way (when
+        `date_params` are given); a single station and day still refused gives an empty DataFrame.
+        Other errors (e.g. an outage or rate limiting, after the retries of `_get`) are raised.
+        """
+        try:
+            return await self.get_from_api(endpoint, operator, {**parameters, station_param: codes}, columns, verbose)
+        except HubeauRequestError as e:
+            if not e.size_limit:
+                raise
+            if len(codes) > 1:
+                halves = [codes[:len(codes) // 2], codes[len(codes) // 2:]]
+                requests = [(half, parameters) for half in halves]
+            else:
+                windows = []
+                if date_params is not None:
+                    start, end = parameters[date_params[0]], parameters[date_params[1]]
+                    days = (pd.Timestamp(end) - pd.Timestamp(start)).days + 1
+                    windows = date_windows(start, end, (days + 1) // 2) if days > 1 else []
+                if len(windows) == 0:
+                    if verbose:
+                        print('Error while fecthing data, nothing for station : {}\n{}'.format(codes[0], e))
+                    return pd.DataFrame()
+                requests = [(codes, {**parameters, date_params[0]: window[0], date_params[1]: window[1]})
+                            for window in windows]
+            dfs = await asyncio.gather(*[
+                self._get_batch(endpoint, operator, station_param, batch, params, columns, date_params, verbose)
+                for batch, params in requests
+            ])
+            return pd.concat(dfs, ignore_index=True)
+
+    async def get_data_by_station(
+        self,
+        api,
+        station_param,
+        codes,
+        station_field,
+        bbox=None,
+        date_params=None,
+        records_per_day=1.0,
+        operator=None,
+        columns=None,
+        fields=[],
+        labels=[],
+        only_valid_data=False,
+        date_fmt='%Y-%m-%d',
+        verbose=False,
+        **kwargs
+    ):
+        """
+        Get consolidated data of many stations with few requests, and split them back per station.
+        Stations are requested by batches of comma-separated codes (see `batch_codes`), or with a single bbox query
+        when a bbox is given and at least `bbox_min_stations` stations are requested (batches are used if the bbox
+        query is refused because of the total size limit).
+
+        When `date_params` are given, requests are kept below the total size limit of the APIs (`max_records`):
+        the volume of a station is estimated from the number of days of the period and `records_per_day`, the
+        period is split in date windows that a single station cannot exceed, batches are sized so that their
+        estimated volume fits in the limit, and the bbox query is skipped when its estimated volume does not.
+
+        Parameters
+        ----------
+        api: str, one of the keys of `hubeau.API`
+        station_param: str, the API parameter holding station codes, e.g. 'code_bss', 'bss_id', 'code_station'
+        codes: list of station codes
+        station_field: str, the field of the records holding the station code
+        bbox: list, Optionnal. [long_min, lat_min, long_max, lat_max] of the stations (if the api accepts bbox)
+        date_params: tuple of str, Optionnal. The API parameters of the start and end dates of the period,
+            e.g. ('date_debut_mesure', 'date_fin_mesure'). The period ends today if no end date is given.
+        records_per_day: float, estimated number of records of one station per day (e.g. 1 for daily levels)
+        columns: list of str, Optionnal. Fields requested to the API (see `iter_batches`), all by default.
+            Must hold `station_field` and the fields used by `fields` and `only_valid_data`.
+        kwargs: any other parameters of the API request
+
+        Returns
+        -------
+        dict {station code: pandas.DataFrame formatted as in `get_data`}, stations without data are missing
+
+        Raises
+        ------
+        HubeauRequestError if a request fails for another reason than the total size limit
+        """
+        description = get_api_description(api)
+        if operator is None:
+            operator = description.get('operator_obs')
+        endpoint = description.get('endpoint')
+        codes = list(dict.fromkeys(map(str, codes)))
+
+        # Date windows that one station cannot exceed, estimated volumes of one station (period and window)
+        windows, volume, window_volume = [kwargs], None, None
+        if date_params is not None and kwargs.get(date_params[0]):
+            start = kwargs[date_params[0]]
+            end = kwargs.get(date_params[1]) or pd.Timestamp.today().strftime('%Y-%m-%d')
+            days = (pd.Timestamp(end) - pd.Timestamp(start)).days + 1
+            window_days = max(int(self.max_records / records_per_day), 1)
+            windows = [{**kwargs, date_params[0]: window[0], date_params[1]: window[1]}
+                       for window in date_windows(start, end, window_days)]
+            volume = days * records_per_day
+            window_volume = min(days, window_days) * records_per_day
+        else:
+            date_params = None
+
+        df = None
+        if bbox is not None and len(codes) >= self.bbox_min_stations:
+            if volume is not None and len(codes) * volume > self.max_records:
+                if verbose:
+                    print('bbox query over the total size limit, stations are requested by batches')
+            else:
+                try:
+                    df = await self.get_from_api(endpoint, operator, {**kwargs, 'bbox': bbox}, columns, verbose)
+                except HubeauRequestError as e:
+                    if not e.size_limit:
+                        raise
+                    if verbose:
+                        print('bbox query over the total size limit, stations are requested by batches')
+        if df is None:
+            max_codes = MAX_CODES
+            if window_volume is not None:
+                max_codes = min(MAX_CODES, max(int(self.max_records / window_volume), 1))
+            dfs = await asyncio.gather(*[
+                self._get_batch(endpoint, operator, station_param, batch, parameters, columns, date_params, verbose)
+                for parameters in windows
+                for batch in batch_codes(codes, max_codes=max_codes)
+            ])
+            df = pd.concat(dfs, ignore_index=True) if len(dfs) > 0 else pd.DataFrame()
+
+        if df.empty:
+            return {}
+
+        df = df.loc[df[station_field].astype(str).isin(codes), :]
+        data = {}
+        for code, df_station in df.groupby(df[station_field].astype(str)):
+            df_station = self._format_data(df_station, api, fields, labels, only_valid_data, date_fmt)
+            if not df_station.empty:
+                data[code] = df_station
+        return data
+
+    @staticmethod
+    def _format_data(df, api, fields=[], labels=[], only_valid_data=False, date_fmt='%Y-%m-%d'):
+        """ valid data filter, fields selection/renaming and date index, as in `_AbstractHub._get_data` """
+        if df.empty:
+            return df
+
+        if only_valid_data:
+            df = _AbstractHub._filter_valid_data(df, mode=api)
+
+        if len(fields) > 0:
+            df = df.loc[:, fields]
+            if len(fields) == len(labels):
+                df.columns = labels
+
+        df = _AbstractHub._set_date_index(df, date_fmt=date_fmt)
+        return df.sort_index()
@@ -118,14 +118,14 @@ API_PATH_RANGES = {
          1,
          1)
     ),
-    # 'API_readers.CHMI_Meteo.CHMI_meteo': (
-    #     ((51.0557, 48.5518, 18.8592, 12.0907),
-    #      ('1961-01-01', CURRENT_DAY),
-    #      ['precipitation'],
-    #      'daily',
-    #      1,
-    #      1)
-    # ),
+    'API_readers.CHMI_Meteo.CHMI_meteo': (
+        ((51.0557, 48.5518, 18.8592, 12.0907),
+         ('1961-01-01', CURRENT_DAY),
+         ['temperature', 'precipitation'],
+         'daily',
+         1,
+         1)
+    ),
     'API_readers.UA_sw_quality.ukrainian_surface_water': (
         ((52.3791, 44.3824, 40.2276, 22.1371),
          ('1950-01-01', CURRENT_DAY),
@@ -150,7 +150,7 @@ API_PATH_RANGES = {
          1,
          1)
     ),
-    'API_readers.irish_meteo.Irish MS_daily': (
+    'API_readers.irish_meteo.irish_ms_daily': (
         ((55.3822, 51.4476, -6.0024, -10.4781),
          ('1985-01-01', CURRENT_DAY),
          ['precipitation'],
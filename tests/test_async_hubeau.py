@@ -0,0 +1,120 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+import pandas as pd
+from hubeaupyutils import AsyncHubeauClient, HubeauRequestError, batch_codes, date_windows
+
+
+def _response(status_code, data, next_url=None):
+    response = MagicMock(status_code=status_code, url="https://hubeau.eaufrance.fr/api/v1/niveaux_nappes/chroniques")
+    response.json.return_value = {"data": data, "next": next_url}
+    return response
+
+
+@pytest.mark.asyncio
+async def test_iter_batches_pagination_and_retry():
+    pages = [
+        _response(503, []),  # transient error, retried
+        _response(206, [{"code_bss": "A", "niveau_nappe_eau": 1.0, "extra": "x"}], next_url="https://next/page2"),
+        _response(200, [{"code_bss": "B"}]),
+    ]
+
+    async with AsyncHubeauClient(backoff=0) as client:
+        client._client.get = AsyncMock(side_effect=pages)
+        batches = [batch async for batch in client.iter_batches(
+            "niveaux_nappes", "chroniques", {"code_bss": ["A", "B"]}, columns=["code_bss", "niveau_nappe_eau"])]
+
+    # Only the requested fields are asked and kept, with the same schema for every page
+    assert client._client.get.await_args_list[0].kwargs["params"]["fields"] == "code_bss,niveau_nappe_eau"
+    assert client._client.get.await_args_list[2].args[0] == "https://next/page2"
+    assert [list(batch.columns) for batch in batches] == [["code_bss", "niveau_nappe_eau"]] * 2
+    assert pd.isna(batches[1].loc[0, "niveau_nappe_eau"])
+
+
+@pytest.mark.asyncio
+async def test_get_data_by_station_splits_failed_batches():
+    async def get(url, params=None):
+        codes = params["code_bss"].split(",")
+        if len(codes) > 1:
+            return _response(400, [])  # e.g. total size limit reached
+        return _response(200, [{"code_bss": codes[0], "date_mesure": "2020-01-01", "niveau_nappe_eau": 1.0}])
+
+    async with AsyncHubeauClient(backoff=0) as client:
+        client._client.get = AsyncMock(side_effect=get)
+        data = await client.get_data_by_station("piezometry", "code_bss", ["A", "B", "C"], "code_bss",
+                                                fields=["date_mesure", "niveau_nappe_eau"])
+
+    assert sorted(data) == ["A", "B", "C"]
+    assert data["A"]["niveau_nappe_eau"].tolist() == [1.0]
+
+
+@pytest.mark.asyncio
+async def test_get_data_by_station_raises_outages():
+    async with AsyncHubeauClient(backoff=0, retries=1) as client:
+        client._client.get = AsyncMock(return_value=_response(503, []))
+        with pytest.raises(HubeauRequestError) as error:
+            await client.get_data_by_station("piezometry", "code_bss", ["A", "B", "C"], "code_bss",
+                                             date_params=("date_debut_mesure", "date_fin_mesure"),
+                                             date_debut_mesure="2020-01-01", date_fin_mesure="2020-01-08")
+
+    # The batch is neither split by stations nor by date windows: one request and its retry
+    assert error.value.status_code == 503
+    assert client._client.get.await_count == 2
+
+
+def test_batch_codes():
+    codes = [f"0677{i:01d}X0010/BOURSI" for i in range(10)] + ["06770X0010/BOURSI"]
+    batches = batch_codes(codes, max_length=100)
+
+    # Duplicates are requested once, and every url-encoded batch fits in the length limit
+    assert sum(batches, []) == codes[:10]
+    assert all(sum(len(code) + 2 + 3 for code in batch) <= 100 for batch in batches)
+    assert len(batch_codes(codes, max_codes=4)) == 3
+
+
+def test_date_windows():
+    assert date_windows("2020-01-01", "2020-01-10", 4) == [
+        ("2020-01-01", "2020-01-04"), ("2020-01-05", "2020-01-08"), ("2020-01-09", "2020-01-10")]
+    assert date_windows("2020-01-01", "2020-01-01", 4) == [("2020-01-01", "2020-01-01")]
+
+
+@pytest.mark.asyncio
+async def test_get_data_by_station_keeps_requests_below_the_size_limit():
+    requests = []
+
+    async def get(url, params=None):
+        requests.append(params)
+        return _response(200, [{"code_bss": code, "date_mesure": params["date_debut_mesure"], "niveau_nappe_eau": 1.0}
+                               for code in params["code_bss"].split(",")])
+
+    codes = [f"S{i}" for i in range(60)]
+    async with AsyncHubeauClient(backoff=0, max_records=100) as client:
+        client._client.get = AsyncMock(side_effect=get)
+        data = await client.get_data_by_station("piezometry", "code_bss", codes, "code_bss",
+                                                bbox=[0, 0, 1, 1], date_params=("date_debut_mesure", "date_fin_mesure"),
+                                                date_debut_mesure="2020-01-01", date_fin_mesure="2020-01-10",
+                                                fields=["date_mesure", "niveau_nappe_eau"])
+
+    # The bbox query (60 stations x 10 days) is skipped, batches hold 10 stations at most
+    assert all("bbox" not in params for params in requests)
+    assert max(len(params["code_bss"].split(",")) for params in requests) == 10
+    assert sorted(data) == sorted(codes)
+
+
+@pytest.mark.asyncio
+async def test_get_data_by_station_splits_a_station_by_date_window():
+    async def get(url, params=None):
+        days = (pd.Timestamp(params["date_fin_mesure"]) - pd.Timestamp(params["date_debut_mesure"])).days + 1
+        if days > 2:
+            return _response(400, [])  # total size limit reached
+        return _response(200, [{"code_bss": "A", "date_mesure": params["date_debut_mesure"],
+                                "niveau_nappe_eau": 1.0}])
+
+    async with AsyncHubeauClient(backoff=0) as client:
+        client._client.get = AsyncMock(side_effect=get)
+        data = await client.get_data_by_station("piezometry", "code_bss", ["A"], "code_bss",
+                                                date_params=("date_debut_mesure", "date_fin_mesure"),
+                                                date_debut_mesure="2020-01-01", date_fin_mesure="2020-01-08",
+                                                fields=["date_mesure", "niveau_nappe_eau"])
+
+    # The period is halved until the API accepts the requests, instead of giving up on the station
+    assert len(data["A"]) == 4
@@ -0,0 +1,32 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from utils.atomic_write import atomic_path, atomic_write
+
+
+def test_concurrent_writers_of_the_same_file(tmp_path):
+    path = str(tmp_path / "mirror" / "entry")
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda i: atomic_write(path, f"version {i}" * 1000), range(32)))
+
+    # One complete version wins, and no temporary file is left behind
+    with open(path, encoding="utf-8") as f:
+        content = f.read()
+    assert content in {f"version {i}" * 1000 for i in range(32)}
+    assert os.listdir(tmp_path / "mirror") == ["entry"]
+
+
+def test_failed_write_keeps_the_previous_file(tmp_path):
+    path = str(tmp_path / "entry")
+    atomic_write(path, b"previous")
+
+    with pytest.raises(RuntimeError):
+        with atomic_path(path) as temp_path:
+            with open(temp_path, "wb") as f:
+                f.write(b"partial")
+            raise RuntimeError("interrupted")
+
+    with open(path, "rb") as f:
+        assert f.read() == b"previous"
+    assert os.listdir(tmp_path) == ["entry"]
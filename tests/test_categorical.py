@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+from utils.categorical import majority_by_group, mode_by_group
+
+
+DF = pd.DataFrame({
+    "S2CELL": ["b", "a", "b", "a", "b", "c", "a"],
+    "c": [3, 1, 3, 2, 4, np.nan, 2],
+    "cf": [7.0, 5.0, 8.0, 5.0, 9.0, np.nan, 6.0],
+})
+
+
+def test_mode_by_group_matches_pandas_mode():
+    expected = DF.groupby("S2CELL").agg(lambda x: x.mode().iloc[0] if not x.mode().empty else None)
+    result = mode_by_group(DF, "S2CELL")
+
+    assert list(result.index) == list(expected.index)
+    # Ties resolved to the smallest value; groups without values give NaN
+    assert result.loc["a", "c"] == 2
+    assert result.loc["b", "cf"] == 7.0
+    assert np.isnan(result.loc["c", "c"])
+    pd.testing.assert_frame_equal(result.loc[["a", "b"]].astype(float), expected.loc[["a", "b"]].astype(float),
+                                  check_names=False)
+
+
+def test_majority_by_group():
+    df = pd.DataFrame({
+        "S2CELL": [1, 1, 1, 2, 2],
+        "R": [230, 255, 255, 0, 0],
+        "G": [0, 255, 255, 166, 166],
+        "B": [77, 168, 168, 0, 0],
+    })
+    result = majority_by_group(df, "S2CELL", ["R", "G", "B"])
+
+    # The most frequent colour of each cell, not a mix of the channels
+    assert result.loc[1].tolist() == [255, 255, 168]
+    assert result.loc[2].tolist() == [0, 166, 0]
@@ -1,39 +1,49 @@
 import pytest
 from unittest.mock import patch, MagicMock
+import os
+import numpy as np
 import pandas as pd
-from datetime import datetime
-from API_readers.cds.cds_single_levels import read_data
+import xarray as xr
+from API_readers.cds.cds_single_levels import read_data, resample_daily
+
+
+def _hourly_dataset():
+    times = pd.date_range('2023-01-01', periods=48, freq='1h')
+    shape = (len(times), 1, 1)
+    return xr.Dataset(
+        {
+            't2m': (('valid_time', 'latitude', 'longitude'), np.full(shape, 273.15)),
+            'tp': (('valid_time', 'latitude', 'longitude'), np.full(shape, 0.001)),
+        },
+        coords={'valid_time': times, 'latitude': [50.0], 'longitude': [10.0], 'number': 0, 'expver': '0001'}
+    )
+
+
+def test_resample_daily_reductions():
+    result = resample_daily(_hourly_dataset())
+
+    assert result.sizes['valid_time'] == 2
+    # Temperature is averaged, precipitation accumulated over the day
+    assert float(result['t2m'][0, 0, 0]) == pytest.approx(273.15)
+    assert float(result['tp'][0, 0, 0]) == pytest.approx(0.024)
 
 
 @pytest.mark.asyncio
 @patch("API_readers.cds.cds_single_levels.cdsapi.Client")
+@patch("API_readers.cds.cds_single_levels.extract_members", return_value=["/mocked/scratch/data_0.nc"])
 @patch("API_readers.cds.cds_single_levels.xr.open_dataset")
-@patch("API_readers.cds.cds_single_levels.prepare_coordinates")
-@patch("API_readers.cds.cds_single_levels.os.path.join", return_value="/mocked/path/temp_data.nc")
-async def test_read_data(mock_join, mock_prepare_coordinates, mock_open_dataset, mock_cds_client):
+@patch("API_readers.cds.cds_single_levels.prepare_grid_coordinates")
+async def test_read_data(mock_prepare_coordinates, mock_open_dataset, mock_extract_members, mock_cds_client):
     # Mock the CDS API client retrieve method
     mock_retrieve = MagicMock()
     mock_cds_client.return_value.retrieve = mock_retrieve
 
-    # Mock xarray Dataset
-    mock_dataset = MagicMock()
-    mock_open_dataset.return_value = mock_dataset
-
-    # Mock Dataset to DataFrame conversion
-    mock_df = pd.DataFrame({
-        'latitude': [50.0, 50.1],
-        'longitude': [10.0, 10.1],
-        'valid_time': [datetime(2023, 1, 1, 0, 0), datetime(2023, 1, 1, 1, 0)],
-        't2m': [273.15, 274.15],  # Temperature in Kelvin
-        'tp': [0.01, 0.02],  # Precipitation in meters
-        'expver': [1, 1],
-        'number': [0, 0]
-    })
-    mock_dataset.to_dataframe.return_value = mock_df
+    # Hourly xarray Dataset returned by the (mocked) NetCDF reader
+    mock_open_dataset.return_value = _hourly_dataset()
 
     # Define a side effect for prepare_coordinates
-    def add_s2cell_column(df, spatial_range, level):
-        df['S2CELL'] = ['cell1', 'cell2']
+    def add_s2cell_column(df, spatial_range, level, grid_name, resolution):
+        df['S2CELL'] = 'cell1'
         return df
 
     # Assign the side effect to the mock
@@ -50,15 +60,22 @@ async def test_read_data(mock_join, mock_prepare_coordinates, mock_open_dataset,
 
     # Assertions
     mock_retrieve.assert_called_once()
-    mock_open_dataset.assert_called_once_with("/mocked/path/temp_data.nc")
+    mock_open_dataset.assert_called_once()
+    assert mock_open_dataset.call_args[0][0] == "/mocked/scratch/data_0.nc"
+
+    # The archive is downloaded and extracted inside a per-request scratch folder
+    download_path = mock_retrieve.call_args[0][2]
+    assert mock_extract_members.call_args[0] == (download_path, os.path.dirname(download_path))
+    assert not os.path.exists(os.path.dirname(download_path))
     mock_prepare_coordinates.assert_called_once()
 
-    # Validate the arguments passed to prepare_coordinates
+    # Data reaches the cell mapping already reduced to daily rows
     called_args = mock_prepare_coordinates.call_args[0]
     assert isinstance(called_args[0], pd.DataFrame)
     assert 'lat' in called_args[0].columns
     assert 'lon' in called_args[0].columns
     assert 'Timestamp' in called_args[0].columns
+    assert called_args[0].shape[0] == 2
 
     # Check mappings for aliases and global mappings
     assert "Temperature [°C]" in result.columns
@@ -67,9 +84,9 @@ async def test_read_data(mock_join, mock_prepare_coordinates, mock_open_dataset,
     # Validate data transformations
     assert isinstance(result, pd.DataFrame)
     # Temperature should be converted from Kelvin to Celsius
-    assert result["Temperature [°C]"].iloc[0][0] == pytest.approx(0)  # 273.15 K -> 0°C
-    # Precipitation should be converted from meters to daily total in mm
-    assert result["Precipitation total [mm]"].iloc[0][0] == pytest.approx(0.01 * 24 * 60 * 60)  # Converted to mm
+    assert result["Temperature [°C]"].iloc[0].iloc[0] == pytest.approx(0)  # 273.15 K -> 0°C
+    # Precipitation should be the daily sum converted from meters to mm
+    assert result["Precipitation total [mm]"].iloc[0].iloc[0] == pytest.approx(24.0)
 
     # Ensure the result is pivoted by Timestamp and S2CELL
     assert result.index.name == "Timestamp"
@@ -0,0 +1,44 @@
+import os
+import zipfile
+import pytest
+from API_readers.cds.cds_utils import cds_storage
+from API_readers.cds.cds_utils.cds_storage import request_scratch_dir, extract_members
+
+
+def test_request_scratch_dir_is_private_and_removed(tmp_path, monkeypatch):
+    monkeypatch.setattr(cds_storage, "TEMP_STORAGE", str(tmp_path))
+    with request_scratch_dir('reanalysis-era5-single-levels') as first, \
+            request_scratch_dir('reanalysis-era5-single-levels') as second:
+        assert first != second
+        assert os.path.isdir(first)
+        assert os.path.isdir(second)
+        assert os.path.dirname(first) == str(tmp_path)
+    assert not os.path.exists(first)
+    assert not os.path.exists(second)
+
+
+def test_extract_members_only_expected(tmp_path):
+    zip_path = tmp_path / "download.zip"
+    with zipfile.ZipFile(zip_path, 'w') as zip_ref:
+        zip_ref.writestr("data_stream-oper_stepType-instant.nc", b"instant")
+        zip_ref.writestr("nested/data_stream-oper_stepType-instant.nc", b"nested instant")
+        zip_ref.writestr("README.txt", b"skip me")
+
+    extracted = extract_members(zip_path, tmp_path)
+
+    # Members keep their relative paths, so that members with the same name do not overwrite each other
+    assert sorted(os.path.relpath(f, tmp_path) for f in extracted) == [
+        "data_stream-oper_stepType-instant.nc", os.path.join("nested", "data_stream-oper_stepType-instant.nc")
+    ]
+    assert not (tmp_path / "README.txt").exists()
+    assert (tmp_path / "data_stream-oper_stepType-instant.nc").read_bytes() == b"instant"
+    assert (tmp_path / "nested" / "data_stream-oper_stepType-instant.nc").read_bytes() == b"nested instant"
+
+
+def test_extract_members_rejects_outside_paths(tmp_path):
+    zip_path = tmp_path / "download.zip"
+    with zipfile.ZipFile(zip_path, 'w') as zip_ref:
+        zip_ref.writestr("../escape.nc", b"escape")
+
+    with pytest.raises(ValueError):
+        extract_members(zip_path, tmp_path / "target")
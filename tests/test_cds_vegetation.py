@@ -8,31 +8,21 @@ from API_readers.cds.cds_vegetation import read_data
 
 @pytest.mark.asyncio
 @patch("API_readers.cds.cds_vegetation.cdsapi.Client")
-@patch("API_readers.cds.cds_vegetation.zipfile.ZipFile")
-@patch("API_readers.cds.cds_vegetation.glob.glob")
+@patch("API_readers.cds.cds_vegetation.extract_members")
 @patch("API_readers.cds.cds_vegetation.xr.open_dataset")
 @patch("API_readers.cds.cds_vegetation.prepare_coordinates")
-@patch("API_readers.cds.cds_vegetation.os.remove")
-@patch("API_readers.cds.cds_vegetation.os.path.join", return_value="/mocked/path/temp_data.zip")
 async def test_read_data(
-    mock_join,
-    mock_os_remove,
     mock_prepare_coordinates,
     mock_open_dataset,
-    mock_glob,
-    mock_zipfile,
+    mock_extract_members,
     mock_cds_client,
 ):
     # Mock the CDS API client retrieve method
     mock_retrieve = MagicMock()
     mock_cds_client.return_value.retrieve = mock_retrieve
 
-    # Mock zipfile extraction
-    mock_zip = MagicMock()
-    mock_zipfile.return_value.__enter__.return_value = mock_zip
-
-    # Mock glob to find NetCDF files
-    mock_glob.return_value = ["/mocked/path/file1.nc", "/mocked/path/file2.nc"]
+    # Mock extraction of the NetCDF members
+    mock_extract_members.return_value = ["/mocked/path/file1.nc", "/mocked/path/file2.nc"]
 
     # Mock xarray Dataset
     mock_dataset = MagicMock()
@@ -40,6 +30,7 @@ async def test_read_data(
 
     # Mock xarray datasets
     mock_dataset1 = MagicMock()
+    mock_dataset1.__enter__.return_value = mock_dataset1
     mock_dataset1.sel.return_value.to_dataframe.return_value.reset_index.return_value = pd.DataFrame({
         'lat_var': [50.0, 50.1],
         'lon_var': [10.0, 10.1],
@@ -53,6 +44,7 @@ async def test_read_data(
     })
 
     mock_dataset2 = MagicMock()
+    mock_dataset2.__enter__.return_value = mock_dataset2
     mock_dataset2.sel.return_value.to_dataframe.return_value.reset_index.return_value = pd.DataFrame({
         'lat_var': [50.0, 50.1],
         'lon_var': [10.0, 10.1],
@@ -85,8 +77,8 @@ async def test_read_data(
 
     # Assertions
     mock_retrieve.assert_called_once()
-    mock_zipfile.assert_called_once_with("/mocked/path/temp_data.zip", 'r')
-    mock_glob.assert_called_once_with("/mocked/path/temp_data.zip")
+    download_path = mock_retrieve.call_args[0][2]
+    mock_extract_members.assert_called_once_with(download_path, os.path.dirname(download_path))
     assert mock_open_dataset.call_count == 2
     mock_prepare_coordinates.assert_called()
 
@@ -96,7 +88,5 @@ async def test_read_data(
     assert "Timestamp" == result.index.name
     assert "Potential Evaporation [m]" in result.columns.levels[0]  # From GLOBAL_MAPPING
 
-    # Cleanup assertions
-    mock_os_remove.assert_any_call("/mocked/path/temp_data.zip")
-    for nc_file in mock_glob.return_value:
-        mock_os_remove.assert_any_call(nc_file)
+    # The per-request scratch folder is removed afterwards
+    assert not os.path.exists(os.path.dirname(download_path))
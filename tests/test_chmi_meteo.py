@@ -0,0 +1,84 @@
+import json
+import pytest
+from API_readers.CHMI_Meteo import CHMI_meteo
+from API_readers.CHMI_Meteo.CHMI_meteo import (ingest, parse_metadata, parse_station_file, read_data, write_stations,
+                                               write_values)
+
+
+def metadata_bytes():
+    return json.dumps({"data": {"data": {
+        "header": "WSI,GH_ID,BEGIN_DATE,END_DATE,FULL_NAME,GEOGR1,GEOGR2,ELEVATION",
+        "values": [
+            ["0-20000-0-11406", "L3CHEB01", "1961-01-01T00:00:00Z", "1999-12-31T23:59:00Z", "Cheb", "12.40", "50.07", "483"],
+            ["0-20000-0-11406", "L3CHEB01", "2000-01-01T00:00:00Z", "3999-12-31T23:59:00Z", "Cheb", "12.39", "50.08", "483"],
+            ["0-20000-0-11520", "P1PRAG01", "1961-01-01T00:00:00Z", "3999-12-31T23:59:00Z", "Praha", "14.26", "50.01", "364"],
+        ]}}}).encode("utf-8")
+
+
+def station_bytes():
+    return json.dumps({"data": {"data": {
+        "header": "STATION,ELEMENT,VTYPE,DT,VAL,FLAG,QUALITY",
+        "values": [
+            ["0-20000-0-11406", "SRA", "07:00", "2020-01-01T07:00:00Z", "1.5", "", "0"],
+            ["0-20000-0-11406", "SRA", "19:00", "2020-01-01T19:00:00Z", "0.5", "", "0"],
+            ["0-20000-0-11406", "T", "AVG", "2020-01-01T00:00:00Z", "-2.0", "", "0"],
+            ["0-20000-0-11406", "SRA", "07:00", "2020-01-02T07:00:00Z", "0.0", "", "0"],
+            ["0-20000-0-11406", "F", "AVG", "2020-01-02T00:00:00Z", "3.1", "", "0"],
+        ]}}}).encode("utf-8")
+
+
+def test_parse_station_file():
+    df = parse_station_file(station_bytes())
+
+    # Precipitation is summed and temperature averaged per day; other elements are dropped
+    assert list(df.columns) == ["date", "T", "SRA"]
+    assert df["SRA"].tolist() == [2.0, 0.0]
+    assert df["T"].iloc[0] == -2.0
+
+
+@pytest.mark.asyncio
+async def test_read_data(tmp_path, monkeypatch):
+    monkeypatch.setattr("API_readers.CHMI_Meteo.CHMI_meteo.STORE_DIR", str(tmp_path))
+    assert await read_data((50.1, 50.0, 12.5, 12.3), ("2020-01-01", "2020-01-31"), ["precipitation"], 8) is None
+
+    write_stations(parse_metadata(metadata_bytes()), str(tmp_path))
+    write_values("0-20000-0-11406", parse_station_file(station_bytes()), str(tmp_path))
+
+    # A bounding box around Cheb only; the location valid in 2020 is used
+    result = await read_data((50.1, 50.0, 12.5, 12.3), ("2020-01-02", "2020-01-31"), ["precipitation"], 8)
+
+    assert list(result.columns.get_level_values(0).unique()) == ["Precipitation total [mm]"]
+    assert result.shape == (1, 1)
+    assert result.iloc[0, 0] == 0.0
+
+
+@pytest.mark.asyncio
+async def test_ingest_is_incremental(tmp_path, monkeypatch):
+    bodies = {CHMI_meteo.METADATA_URL: metadata_bytes(),
+              CHMI_meteo.BASE_URL + "dly-0-20000-0-11406.json": station_bytes()}
+    parsed = []
+
+    async def cached_get(client, url, cache_dir, revalidate=True, semaphore=None):
+        return bodies[url]
+
+    async def fetch_json_files(client):
+        return ["dly-0-20000-0-11406.json"]
+
+    async def run_in_process(func, *args):
+        parsed.append(func.__name__)
+        return func(*args)
+
+    monkeypatch.setattr(CHMI_meteo, "cached_get", cached_get)
+    monkeypatch.setattr(CHMI_meteo, "fetch_json_files", fetch_json_files)
+    monkeypatch.setattr(CHMI_meteo, "run_in_process", run_in_process)
+
+    assert await ingest(store_dir=str(tmp_path)) == ["0-20000-0-11406"]
+
+    # Unchanged files are skipped...
+    assert await ingest(store_dir=str(tmp_path)) == []
+    assert parsed.count("parse_station_file") == 1
+
+    # ...changed ones are ingested again
+    bodies[CHMI_meteo.BASE_URL + "dly-0-20000-0-11406.json"] = station_bytes().replace(b'"1.5"', b'"2.5"')
+    assert await ingest(store_dir=str(tmp_path)) == ["0-20000-0-11406"]
+    assert parsed.count("parse_station_file") == 2
@@ -1,7 +1,8 @@
 import pytest
 import pandas as pd
 import s2sphere
-from utils.coordinates_to_cells import prepare_coordinates
+import os
+from utils.coordinates_to_cells import prepare_coordinates, prepare_grid_coordinates, grid_cells
 
 
 def test_prepare_coordinates_with_valid_data():
@@ -85,3 +86,45 @@ def test_prepare_coordinates_with_edge_case_coordinates():
     # Assert that S2CELL values are valid
     for cell_id in result['S2CELL']:
         assert isinstance(cell_id, s2sphere.CellId)
+
+
+def test_prepare_grid_coordinates_matches_prepare_coordinates(tmp_path):
+    # ERA5-like 0.25° grid points repeated over two days
+    coordinates = pd.DataFrame({
+        'lat': [50.0, 50.25, 49.75, 50.0, 50.25, 49.75],
+        'lon': [14.0, 14.25, 13.5, 14.0, 14.25, 13.5],
+        'Timestamp': ['2023-01-01'] * 3 + ['2023-01-02'] * 3
+    })
+    spatial_range = (51.5, 49.0, 15.5, 13.0)  # N, S, E, W
+    level = 10
+
+    result = prepare_grid_coordinates(coordinates, spatial_range, level, 'era5', 0.25, cache_dir=tmp_path)
+    expected = prepare_coordinates(coordinates, spatial_range, level)
+
+    assert list(result['S2CELL']) == list(expected['S2CELL'])
+    for cell_id in result['S2CELL']:
+        assert isinstance(cell_id, s2sphere.CellId)
+
+    # The lookup table is stored on disk once per grid and level
+    assert os.listdir(tmp_path) == ['era5_0.25_L10.npy']
+
+
+def test_grid_cells_reuses_cached_table(tmp_path, monkeypatch):
+    grid_cells([50.0], [14.0], 10, 'era5', 0.25, cache_dir=tmp_path)
+
+    # Cached points must not be recomputed
+    def fail(*args, **kwargs):
+        raise AssertionError("S2Cell recomputed for a cached grid point")
+
+    monkeypatch.setattr(s2sphere.CellId, 'from_lat_lng', fail)
+    result = grid_cells([50.0, 50.0], [14.0, 14.0], 10, 'era5', 0.25, cache_dir=tmp_path)
+    assert len(set(result.tolist())) == 1
+
+
+def test_prepare_grid_coordinates_with_no_matching_coordinates(tmp_path):
+    coordinates = pd.DataFrame({'lat': [52.0, 53.0], 'lon': [16.0, 17.0]})
+    spatial_range = (51.5, 49.0, 15.5, 13.0)  # N, S, E, W
+
+    result = prepare_grid_coordinates(coordinates, spatial_range, 10, 'era5', 0.25, cache_dir=tmp_path)
+
+    assert result is None
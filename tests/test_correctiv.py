@@ -0,0 +1,42 @@
+import pandas as pd
+from API_readers.correctiv.utils.extractors import spatial_extraction
+from API_readers.correctiv.utils.preparation import data_melting
+
+
+def test_spatial_extraction(tmp_path):
+    path = tmp_path / "data_points.parquet"
+    pd.DataFrame({
+        "latitude": [52.5, 48.1, 52.6],
+        "longitude": [13.4, 11.6, 13.5],
+        "year": [2020, 2020, 2021],
+        "month": [1, 1, 2],
+        "min_gwl": [1.0, 2.0, 3.0],
+        "mean_gwl": [1.5, 2.5, 3.5],
+        "max_gwl": [2.0, 3.0, 4.0],
+        "station": ["a", "b", "c"],
+    }).to_parquet(path, row_group_size=1)
+
+    df = spatial_extraction(str(path), (53.0, 52.0, 14.0, 13.0))
+
+    # Only the points in the bounding box and the needed columns are read
+    assert "station" not in df.columns
+    assert df["date"].tolist() == [pd.Timestamp("2020-01-01"), pd.Timestamp("2021-02-01")]
+
+
+def test_data_melting():
+    data = pd.DataFrame({
+        "S2CELL": ["x", "x", "y"],
+        "date": pd.to_datetime(["2020-01-01", "2020-02-01", "2021-02-01"]),
+        "min_gwl": [1.0, 2.0, 3.0],
+        "mean_gwl": [1.5, 2.5, 3.5],
+        "max_gwl": [2.0, 3.0, 4.0],
+    })
+
+    df = data_melting(data)
+
+    # Every day of each month, with the value of its month
+    assert len(df) == 31 + 29 + 28
+    x = df[df["S2CELL"] == "x"].set_index("date")
+    assert x.index.tolist() == list(pd.date_range("2020-01-01", "2020-02-29"))
+    assert x.loc["2020-01-31", "min_gwl"] == 1.0
+    assert x.loc["2020-02-29", "min_gwl"] == 2.0
@@ -0,0 +1,46 @@
+import asyncio
+from unittest.mock import MagicMock
+from utils.download_cache import cached_get
+
+
+class FakeClient:
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.calls = []
+
+    async def get(self, url, headers=None):
+        self.calls.append((url, headers))
+        return self.responses.pop(0)
+
+
+def test_cached_get_stores_and_revalidates(tmp_path):
+    client = FakeClient([
+        MagicMock(status_code=200, content=b"archive", headers={'ETag': '"v1"', 'Last-Modified': 'Mon, 01 Jan 2024'}),
+        MagicMock(status_code=304, content=b"", headers={}),
+    ])
+
+    first = asyncio.run(cached_get(client, "https://example.com/2024.zip", tmp_path))
+    second = asyncio.run(cached_get(client, "https://example.com/2024.zip", tmp_path))
+
+    assert first == second == b"archive"
+    # The second request is conditional on the stored validators
+    assert client.calls[1][1] == {'If-None-Match': '"v1"', 'If-Modified-Since': 'Mon, 01 Jan 2024'}
+
+
+def test_cached_get_without_revalidation_skips_network(tmp_path):
+    client = FakeClient([MagicMock(status_code=200, content=b"archive", headers={})])
+
+    asyncio.run(cached_get(client, "https://example.com/1990.zip", tmp_path, revalidate=False))
+    result = asyncio.run(cached_get(client, "https://example.com/1990.zip", tmp_path, revalidate=False))
+
+    assert result == b"archive"
+    assert len(client.calls) == 1
+
+
+def test_cached_get_error_status(tmp_path):
+    client = FakeClient([MagicMock(status_code=404, content=b"Not Found", headers={})])
+
+    result = asyncio.run(cached_get(client, "https://example.com/missing.zip", tmp_path))
+
+    assert result is None
+    assert list(tmp_path.iterdir()) == []
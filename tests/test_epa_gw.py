@@ -0,0 +1,47 @@
+import pytest
+from unittest.mock import MagicMock, patch
+from io import BytesIO
+import zipfile
+import pandas as pd
+from API_readers.epa_ireland.epa_gw import read_data
+
+
+def station_zip():
+    # Hydronet export: 7 lines of station header, then the column header and the daily means
+    lines = ["#"] * 7 + ["Timestamp;Value", "2020-01-01 00:00:00;80.05", "2020-01-02 00:00:00;80.15"]
+    buffer = BytesIO()
+    with zipfile.ZipFile(buffer, mode="w") as zf:
+        zf.writestr("complete_daymean.csv", "\n".join(lines))
+    return buffer.getvalue()
+
+
+@pytest.mark.asyncio
+@patch("API_readers.epa_ireland.epa_gw.httpx.AsyncClient")
+async def test_read_data(mock_httpx_client, tmp_path, monkeypatch):
+    content = station_zip()
+
+    async def mock_get(url, headers=None, **kwargs):
+        return MagicMock(status_code=200, content=content, headers={})
+
+    client = mock_httpx_client.return_value.__aenter__.return_value
+    client.get.side_effect = mock_get
+
+    # Keep the station cache out of the package folder
+    monkeypatch.setattr("API_readers.epa_ireland.epa_gw.CACHE_DIR", str(tmp_path))
+
+    # A bounding box around the "DUFFYS CROSSROADS" station only
+    spatial_range = (53.37, 53.36, -6.61, -6.62)
+    time_range = ("2020-01-01", "2020-01-02")
+    level = 8
+
+    result = await read_data(spatial_range, time_range, ["groundwater quantity"], level)
+
+    # Only the station within the range is downloaded
+    assert client.get.call_count == 1
+    assert "IE_EA_G_0002_1400_0007" in client.get.call_args.args[0]
+    assert isinstance(result, pd.DataFrame)
+    assert result["Groundwater Depth [cm]"].iloc[0, 0] == pytest.approx(800)
+
+    # The cached series covers the range: no further request
+    await read_data(spatial_range, time_range, ["groundwater quantity"], level)
+    assert client.get.call_count == 1
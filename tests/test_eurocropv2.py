@@ -0,0 +1,40 @@
+import pandas as pd
+import pyarrow.parquet as pq
+from API_readers.EuroCropV2.utils.conversion import convert_points
+from API_readers.EuroCropV2.utils.extractors import extract_data_by_bbox
+from API_readers.EuroCropV2.utils.preparation import data_agregation
+from utils.coordinates_to_cells import prepare_coordinates
+
+
+POINTS = pd.DataFrame({
+    "lon": [21.01, 21.02, 2.35, 21.03],
+    "lat": [52.23, 52.24, 48.85, 52.22],
+    "c2018": [1, 1, 5, 2],
+    "cf2018": [10, 11, 50, 12],
+    "c2019": [3, 3, 6, 3],
+    "cf2019": [30, 31, 60, 32],
+})
+
+
+def test_convert_and_extract(tmp_path):
+    csv_path = str(tmp_path / "points.csv")
+    parquet_path = str(tmp_path / "points.parquet")
+    POINTS.to_csv(csv_path, index=False)
+
+    convert_points(csv_path, parquet_path, batch_size=2)
+
+    # Rows are sorted by their leaf S2Cell
+    s2 = pq.read_table(parquet_path, columns=["s2"]).column("s2").to_pylist()
+    assert s2 == sorted(s2)
+
+    # Only the points in the bounding box and the columns of the requested years are read
+    spatial_range = (53.0, 52.0, 22.0, 20.0)
+    df = extract_data_by_bbox(parquet_path, spatial_range, ("2019-01-01", "2019-12-31"))
+    assert list(df.columns) == ["lon", "lat", "s2", "c2019", "cf2019"]
+    assert len(df) == 3
+
+    # The precomputed cells match prepare_coordinates
+    expected = prepare_coordinates(POINTS.iloc[[0, 1, 3]], spatial_range, 8)
+    result = data_agregation(df, spatial_range, 8)
+    assert set(result.index) == set(expected["S2CELL"])
+    assert result["c2019"].unique().tolist() == [3]
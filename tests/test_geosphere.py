@@ -2,13 +2,16 @@ import pytest
 import pandas as pd
 from unittest.mock import AsyncMock, patch, MagicMock
 from datetime import datetime
-from API_readers.geosphere.geosphere import read_data, fetch_station_metadata, fetch_station_data
+from API_readers.geosphere.geosphere import read_data, fetch_station_metadata, fetch_station_data, split_requests, \
+    get_station_registry
 
 @pytest.mark.asyncio
-@patch("API_readers.geosphere.geosphere.prepare_coordinates")
 @patch("API_readers.geosphere.geosphere.fetch_station_metadata")
 @patch("API_readers.geosphere.geosphere.fetch_station_data")
-async def test_read_data(mock_fetch_station_data, mock_fetch_station_metadata, mock_prepare_coordinates):
+async def test_read_data(mock_fetch_station_data, mock_fetch_station_metadata, monkeypatch):
+    # No cached station metadata
+    monkeypatch.setattr("API_readers.geosphere.geosphere._STATIONS", {})
+
     # Mock fetch_station_metadata
     mock_metadata = pd.DataFrame({
         "id": ["station1", "station2"],
@@ -27,13 +30,6 @@ async def test_read_data(mock_fetch_station_data, mock_fetch_station_metadata, m
     })
     mock_fetch_station_data.return_value = mock_data
 
-    # Mock prepare_coordinates
-    def mock_prepare(df, spatial_range, level):
-        df["S2CELL"] = [f"cell{i}" for i in range(len(df))]
-        return df
-
-    mock_prepare_coordinates.side_effect = mock_prepare
-
     # Test parameters
     spatial_range = (51.0, 49.0, 11.0, 9.0)
     time_range = ("2023-01-01", "2023-01-02")
@@ -45,10 +41,10 @@ async def test_read_data(mock_fetch_station_data, mock_fetch_station_metadata, m
 
     # Assertions
     mock_fetch_station_metadata.assert_called_once()
-    mock_fetch_station_data.assert_called_once_with(
+    mock_fetch_station_data.assert_called_once()
+    assert mock_fetch_station_data.call_args.args == (
         "klima-v2-1d", ["station1", "station2"], time_range, ["tl_mittel", "rr"]
     )
-    mock_prepare_coordinates.assert_called_once()
 
     assert isinstance(result, pd.DataFrame)
     assert not result.empty
@@ -108,3 +104,46 @@ async def test_fetch_station_data(mock_httpx_client):
     assert isinstance(result, pd.DataFrame)
     assert list(result.columns) == ["station", "time", "tl_mittel", "rr"]
     assert len(result) == 2
+
+
+def test_split_requests():
+    station_ids = [f"station{i}" for i in range(5)]
+    chunks = split_requests(station_ids, ("2022-06-01", "2024-02-15"), stations_per_request=2)
+
+    # 3 batches of stations x 3 calendar years, the first and last years being cut to the time range
+    assert len(chunks) == 9
+    assert chunks[0] == (["station0", "station1"], ("2022-06-01", "2022-12-31"))
+    assert chunks[1][1] == ("2023-01-01", "2023-12-31")
+    assert chunks[-1] == (["station4"], ("2024-01-01", "2024-02-15"))
+
+
+@pytest.mark.asyncio
+@patch("API_readers.geosphere.geosphere.fetch_station_metadata")
+async def test_station_metadata_cached(mock_fetch_station_metadata, monkeypatch):
+    monkeypatch.setattr("API_readers.geosphere.geosphere._STATIONS", {})
+    mock_fetch_station_metadata.return_value = pd.DataFrame({
+        "id": ["station1"], "name": ["Station 1"], "lat": [50.0], "lon": [10.0]
+    })
+
+    # Station metadata are fetched once within their TTL
+    first = await get_station_registry()
+    second = await get_station_registry()
+    assert first is second
+    mock_fetch_station_metadata.assert_called_once()
+
+
+@pytest.mark.asyncio
+@patch("API_readers.geosphere.geosphere.fetch_station_metadata")
+@patch("API_readers.geosphere.geosphere.fetch_station_data")
+async def test_read_data_raises_processing_errors(mock_fetch_station_data, mock_fetch_station_metadata, monkeypatch):
+    monkeypatch.setattr("API_readers.geosphere.geosphere._STATIONS", {})
+    mock_fetch_station_metadata.return_value = pd.DataFrame({
+        "id": ["station1"], "name": ["Station 1"], "lat": [50.0], "lon": [10.0]
+    })
+    # A chunk without the precipitation column fails in the cleaning, which is not a network failure
+    mock_fetch_station_data.return_value = pd.DataFrame({
+        "station": ["station1"], "time": ["2023-01-01"], "tl_mittel": [5.0]
+    })
+
+    with pytest.raises(KeyError):
+        await read_data((51.0, 49.0, 11.0, 9.0), ("2023-01-01", "2023-01-02"), ["temperature", "precipitation"], 8)
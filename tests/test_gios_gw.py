@@ -0,0 +1,40 @@
+from io import BytesIO
+import os
+import pandas as pd
+from API_readers.gios_gw.gios_gw import convert_workbook, read_table, table_path
+
+
+def workbook_bytes():
+    df = pd.DataFrame({
+        "PUWG 1992 X": [500000.0, 700000.0],
+        "PUWG 1992 Y": [500000.0, 300000.0],
+        "Data poboru próbki": ["01.06.2023", "01.06.2023"],
+        "Numer punktu pomiarowego wg MONBADA": [1, 2],
+        "Chlorki [mgCl/l]": ["12,5", "<3"],
+        "Kadm [mgCd/l]": ["0,001", "0,002"],
+    })
+    buffer = BytesIO()
+    df.to_excel(buffer, index=False)
+    return buffer.getvalue()
+
+
+def test_convert_workbook(tmp_path, monkeypatch):
+    monkeypatch.setattr("API_readers.gios_gw.gios_gw.CACHE_DIR", str(tmp_path))
+    url = "https://example.com/wyniki.xlsx"
+    content = workbook_bytes()
+    old_path = table_path(url, b"previous version")
+    os.makedirs(os.path.dirname(old_path))
+    open(old_path, "wb").close()
+
+    path = table_path(url, content)
+    convert_workbook(content, path)
+
+    # The workbook is stored once per content, replacing its previous versions
+    assert os.path.exists(path)
+    assert not os.path.exists(old_path)
+
+    # Only the requested columns and the records inside the bounding box are read
+    df = read_table(path, ["Chlorides [mgCl/l]"], (53.0, 51.0, 20.0, 18.0), ("2023-01-01", "2023-12-31"))
+    assert list(df.columns) == ["id", "date", "lat", "lon", "Chlorides [mgCl/l]"]
+    assert df["id"].tolist() == [1]
+    assert df["Chlorides [mgCl/l]"].tolist() == [12.5]
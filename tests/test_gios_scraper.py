@@ -31,9 +31,11 @@ async def test_extract_point_ids(mock_client):
 @pytest.mark.asyncio
 @patch("API_readers.gios.gios_scraper.extract_point_ids")
 @patch("API_readers.gios.gios_scraper.scrape_point_data")
-@patch("API_readers.gios.gios_scraper.prepare_coordinates")
-@patch("API_readers.gios.gios_scraper.pd.read_csv")
-async def test_read_data(mock_read_csv, mock_prepare_coordinates, mock_scrape_point_data, mock_extract_point_ids):
+@patch("API_readers.gios.gios_scraper.load_registry")
+async def test_read_data(mock_load_registry, mock_scrape_point_data, mock_extract_point_ids, tmp_path, monkeypatch):
+    # Keep the parsed points cache out of the package folder
+    monkeypatch.setattr("API_readers.gios.gios_scraper.CACHE_DIR", str(tmp_path))
+
     # Mock the point IDs
     mock_extract_point_ids.return_value = "123,456"
 
@@ -42,7 +44,7 @@ async def test_read_data(mock_read_csv, mock_prepare_coordinates, mock_scrape_po
         "id": [123, 456],
         "S2CELL": ["cell1", "cell2"]
     })
-    mock_prepare_coordinates.return_value = mock_coordinates
+    mock_load_registry.return_value.select.return_value = mock_coordinates
 
     # Mock scraped data
     mock_scrape_point_data.return_value = pd.DataFrame({
@@ -52,9 +54,6 @@ async def test_read_data(mock_read_csv, mock_prepare_coordinates, mock_scrape_po
         "Soil CaCo3 [%]": [3.0, 4.0]
     })
 
-    # Mock CSV read
-    mock_read_csv.return_value = mock_coordinates
-
     # Test parameters
     spatial_range = (50, 40, 10, 20)
     time_range = ("2020-01-01", "2020-12-31")
@@ -66,3 +65,8 @@ async def test_read_data(mock_read_csv, mock_prepare_coordinates, mock_scrape_po
     assert result is not None, "The returned DataFrame is None"
     assert isinstance(result, pd.DataFrame), "The returned result is not a DataFrame"
     assert "cell1" in result.columns.get_level_values(1), "S2CELL mapping failed"
+
+    # Points and their parsed tables are cached until a new campaign may have been published
+    await read_data(spatial_range, time_range, data_range, level)
+    assert mock_extract_point_ids.call_count == 1
+    assert mock_scrape_point_data.call_count == 2
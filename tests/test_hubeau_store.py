@@ -0,0 +1,80 @@
+import pytest
+import pandas as pd
+from API_readers.hubeau.hubeau_store import read_stations, read_station, dataset_key
+
+
+def _series(dates, values):
+    return pd.DataFrame({"value": values}, index=pd.DatetimeIndex(pd.to_datetime(dates), name="date"))
+
+
+@pytest.mark.asyncio
+async def test_read_stations_incremental(tmp_path):
+    calls = []
+
+    async def fetch(codes, date_debut):
+        calls.append((codes, date_debut))
+        if len(calls) == 1:
+            return {"A": _series(["2020-01-05", "2020-02-10"], [1.0, 2.0])}
+        # Second call: the last month is downloaded again, with a revised and a new record
+        return {"A": _series(["2020-02-10", "2020-03-01"], [2.5, 3.0])}
+
+    # First request: full download from the requested start
+    data = await read_stations("piezometry", ["A", "B"], ("2020-01-01", "2020-01-31"), fetch, store_dir=str(tmp_path))
+    assert calls[0] == (["A", "B"], "2020-01-01")
+    assert list(data) == ["A"]
+    assert data["A"]["value"].tolist() == [1.0]
+
+    df, meta = read_station("piezometry", "A", str(tmp_path))
+    assert meta["start"] == "2020-01-01" and meta["mark"] == "2020-02-10"
+    # A station missing from the response is not stored
+    assert read_station("piezometry", "B", str(tmp_path)) == (None, None)
+
+    # Already synchronised range: served locally
+    await read_stations("piezometry", ["A"], ("2020-01-01", "2020-02-28"), fetch, store_dir=str(tmp_path))
+    assert len(calls) == 1
+
+    # Range ending after the last synchronisation: only the tail, from the month of the mark, is downloaded
+    data = await read_stations("piezometry", ["A"], ("2020-01-01", "2099-12-31"), fetch, store_dir=str(tmp_path))
+    assert calls[1] == (["A"], "2020-02-01")
+    assert data["A"]["value"].tolist() == [1.0, 2.5, 3.0]
+
+
+@pytest.mark.asyncio
+async def test_read_stations_failed_fetch(tmp_path):
+    async def fetch(codes, date_debut):
+        raise RuntimeError("server down")
+
+    with pytest.warns(UserWarning):
+        data = await read_stations("piezometry", ["A"], ("2020-01-01", "2020-01-31"), fetch, store_dir=str(tmp_path))
+    assert data == {}
+    assert read_station("piezometry", "A", str(tmp_path)) == (None, None)
+
+
+@pytest.mark.asyncio
+async def test_read_stations_missing_station_keeps_store(tmp_path):
+    responses = [{"A": _series(["2020-01-05", "2020-02-10"], [1.0, 2.0])}, {}]
+
+    async def fetch(codes, date_debut):
+        return responses.pop(0)
+
+    await read_stations("piezometry", ["A"], ("2020-01-01", "2020-01-31"), fetch, store_dir=str(tmp_path))
+    _, meta = read_station("piezometry", "A", str(tmp_path))
+
+    # The tail download misses the station: the stored records and the synchronisation date are kept
+    data = await read_stations("piezometry", ["A"], ("2020-01-01", "2099-12-31"), fetch, store_dir=str(tmp_path))
+    assert data["A"]["value"].tolist() == [1.0, 2.0]
+    assert read_station("piezometry", "A", str(tmp_path))[1] == meta
+
+
+@pytest.mark.asyncio
+async def test_read_stations_raises_programming_errors(tmp_path):
+    async def fetch(codes, date_debut):
+        raise KeyError("code_bss")
+
+    with pytest.raises(KeyError):
+        await read_stations("piezometry", ["A"], ("2020-01-01", "2020-01-31"), fetch, store_dir=str(tmp_path))
+
+
+def test_dataset_key():
+    assert dataset_key("groundwater_qual", ["1340", "1350"]) == dataset_key("groundwater_qual", ["1350", "1340"])
+    assert dataset_key("groundwater_qual", ["1340"]) != dataset_key("groundwater_qual", ["1340", "1350"])
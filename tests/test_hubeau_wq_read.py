@@ -0,0 +1,57 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+import pandas as pd
+from API_readers.hubeau.hubeau_wq_read import read_data
+
+
+@pytest.mark.asyncio
+@patch("API_readers.hubeau.hubeau_wq_read.hub.AsyncHubeauClient")
+async def test_read_data(mock_client_class, tmp_path, monkeypatch):
+    # Mock the async HubEau client: long analysis records of one point, indexed by date
+    analyses = pd.DataFrame({
+        "bss_id": ["BSS000FBSC"] * 4,
+        "latitude": [49.7605963843733] * 4,
+        "longitude": [4.7979204466114] * 4,
+        "code_param": [1340, 1340, 1350, 1340],
+        "nom_param": ["Nitrates", "Nitrates", "Phosphore total", "Nitrates"],
+        "resultat": [10.0, 20.0, 1.0, 30.0],
+        "symbole_unite": ["mg(NO3)/L", "mg(NO3)/L", "mg(P2O5)/L", "mg(NO3)/L"],
+    }, index=pd.DatetimeIndex(pd.to_datetime(["2020-05-19", "2020-05-19", "2020-05-19", "2020-06-03"]), name="date"))
+    client = MagicMock()
+
+    async def get_data_by_station(*args, code_param=None, **kwargs):
+        # Records of the requested parameter codes only
+        return {"BSS000FBSC": analyses[analyses["code_param"].astype(str).isin(code_param)]}
+
+    client.get_data_by_station = AsyncMock(side_effect=get_data_by_station)
+    mock_client_class.return_value.__aenter__ = AsyncMock(return_value=client)
+    mock_client_class.return_value.__aexit__ = AsyncMock(return_value=None)
+
+    # Keep the station store out of the package folder
+    monkeypatch.setattr("API_readers.hubeau.hubeau_store.STORE_DIR", str(tmp_path / "store"))
+
+    spatial_range = (49.77, 49.75, 4.81, 4.79)
+    time_range = ('2020-01-01', '2020-12-31')
+    result = await read_data(spatial_range, time_range, ['nitrate', 'phosphorus'], 8)
+
+    # One row per date, one column group per parameter with one column per S2CELL
+    assert result.columns.names == [None, 'S2CELL']
+    assert set(result.columns.get_level_values(0)) == {"GW Nitrates (mg/L)", "GW Total Phosphorus (mg/L)"}
+    assert len(result) == 2
+    # Daily mean of the analyses, and P2O5 converted to P
+    assert result["GW Nitrates (mg/L)"].iloc[:, 0].tolist() == [15.0, 30.0]
+    assert result["GW Total Phosphorus (mg/L)"].iloc[0, 0] == pytest.approx(0.436)
+
+    # Each parameter is fetched with its own codes
+    assert sorted(call.kwargs["code_param"] for call in client.get_data_by_station.await_args_list) == [
+        ["1340"], ["1350"]]
+
+    # Requested parameters only, served by the store
+    result = await read_data(spatial_range, time_range, ['nitrate'], 8)
+    assert set(result.columns.get_level_values(0)) == {"GW Nitrates (mg/L)"}
+    assert client.get_data_by_station.await_count == 2
+
+    # Only the parameter not stored yet is downloaded
+    await read_data(spatial_range, time_range, ['nitrate', 'potassium'], 8)
+    assert client.get_data_by_station.await_count == 3
+    assert client.get_data_by_station.await_args.kwargs["code_param"] == ["1367"]
@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+from API_readers.IFSGRID.utils.extraction import read_store
+from API_readers.IFSGRID.utils.preparation import aggregate_cells, aggregate_spatial
+from utils.station_registry import leaf_cells
+
+
+def test_read_store_and_aggregate_cells(tmp_path):
+    lat = np.array([52.23, 52.24, 48.85], dtype="float32")
+    lon = np.array([21.01, 21.02, 2.35], dtype="float32")
+    s2 = leaf_cells(lat.astype("float64"), lon.astype("float64"))
+    store = pd.DataFrame({
+        "lat": np.tile(lat, 2),
+        "lon": np.tile(lon, 2),
+        "s2": np.tile(s2, 2),
+        "code": pd.Categorical(["UAA"] * 3 + ["ARA"] * 3),
+        "value": [10.0, 20.0, 30.0, 1.0, 2.0, 3.0],
+    }).sort_values("s2")
+    path = tmp_path / "ifsgrid.parquet"
+    store.to_parquet(path, index=False, row_group_size=2)
+
+    spatial_range = (53.0, 52.0, 22.0, 20.0)
+    df = read_store(str(path), spatial_range, ["UAA"])
+
+    # Only the requested codes within the bounding box are read
+    assert set(df["code"]) == {"UAA"}
+    assert len(df) == 2
+
+    # Same cells and values as the aggregation of the shapefile extracts
+    wide = pd.DataFrame({"lat": lat[:2], "lon": lon[:2], "UAA": [10.0, 20.0]})
+    expected = aggregate_spatial(wide, spatial_range, 8).set_index("S2CELL")
+    result = aggregate_cells(df, 8).set_index("S2CELL")
+    assert set(result.index) == set(expected.index)
+    assert result.loc[expected.index, "UAA"].tolist() == expected["UAA"].tolist()
@@ -2,41 +2,42 @@ import pytest
 from unittest.mock import AsyncMock, MagicMock, patch
 import pandas as pd
 from API_readers.imgw_hydro.imgw_api_hydro_daily import read_data  # Adjust the import path
+from utils.imgw_utils import write_archive
 from io import BytesIO
 import zipfile
 
 
 @pytest.mark.asyncio
-@patch("API_readers.imgw_hydro.imgw_api_hydro_daily.prepare_coordinates")
+@patch("API_readers.imgw_hydro.imgw_api_hydro_daily.load_registry")
 @patch("API_readers.imgw_hydro.imgw_api_hydro_daily.httpx.AsyncClient")
 @patch("API_readers.imgw_hydro.imgw_api_hydro_daily.pd.read_csv")
-async def test_read_data(mock_read_csv, mock_httpx_client, mock_prepare_coordinates):
-    # Mock the imgw_coordinates.csv file
+async def test_read_data(mock_read_csv, mock_httpx_client, mock_load_registry, tmp_path, monkeypatch):
+    # Mock the zipped station files (streamed in chunks)
     def mock_read_csv_side_effect(file, *args, **kwargs):
-        if isinstance(file, zipfile.ZipExtFile):  # This handles reading from the mocked ZIP
-            return pd.DataFrame({
-                "Station code": [250180460],
-                "Hydrological year": [2020],
-                "Calendar month": [1],
-                "Day": [1],
-                "Water Level [cm]": [120],
-            })
-        else:  # Handles other CSV files (e.g., imgw_coordinates.csv)
-            return pd.DataFrame({
-                "Unnamed: 0": [250180460, 254230010, 250190430, 250210030],
-                "Name": ["ADAMOWICE,Poland", "ALEKSANDRÓWKA,Poland", "ALWERNIA,Poland", "ANNOPOL,Poland"],
-                "lat": [51.9399783, 51.5719923, 50.0690434, 50.8851655],
-                "lon": [20.4814776, 21.5422823, 19.5396737, 21.8550836]
-            })
+        return iter([pd.DataFrame({
+            "Station code": [250180460],
+            "Hydrological year": [2020],
+            "Calendar month": [1],
+            "Day": [1],
+            "Water Level [cm]": [120],
+        })])
 
     mock_read_csv.side_effect = mock_read_csv_side_effect
 
-    # Mock prepare_coordinates
-    def mock_prepare(coordinates, spatial_range, level):
-        coordinates["S2CELL"] = [f"cell{i}" for i in range(len(coordinates))]
-        return coordinates
+    # Mock the station registry (imgw_coordinates.csv)
+    stations = pd.DataFrame({
+        "Unnamed: 0": [250180460, 254230010, 250190430, 250210030],
+        "Name": ["ADAMOWICE,Poland", "ALEKSANDRÓWKA,Poland", "ALWERNIA,Poland", "ANNOPOL,Poland"],
+        "lat": [51.9399783, 51.5719923, 50.0690434, 50.8851655],
+        "lon": [20.4814776, 21.5422823, 19.5396737, 21.8550836]
+    })
 
-    mock_prepare_coordinates.side_effect = mock_prepare
+    def mock_select(spatial_range, level):
+        selected = stations.copy()
+        selected["S2CELL"] = [f"cell{i}" for i in range(len(selected))]
+        return selected
+
+    mock_load_registry.return_value.select.side_effect = mock_select
 
     # Create a valid in-memory ZIP file
     zip_buffer = BytesIO()
@@ -75,6 +76,9 @@ async def test_read_data(mock_read_csv, mock_httpx_client, mock_prepare_coordina
     # Apply the dynamic mock_get to the HTTPX client's get method
     mock_httpx_client.return_value.__aenter__.return_value.get.side_effect = mock_get
 
+    # No local archive - data are scraped
+    monkeypatch.setattr("API_readers.imgw_hydro.imgw_api_hydro_daily.ARCHIVE_DIR", str(tmp_path))
+
     # Test parameters
     spatial_range = (50.0, 40.0, 10.0, 0.0)
     time_range = ("2020-01-01", "2021-12-31")
@@ -88,3 +92,106 @@ async def test_read_data(mock_read_csv, mock_httpx_client, mock_prepare_coordina
     assert result is not None
     assert "S2CELL" in result.columns.names
     assert isinstance(result, pd.DataFrame)
+
+
+@pytest.mark.asyncio
+@patch("API_readers.imgw_hydro.imgw_api_hydro_daily.load_registry")
+@patch("API_readers.imgw_hydro.imgw_api_hydro_daily.httpx.AsyncClient")
+@patch("API_readers.imgw_hydro.imgw_api_hydro_daily.pd.read_csv")
+async def test_read_data_november_december(mock_read_csv, mock_httpx_client, mock_load_registry, tmp_path,
+                                           monkeypatch):
+    # November 2020 is published in the folder of the hydrological year 2021
+    mock_read_csv.side_effect = lambda file, *args, **kwargs: iter([pd.DataFrame({
+        "Station code": [250180460],
+        "Hydrological year": [2021],
+        "Calendar month": [11],
+        "Day": [15],
+        "Water level [cm]": [120],
+    })])
+
+    stations = pd.DataFrame({"Unnamed: 0": [250180460], "lat": [51.9399783], "lon": [20.4814776]})
+    mock_load_registry.return_value.select.side_effect = lambda spatial_range, level: stations.assign(S2CELL="cell0")
+
+    zip_buffer = BytesIO()
+    with zipfile.ZipFile(zip_buffer, mode="w") as zf:
+        zf.writestr("codz_2021.csv", "250180460,2021,11,15,120")
+
+    requested = []
+
+    async def mock_get(url, params=None, **kwargs):
+        requested.append(url)
+        if url.endswith("dobowe/"):
+            return AsyncMock(status_code=200, text="<a href='2020/'>2020/</a><a href='2021/'>2021/</a>")
+        elif url.rstrip('/').endswith("/2021"):
+            return AsyncMock(status_code=200, text="<a href='file1.zip'>file1.zip</a>")
+        elif url.endswith("file1.zip"):
+            return AsyncMock(status_code=200, content=zip_buffer.getvalue())
+        return AsyncMock(status_code=404, text="Not Found")
+
+    mock_httpx_client.return_value.__aenter__.return_value.get.side_effect = mock_get
+    monkeypatch.setattr("API_readers.imgw_hydro.imgw_api_hydro_daily.ARCHIVE_DIR", str(tmp_path))
+
+    result = await read_data((55.0, 49.0, 24.0, 14.0), ("2020-11-01", "2020-12-31"), ["surface water quantity"], 8)
+
+    assert any(url.rstrip('/').endswith("/2021") for url in requested)
+    assert not any(url.rstrip('/').endswith("/2020") for url in requested)
+    assert result is not None
+    assert not result.empty
+
+
+@pytest.mark.asyncio
+@patch("API_readers.imgw_hydro.imgw_api_hydro_daily.load_registry")
+@patch("API_readers.imgw_hydro.imgw_api_hydro_daily.httpx.AsyncClient")
+@patch("API_readers.imgw_hydro.imgw_api_hydro_daily.pd.read_csv")
+async def test_read_data_scrapes_open_year(mock_read_csv, mock_httpx_client, mock_load_registry, tmp_path,
+                                           monkeypatch):
+    # The archive holds a stale copy of the open hydrological year 2021
+    archive = pd.DataFrame({
+        "Station code": [250180460, 250180460],
+        "Hydrological year": [2020, 2021],
+        "Day": [1, 1],
+        "Water level [cm]": [100.0, 111.0],
+        "Calendar month": [1, 1],
+    })
+    write_archive(archive, str(tmp_path), 'Hydrological year')
+    monkeypatch.setattr("API_readers.imgw_hydro.imgw_api_hydro_daily.ARCHIVE_DIR", str(tmp_path))
+    monkeypatch.setattr("API_readers.imgw_hydro.imgw_api_hydro_daily.current_hydrological_year", lambda: 2021)
+
+    mock_read_csv.side_effect = lambda file, *args, **kwargs: iter([pd.DataFrame({
+        "Station code": [250180460],
+        "Hydrological year": [2021],
+        "Calendar month": [1],
+        "Day": [1],
+        "Water level [cm]": [999.0],
+    })])
+
+    stations = pd.DataFrame({"Unnamed: 0": [250180460], "lat": [51.9399783], "lon": [20.4814776]})
+    mock_load_registry.return_value.select.side_effect = lambda spatial_range, level: stations.assign(S2CELL="cell0")
+
+    zip_buffer = BytesIO()
+    with zipfile.ZipFile(zip_buffer, mode="w") as zf:
+        zf.writestr("codz_2021.csv", "250180460,2021,1,1,999")
+
+    requested = []
+
+    async def mock_get(url, params=None, **kwargs):
+        requested.append(url)
+        if url.endswith("dobowe/"):
+            return AsyncMock(status_code=200, text="<a href='2020/'>2020/</a><a href='2021/'>2021/</a>")
+        elif url.rstrip('/').endswith("/2021"):
+            return AsyncMock(status_code=200, text="<a href='file1.zip'>file1.zip</a>")
+        elif url.endswith("file1.zip"):
+            return AsyncMock(status_code=200, content=zip_buffer.getvalue())
+        return AsyncMock(status_code=404, text="Not Found")
+
+    mock_httpx_client.return_value.__aenter__.return_value.get.side_effect = mock_get
+
+    result = await read_data((55.0, 49.0, 24.0, 14.0), ("2019-11-01", "2021-10-31"), ["surface water quantity"], 8)
+
+    # The closed year comes from the archive, the open one is scraped
+    assert not any(url.rstrip('/').endswith("/2020") for url in requested)
+    assert any(url.rstrip('/').endswith("/2021") for url in requested)
+    values = result.to_numpy().ravel()
+    assert 100.0 in values
+    assert 999.0 in values
+    assert 111.0 not in values
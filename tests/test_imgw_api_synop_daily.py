@@ -7,36 +7,36 @@ import zipfile
 
 
 @pytest.mark.asyncio
-@patch("API_readers.imgw.imgw_api_synop_daily.prepare_coordinates")
+@patch("API_readers.imgw.imgw_api_synop_daily.load_registry")
 @patch("API_readers.imgw.imgw_api_synop_daily.httpx.AsyncClient")
 @patch("API_readers.imgw.imgw_api_synop_daily.pd.read_csv")
-async def test_read_data(mock_read_csv, mock_httpx_client, mock_prepare_coordinates):
-    # Mock the imgw_coordinates.csv file
+async def test_read_data(mock_read_csv, mock_httpx_client, mock_load_registry, tmp_path, monkeypatch):
+    # Mock the zipped station files (streamed in chunks)
     def mock_read_csv_side_effect(file, *args, **kwargs):
-        if isinstance(file, zipfile.ZipExtFile):  # This handles reading from the mocked ZIP
-            return pd.DataFrame({
-                "Station code": [250180460],
-                "Year": [2020],
-                "Month": [1],
-                "Day": [1],
-                "Temperature [°C]": [5.2],
-            })
-        else:  # Handles other CSV files (e.g., imgw_coordinates.csv)
-            return pd.DataFrame({
-                "Code": [250180460, 254230010, 250190430, 250210030],
-                "Name": ["ADAMOWICE,Poland", "ALEKSANDRÓWKA,Poland", "ALWERNIA,Poland", "ANNOPOL,Poland"],
-                "lat": [51.9399783, 51.5719923, 50.0690434, 50.8851655],
-                "lon": [20.4814776, 21.5422823, 19.5396737, 21.8550836]
-            })
+        return iter([pd.DataFrame({
+            "Station code": [250180460],
+            "Year": [2020],
+            "Month": [1],
+            "Day": [1],
+            "Temperature [°C]": [5.2],
+        })])
 
     mock_read_csv.side_effect = mock_read_csv_side_effect
 
-    # Mock prepare_coordinates
-    def mock_prepare(coordinates, spatial_range, level):
-        coordinates["S2CELL"] = [f"cell{i}" for i in range(len(coordinates))]
-        return coordinates
+    # Mock the station registry (imgw_coordinates.csv)
+    stations = pd.DataFrame({
+        "Code": [250180460, 254230010, 250190430, 250210030],
+        "Name": ["ADAMOWICE,Poland", "ALEKSANDRÓWKA,Poland", "ALWERNIA,Poland", "ANNOPOL,Poland"],
+        "lat": [51.9399783, 51.5719923, 50.0690434, 50.8851655],
+        "lon": [20.4814776, 21.5422823, 19.5396737, 21.8550836]
+    })
 
-    mock_prepare_coordinates.side_effect = mock_prepare
+    def mock_select(spatial_range, level):
+        selected = stations.copy()
+        selected["S2CELL"] = [f"cell{i}" for i in range(len(selected))]
+        return selected
+
+    mock_load_registry.return_value.select.side_effect = mock_select
 
     # Create a valid in-memory ZIP file
     zip_buffer_t = BytesIO()
@@ -53,31 +53,35 @@ async def test_read_data(mock_read_csv, mock_httpx_client, mock_prepare_coordina
     async def mock_get(url, params=None, **kwargs):
         if url.endswith("synop"):  # Replace "URL" with the actual base URL in your function
             # Simulate the response for the main URL listing folders
-            return AsyncMock(
+            return MagicMock(
                 status_code=200,
-                text="<a href='2020/'>2020/</a><a href='2021/'>2021/</a>"
+                content=b"<a href='2020/'>2020/</a><a href='2021/'>2021/</a>",
+                headers={}
             )
         elif ("/2020" in url or "/2021" in url) and not 'file' in url:
             # Simulate the response for a specific year folder listing files
-            return AsyncMock(
+            return MagicMock(
                 status_code=200,
-                text="<a href='file1.zip'>file1.zip</a><a href='file2.zip'>file2.zip</a>"
+                content=b"<a href='file1.zip'>file1.zip</a><a href='file2.zip'>file2.zip</a>",
+                headers={}
             )
         elif url.endswith("file1.zip"):
             # Simulate the response for downloading zip files
-            return AsyncMock(
+            return MagicMock(
                 status_code=200,
-                content=zip_buffer_t.getvalue()
+                content=zip_buffer_t.getvalue(),
+                headers={}
             )
         elif url.endswith("file2.zip"):
             # Simulate the response for downloading zip files
-            return AsyncMock(
+            return MagicMock(
                 status_code=200,
-                content=zip_buffer_d_t.getvalue()
+                content=zip_buffer_d_t.getvalue(),
+                headers={}
             )
         else:
             # Default to a generic 404 error
-            return AsyncMock(
+            return MagicMock(
                 status_code=404,
                 text="Not Found"
             )
@@ -85,6 +89,11 @@ async def test_read_data(mock_read_csv, mock_httpx_client, mock_prepare_coordina
     # Apply the dynamic mock_get to the HTTPX client's get method
     mock_httpx_client.return_value.__aenter__.return_value.get.side_effect = mock_get
 
+    # Keep the archive mirror out of the package folder
+    monkeypatch.setattr("API_readers.imgw.imgw_api_synop_daily.MIRROR_DIR", str(tmp_path / "mirror"))
+    # No local archive - data are scraped
+    monkeypatch.setattr("API_readers.imgw.imgw_api_synop_daily.ARCHIVE_DIR", str(tmp_path / "archive"))
+
     # Test parameters
     spatial_range = (50.0, 40.0, 10.0, 0.0)
     time_range = ("2020-01-01", "2021-12-31")
@@ -98,3 +107,8 @@ async def test_read_data(mock_read_csv, mock_httpx_client, mock_prepare_coordina
     assert result is not None
     assert "S2CELL" in result.columns.names
     assert isinstance(result, pd.DataFrame)
+
+    # Archives of past years are served from the mirror without any further request
+    calls = mock_httpx_client.return_value.__aenter__.return_value.get.call_count
+    await read_data(spatial_range, time_range, data_range, level)
+    assert mock_httpx_client.return_value.__aenter__.return_value.get.call_count == calls + 1  # folder index only
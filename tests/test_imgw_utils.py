@@ -1,6 +1,8 @@
 import pytest
 import pandas as pd
-from utils.imgw_utils import expand_range, create_timestamp_from_row, get_years_between_dates
+from io import BytesIO
+from utils.imgw_utils import expand_range, create_timestamps, create_hydrological_timestamps, get_years_between_dates, \
+    get_hydrological_years_between_dates, read_station_csv, write_archive, read_archive, split_open_years
 
 
 def test_expand_range_single_year():
@@ -31,17 +33,25 @@ def test_expand_range_invalid_format():
     assert result == expected, f"Expected {expected}, got {result}"
 
 
-def test_create_timestamp_from_row():
-    row = pd.Series({"Day": 15, "Month": 8, "Year": 2023})
-    result = create_timestamp_from_row(row)
-    expected = pd.Timestamp(year=2023, month=8, day=15)
-    assert result == expected, f"Expected {expected}, got {result}"
+def test_create_timestamps():
+    df = pd.DataFrame({"Day": [15, 1], "Month": [8, 12], "Year": [2023, 1999]})
+    result = create_timestamps(df)
+    expected = pd.Series([pd.Timestamp(year=2023, month=8, day=15), pd.Timestamp(year=1999, month=12, day=1)])
+    pd.testing.assert_series_equal(result, expected, check_names=False)
 
 
-def test_create_timestamp_from_row_invalid_date():
-    row = pd.Series({"Day": 32, "Month": 13, "Year": 2023})
+def test_create_timestamps_invalid_date():
+    df = pd.DataFrame({"Day": [32], "Month": [13], "Year": [2023]})
     with pytest.raises(ValueError):
-        create_timestamp_from_row(row)
+        create_timestamps(df)
+
+
+def test_create_hydrological_timestamps():
+    # Hydrological year 2020 runs from 1 November 2019 to 31 October 2020
+    df = pd.DataFrame({"Hydrological year": [2020, 2020, 2020], "Calendar month": [11, 1, 10], "Day": [1, 15, 31]})
+    result = create_hydrological_timestamps(df)
+    expected = pd.Series([pd.Timestamp(2019, 11, 1), pd.Timestamp(2020, 1, 15), pd.Timestamp(2020, 10, 31)])
+    pd.testing.assert_series_equal(result, expected, check_names=False)
 
 
 def test_get_years_between_dates():
@@ -60,8 +70,72 @@ def test_get_years_between_dates_same_year():
     assert result == expected, f"Expected {expected}, got {result}"
 
 
+def test_get_hydrological_years_between_dates():
+    # November and December belong to the hydrological year of the next calendar year
+    assert get_hydrological_years_between_dates("2020-11-01", "2020-12-31") == ["2021"]
+    assert get_hydrological_years_between_dates("2020-01-01", "2020-10-31") == ["2020"]
+    assert get_hydrological_years_between_dates("2019-06-01", "2020-11-15") == ["2019", "2020", "2021"]
+
+
+def test_split_open_years():
+    assert split_open_years(["2019", "2020", "2021"], 2021) == (["2019", "2020"], ["2021"])
+    assert split_open_years(["2019"], 2021) == (["2019"], [])
+
+
 def test_get_years_between_dates_invalid_format():
     date_from = "2020/01/01"
     date_to = "2023/12/31"
     with pytest.raises(ValueError, match="time data '2020/01/01' does not match format '%Y-%m-%d'"):
         get_years_between_dates(date_from, date_to)
+
+
+def test_read_station_csv_filters_stations_and_columns():
+    content = ("250180460,\"ADAMOWICE\",2020,01,01,5.2,\n"
+               "254230010,\"ALEKSANDRÓWKA\",2020,01,01,3.1,\n"
+               "250180460,\"ADAMOWICE\",2020,01,02,4.8,\n").encode('windows-1250')
+    columns = ["Station code", "Station name", "Year", "Month", "Day", "Temperature", "Status"]
+    dtypes = {"Station code": 'int64', "Year": 'int16', "Month": 'int8', "Day": 'int8', "Temperature": 'float64'}
+
+    result = read_station_csv(BytesIO(content), columns, ["Station code", "Year", "Month", "Day", "Temperature"],
+                              dtypes, {250180460}, chunksize=1)
+
+    assert list(result.columns) == ["Station code", "Year", "Month", "Day", "Temperature"]
+    assert result["Station code"].tolist() == [250180460, 250180460]
+    assert result["Temperature"].tolist() == [5.2, 4.8]
+    assert result["Day"].dtype == 'int8'
+
+
+def test_read_station_csv_no_matching_station():
+    content = "254230010,\"ALEKSANDRÓWKA\",2020,01,01,3.1,\n".encode('windows-1250')
+    columns = ["Station code", "Station name", "Year", "Month", "Day", "Temperature", "Status"]
+
+    result = read_station_csv(BytesIO(content), columns, ["Station code", "Temperature"],
+                              {"Station code": 'int64', "Temperature": 'float64'}, {250180460})
+
+    assert result.empty
+    assert list(result.columns) == ["Station code", "Temperature"]
+
+
+def test_write_and_read_archive(tmp_path):
+    df = pd.DataFrame({
+        "Station code": [250190430, 250180460, 250180460, 250180460],
+        "Year": [2020, 2020, 2020, 2021],
+        "Month": [1, 1, 1, 1],
+        "Day": [1, 2, 1, 1],
+        "Temperature": [1.0, 2.0, 3.0, 4.0],
+    })
+
+    assert write_archive(df, tmp_path, 'Year') == [2020, 2021]
+
+    result = read_archive(tmp_path, {250180460}, ["2020"], columns=["Station code", "Year", "Day", "Temperature"])
+    assert result["Station code"].tolist() == [250180460, 250180460]
+    # Records are sorted by station and date within a year
+    assert result["Day"].tolist() == [1, 2]
+    assert result["Temperature"].tolist() == [3.0, 2.0]
+
+
+def test_read_archive_missing_year(tmp_path):
+    df = pd.DataFrame({"Station code": [250180460], "Year": [2020], "Month": [1], "Day": [1]})
+    write_archive(df, tmp_path, 'Year')
+
+    assert read_archive(tmp_path, {250180460}, ["2020", "2021"]) is None
@@ -0,0 +1,52 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from io import BytesIO
+import zipfile
+import pandas as pd
+from API_readers.irish_meteo.irish_ms_daily import read_data
+
+
+def station_zip():
+    lines = ["Station Name: TULLOW (Waterworks)", "", "date,ind,rain", "01-jan-2020,0,1.5", "02-jan-2020,0,0.3"]
+    buffer = BytesIO()
+    with zipfile.ZipFile(buffer, mode="w") as zf:
+        zf.writestr("dly4415.csv", "\n".join(lines))
+    return buffer.getvalue()
+
+
+@pytest.mark.asyncio
+@patch("API_readers.irish_meteo.irish_ms_daily.httpx.AsyncClient")
+async def test_read_data(mock_httpx_client, tmp_path, monkeypatch):
+    content = station_zip()
+    client = mock_httpx_client.return_value.__aenter__.return_value
+    client.head = AsyncMock(return_value=MagicMock(status_code=200))
+    client.get = AsyncMock(return_value=MagicMock(status_code=200, content=content, headers={}))
+
+    # Keep the caches out of the package folder
+    monkeypatch.setattr("API_readers.irish_meteo.irish_ms_daily.CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr("API_readers.irish_meteo.irish_ms_daily.LINK_STATUS_PATH", str(tmp_path / "links.json"))
+
+    # A bounding box around the "TULLOW (Waterworks)" station only
+    spatial_range = (52.81, 52.80, -6.74, -6.75)
+    time_range = ("2020-01-01", "2020-01-31")
+
+    result = await read_data(spatial_range, time_range, ["precipitation"], 8)
+
+    # Only the station within the range is checked and downloaded
+    assert client.head.await_count == 1
+    assert client.get.await_args.args[0].endswith("dly4415.zip")
+    assert result["Precipitation total [mm]"].iloc[0, 0] == 1.5
+
+    # The link status is reused within its TTL
+    await read_data(spatial_range, time_range, ["precipitation"], 8)
+    assert client.head.await_count == 1
+
+
+@pytest.mark.asyncio
+@patch("API_readers.irish_meteo.irish_ms_daily.httpx.AsyncClient")
+async def test_read_data_closed_stations(mock_httpx_client):
+    # The station opened in 1985: nothing is requested for earlier years
+    result = await read_data((52.81, 52.80, -6.74, -6.75), ("1960-01-01", "1960-12-31"), ["precipitation"], 8)
+
+    assert result.empty
+    mock_httpx_client.assert_not_called()
@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+import s2sphere
+from utils.coordinates_to_cells import prepare_coordinates
+from utils.station_registry import StationRegistry, load_registry, parent_cells
+
+
+STATIONS = pd.DataFrame({
+    "id": [1, 2, 3, 4, 5],
+    "lat": [51.9399783, 51.5719923, 50.0690434, 50.8851655, np.nan],
+    "lon": [20.4814776, 21.5422823, 19.5396737, 21.8550836, 20.0]
+})
+
+
+def test_select_matches_prepare_coordinates():
+    registry = StationRegistry(STATIONS)
+    spatial_range = (51.6, 50.0, 22.0, 19.5)
+
+    expected = prepare_coordinates(STATIONS, spatial_range, 8)
+    result = registry.select(spatial_range, 8)
+
+    # Same stations, in the same order, with the same S2Cells
+    assert result["id"].tolist() == expected["id"].tolist() == [2, 3, 4]
+    assert result["S2CELL"].tolist() == expected["S2CELL"].tolist()
+    assert registry.select((10.0, 0.0, 10.0, 0.0), 8) is None
+
+
+def test_select_cells():
+    registry = StationRegistry(STATIONS)
+    cell = s2sphere.CellId.from_lat_lng(s2sphere.LatLng.from_degrees(50.0690434, 19.5396737)).parent(6)
+
+    result = registry.select_cells([cell], level=6)
+    assert 3 in result["id"].tolist()
+    assert all(c == cell for c in result["S2CELL"])
+
+
+def test_parent_cells():
+    cell = s2sphere.CellId.from_lat_lng(s2sphere.LatLng.from_degrees(51.9399783, 20.4814776))
+    for level in (0, 8, 15, 30):
+        assert int(parent_cells(np.array([cell.id()], dtype='uint64'), level)[0]) == cell.parent(level).id()
+
+
+def test_load_registry_once(tmp_path):
+    path = tmp_path / "stations.csv"
+    STATIONS.rename(columns={"lat": "latitude", "lon": "longitude"}).to_csv(path, index=False)
+
+    registry = load_registry(str(path), rename={"latitude": "lat", "longitude": "lon"})
+
+    # Stations without coordinates are dropped, and the file is parsed once per process
+    assert len(registry) == 4
+    assert load_registry(str(path), rename={"latitude": "lat", "longitude": "lon"}) is registry
@@ -0,0 +1,37 @@
+from API_readers.UA_sw_quality import ukrainian_surface_water
+from API_readers.UA_sw_quality.ukrainian_surface_water import load_and_clean_data, read_catalog, write_catalog
+from API_readers.UA_sw_quality.UA_sw_quality_mappings.UA_sw_quality_mapping import new_headers
+
+
+def csv_bytes():
+    header = ["Point_ID", "Басейн", "Річка", "Пост", "Область", "Lat", "Lon", "Controle_Date"] + \
+             [f"p{i}" for i in range(16)]
+    rows = [
+        ["1", "a", "b", "c", "d", "50.45", "30.52", "2020-05-01"] + ["1.5"] * 16,
+        ["1", "a", "b", "c", "d", "50.45", "30.52", "2019-05-01"] + ["1.5"] * 16,
+        ["2", "a", "b", "c", "d", "48.62", "22.30", "2020-05-01"] + ["n/a"] + ["2.0"] * 15,
+    ]
+    lines = [";".join(header)] + [";".join(row) for row in rows]
+    return "\n".join(lines).encode("UTF-8-SIG")
+
+
+def test_load_and_clean_data():
+    df = load_and_clean_data(csv_bytes(), (51.0, 50.0, 31.0, 30.0), ("2020-01-01", "2020-12-31"))
+
+    # Fixed schema, and only the records of the stations inside the bbox and time range are kept
+    assert list(df.columns) == new_headers
+    assert df["point_id"].tolist() == [1.0]
+    assert df["date"].dtype.kind == "M"
+    assert df["nitrogen"].dtype == "float64"
+
+
+def test_catalog_ttl(tmp_path, monkeypatch):
+    monkeypatch.setattr(ukrainian_surface_water, "CACHE_DIR", str(tmp_path))
+    assert read_catalog() is None
+
+    write_catalog(["https://example.com/output.csv"])
+    assert read_catalog() == ["https://example.com/output.csv"]
+
+    # The catalog is scraped again once it is older than its TTL
+    monkeypatch.setattr(ukrainian_surface_water, "CATALOG_TTL", -1)
+    assert read_catalog() is None
@@ -1,101 +1,53 @@
+import os
+import time
 import pytest
-from unittest.mock import AsyncMock, patch, MagicMock
+from unittest.mock import MagicMock, patch
 import pandas as pd
-from wetterdienst.provider.dwd.observation import DwdObservationRequest, DwdObservationResolution
-from API_readers.wetterdienst.wetterdienst_dwd import read_data
-from utils.coordinates_to_cells import prepare_coordinates
+from API_readers.wetterdienst.wetterdienst_dwd import read_data, read_cached, write_cached, _empty_values, \
+    first_open_year, RECHECK_TTL
 
 
 @pytest.mark.asyncio
-@patch("API_readers.wetterdienst.wetterdienst_dwd.prepare_coordinates")
 @patch("API_readers.wetterdienst.wetterdienst_dwd.DwdObservationRequest")
-async def test_read_data(mock_dwd_request, mock_prepare_coordinates):
+async def test_read_data(mock_dwd_request, tmp_path, monkeypatch):
     # Mock DwdObservationRequest
     mock_request_instance = MagicMock()
     mock_dwd_request.return_value = mock_request_instance
 
-    # Mock the request.filter_by_bbox method to return the same mock instance
-    mock_request_instance.filter_by_bbox.return_value = mock_request_instance
-
-    # Mock the to_dict method
-    mock_request_instance.values.all.return_value.to_dict.return_value = {
-        "stations": [
-            {
-                "station_id": "02225",
-                "start_date": "1922-01-01T00:00:00+00:00",
-                "end_date": "1984-09-30T00:00:00+00:00",
-                "latitude": 50.9167,
-                "longitude": 14.3667,
-                "height": 385.0,
-                "name": "Hinterhermsdorf",
-                "state": "Sachsen"
-            },
-            {
-                "station_id": "02985",
-                "start_date": "1991-01-01T00:00:00+00:00",
-                "end_date": "2024-12-02T00:00:00+00:00",
-                "latitude": 50.9383,
-                "longitude": 14.2094,
-                "height": 321.0,
-                "name": "Lichtenhain-Mittelndorf",
-                "state": "Sachsen"
-            },
-            {
-                "station_id": "06129",
-                "start_date": "1999-05-01T00:00:00+00:00",
-                "end_date": "2024-12-02T00:00:00+00:00",
-                "latitude": 51.0594,
-                "longitude": 14.4266,
-                "height": 291.0,
-                "name": "Sohland/Spree",
-                "state": "Sachsen"
-            }
-        ],
-        "values": [
-            {
-                "station_id": "02225",
-                "dataset": "climate_summary",
-                "parameter": "precipitation_height",
-                "date": "2017-01-10T00:00:00+00:00",
-                "value": None,
-                "quality": None
-            },
-            {
-                "station_id": "02225",
-                "dataset": "climate_summary",
-                "parameter": "temperature_air_mean_2m",
-                "date": "2017-01-11T00:00:00+00:00",
-                "value": None,
-                "quality": None
-            },
-            {
-                "station_id": "02985",
-                "dataset": "climate_summary",
-                "parameter": "precipitation_height",
-                "date": "2017-01-10T00:00:00+00:00",
-                "value": 0.0,
-                "quality": 9.0
-            },
-            {
-                "station_id": "02985",
-                "dataset": "climate_summary",
-                "parameter": "temperature_air_mean_2m",
-                "date": "2017-01-10T00:00:00+00:00",
-                "value": 267.95,
-                "quality": 9.0
-            },
-        ]
-    }
-
-    # Mock prepare_coordinates
-    def mock_prepare(df, spatial_range, level):
-        df["S2CELL"] = ["cell1"]
-        return df
-
-    mock_prepare_coordinates.side_effect = mock_prepare
+    # Stations within the bounding box
+    mock_request_instance.filter_by_bbox.return_value.df = pd.DataFrame({
+        "station_id": ["02225", "02985", "06129"],
+        "latitude": [50.9167, 50.9383, 51.0594],
+        "longitude": [14.3667, 14.2094, 14.4266],
+        "name": ["Hinterhermsdorf", "Lichtenhain-Mittelndorf", "Sohland/Spree"]
+    })
+
+    # Per-station values
+    values = [
+        {"station_id": "02225", "dataset": "climate_summary", "parameter": "precipitation_height",
+         "date": "2017-01-10T00:00:00+00:00", "value": None, "quality": None},
+        {"station_id": "02225", "dataset": "climate_summary", "parameter": "temperature_air_mean_2m",
+         "date": "2017-01-11T00:00:00+00:00", "value": None, "quality": None},
+        {"station_id": "02985", "dataset": "climate_summary", "parameter": "precipitation_height",
+         "date": "2017-01-10T00:00:00+00:00", "value": 0.0, "quality": 9.0},
+        {"station_id": "02985", "dataset": "climate_summary", "parameter": "temperature_air_mean_2m",
+         "date": "2017-01-10T00:00:00+00:00", "value": 267.95, "quality": 9.0},
+    ]
+
+    def mock_filter_by_station_id(station_id):
+        station_request = MagicMock()
+        station_request.values.all.return_value.to_dict.return_value = {
+            "values": [value for value in values if value["station_id"] in station_id]
+        }
+        return station_request
+
+    mock_request_instance.filter_by_station_id.side_effect = mock_filter_by_station_id
+
+    # Keep the values cache out of the package folder
+    monkeypatch.setattr("API_readers.wetterdienst.wetterdienst_dwd.CACHE_DIR", str(tmp_path))
 
     # Test parameters
-    spatial_range = (51.0, 49.0, 12.0, 9.0)
+    spatial_range = (51.1, 50.9, 14.5, 14.2)
     time_range = ("2017-01-01", "2017-01-12")
     data_range = ["temperature", "precipitation"]
     level = 8
@@ -108,6 +60,51 @@ async def test_read_data(mock_dwd_request, mock_prepare_coordinates):
     assert isinstance(result, pd.DataFrame)
     assert "Temperature [°C]" in result.columns.levels[0]
     assert "Precipitation total [mm]" in result.columns.levels[0]
-    assert "cell1" in result.columns.levels[1]
-    mock_prepare_coordinates.assert_called_once()
+    assert "S2CELL" in result.columns.names
+    assert mock_request_instance.filter_by_station_id.call_count == 3  # one request per station
     assert result['Temperature [°C]'].values[0][0] == pytest.approx(-5.2)  # validate temperature convertion
+
+    # Past years are cached per station, parameter and year: no further request
+    await read_data(spatial_range, time_range, data_range, level)
+    assert mock_request_instance.filter_by_station_id.call_count == 3
+
+
+def test_empty_years_are_checked_again(tmp_path):
+    write_cached(_empty_values(), "02225", ["precipitation_height"], [2017], str(tmp_path))
+
+    # A year without values is served from the cache at first...
+    values, missing = read_cached("02225", ["precipitation_height"], [2017], str(tmp_path))
+    assert values.empty
+    assert missing == []
+
+    # ...and requested again once the recheck TTL has elapsed
+    path = tmp_path / "02225" / "precipitation_height" / "2017.parquet"
+    old = time.time() - RECHECK_TTL - 1
+    os.utime(path, (old, old))
+    assert read_cached("02225", ["precipitation_height"], [2017], str(tmp_path))[1] == [2017]
+
+
+def test_first_open_year():
+    # The previous year may still be completed by DWD
+    assert first_open_year() == pd.Timestamp.today().year - 1
+
+
+@pytest.mark.asyncio
+@patch("API_readers.wetterdienst.wetterdienst_dwd.fetch_station_values")
+@patch("API_readers.wetterdienst.wetterdienst_dwd.DwdObservationRequest")
+async def test_read_data_station_errors(mock_dwd_request, mock_fetch_station_values, tmp_path, monkeypatch):
+    mock_dwd_request.return_value.filter_by_bbox.return_value.df = pd.DataFrame({
+        "station_id": ["02225"], "latitude": [50.9167], "longitude": [14.3667], "name": ["Hinterhermsdorf"]
+    })
+    monkeypatch.setattr("API_readers.wetterdienst.wetterdienst_dwd.CACHE_DIR", str(tmp_path))
+    args = ((51.1, 50.9, 14.5, 14.2), ("2017-01-01", "2017-01-12"), ["temperature", "precipitation"], 8)
+
+    # A failed download drops the station with a warning...
+    mock_fetch_station_values.side_effect = ConnectionError("DWD not responding")
+    with pytest.warns(UserWarning, match="could not be fetched"):
+        assert await read_data(*args) is None
+
+    # ...any other error is raised
+    mock_fetch_station_values.side_effect = KeyError("value")
+    with pytest.raises(KeyError):
+        await read_data(*args)
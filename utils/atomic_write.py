@@ -0,0 +1,41 @@
+import os
+import tempfile
+from contextlib import contextmanager, suppress
+
+
+@contextmanager
+def atomic_path(path):
+    """
+    Provide a unique temporary path next to `path`, moved onto `path` once the block succeeds (removed otherwise).
+
+    Readers never see a partially written file, and concurrent writers of the same file (threads, coroutines or
+    processes) never share a temporary file. The temporary name starts with a dot, so that dataset readers
+    (e.g. pd.read_parquet on a folder) skip it.
+
+    :param path: Final path of the file.
+    :return: Temporary path to be written.
+    """
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix='.tmp')
+    os.close(fd)
+    try:
+        yield temp_path
+        os.replace(temp_path, path)
+    except BaseException:
+        with suppress(FileNotFoundError):
+            os.remove(temp_path)
+        raise
+
+
+def atomic_write(path, data):
+    """
+    Write bytes or text to a file atomically (see `atomic_path`).
+
+    :param path: Path of the file.
+    :param data: Content, bytes or str (written as UTF-8).
+    """
+    mode, encoding = ('wb', None) if isinstance(data, bytes) else ('w', 'utf-8')
+    with atomic_path(path) as temp_path:
+        with open(temp_path, mode, encoding=encoding) as f:
+            f.write(data)
@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+
+
+def group_mode(group_codes, values):
+    """
+    Vectorized mode of values per group: values are sorted by (group, value) and the longest run of equal values
+    of each group is kept. Ties are resolved to the smallest value, as `Series.mode().iloc[0]`; missing values
+    are ignored.
+
+    :param group_codes: Array of integer group codes (e.g. from pd.factorize).
+    :param values: Array of values aligned with the group codes.
+    :return: pandas Series of the modes, indexed by the codes of the groups having at least one value.
+    """
+    group_codes = np.asarray(group_codes)
+    mask = pd.notna(values)
+    groups = group_codes[mask]
+    value_codes, uniques = pd.factorize(np.asarray(values)[mask], sort=True)
+    if len(groups) == 0:
+        return pd.Series(uniques[:0], index=pd.Index([], dtype=group_codes.dtype))
+
+    # Runs of equal (group, value) pairs
+    order = np.lexsort((value_codes, groups))
+    groups, value_codes = groups[order], value_codes[order]
+    starts = np.flatnonzero(np.r_[True, (groups[1:] != groups[:-1]) | (value_codes[1:] != value_codes[:-1])])
+    lengths = np.diff(np.r_[starts, len(groups)])
+    run_groups, run_values = groups[starts], value_codes[starts]
+
+    # Longest run of each group, the smallest value first on ties
+    order = np.lexsort((run_values, -lengths, run_groups))
+    best = order[np.r_[True, run_groups[order][1:] != run_groups[order][:-1]]]
+    return pd.Series(uniques[run_values[best]], index=run_groups[best])
+
+
+def mode_by_group(df, by, columns=None):
+    """
+    Mode of each column per group, the vectorized equivalent of
+    `df.groupby(by)[columns].agg(lambda x: x.mode().iloc[0] if not x.mode().empty else None)`.
+
+    :param df: Input DataFrame.
+    :param by: Name of the grouping column or index level (e.g. 'S2CELL').
+    :param columns: Columns to be reduced (all the other columns if None).
+    :return: DataFrame indexed by the sorted group keys, with NaN for groups without values in a column.
+    """
+    keys = df[by] if by in df.columns else df.index.get_level_values(by)
+    codes, uniques = pd.factorize(keys, sort=True)
+    if columns is None:
+        columns = [col for col in df.columns if col != by]
+    index = pd.Index(uniques, name=by)
+    result = {col: group_mode(codes, df[col].to_numpy()).reindex(range(len(uniques))).to_numpy() for col in columns}
+    return pd.DataFrame(result, index=index, columns=columns)
+
+
+def majority_by_group(df, by, columns):
+    """
+    Most frequent combination of values of the columns per group (a majority vote of the rows), for classes
+    encoded over several columns, e.g. the RGB channels of a land cover map.
+
+    :param df: Input DataFrame.
+    :param by: Name of the grouping column (e.g. 'S2CELL').
+    :param columns: Columns encoding the class together.
+    :return: DataFrame indexed by the sorted group keys of the groups with at least one complete row.
+    """
+    codes, uniques = pd.factorize(df[by], sort=True)
+    # One code per distinct combination of values (-1 for rows with missing values)
+    row_classes = df.groupby(list(columns), sort=True, dropna=True).ngroup().fillna(-1).to_numpy('int64')
+    complete = row_classes >= 0
+    modes = group_mode(codes[complete], row_classes[complete])
+
+    # A representative row of each winning combination
+    rows = pd.Series(np.arange(len(df))[complete]).groupby(row_classes[complete]).first()
+    result = df[list(columns)].iloc[rows.loc[modes.to_numpy()].to_numpy()]
+    result.index = pd.Index(uniques[modes.index.to_numpy()], name=by)
+    return result
@@ -1,4 +1,10 @@
+import os
+import numpy as np
 import s2sphere
+from utils.atomic_write import atomic_path
+
+# Folder holding the cached grid-point -> S2Cell lookup tables
+GRID_CACHE_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'grid_cache')
 
 
 def _limit_coordinates(spatial_range, coordinates):
@@ -76,3 +82,82 @@ def get_s2_cells(bbox, level):
     covering = coverer.get_covering(rect)
 
     return covering
+
+
+def _grid_indices(lat, lon, resolution):
+    """
+    Convert latitude and longitude arrays to row and column indices of a regular global grid.
+
+    Rows count from the North Pole (90°) southwards, columns from the antimeridian (-180°) eastwards.
+
+    :param lat: Array of latitudes lying on the grid.
+    :param lon: Array of longitudes lying on the grid.
+    :param resolution: Grid spacing in degrees.
+    :return: Tuple of row and column index arrays.
+    """
+    rows = np.rint((90 - np.asarray(lat, dtype='float64')) / resolution).astype('int64')
+    cols = np.rint((np.asarray(lon, dtype='float64') + 180) / resolution).astype('int64') % int(round(360 / resolution))
+    return rows, cols
+
+
+def grid_cells(lat, lon, level, grid_name, resolution, cache_dir=GRID_CACHE_DIR):
+    """
+    Look up S2Cell IDs of regular grid points using a lookup table cached on disk per grid and level.
+
+    The table holds one S2Cell ID per grid node (0 marks nodes not computed yet). Missing nodes are computed
+    once, for the unique grid points only, and the table is saved back so later requests are pure array indexing.
+
+    :param lat: Array of latitudes lying on the grid.
+    :param lon: Array of longitudes lying on the grid.
+    :param level: S2Cell level.
+    :param grid_name: Name of the grid used for the cache file (e.g. 'era5').
+    :param resolution: Grid spacing in degrees.
+    :param cache_dir: Folder holding the lookup tables.
+    :return: Array of S2Cell IDs (uint64) aligned with the input points.
+    """
+    cache_path = os.path.join(cache_dir, f"{grid_name}_{resolution}_L{level}.npy")
+    if os.path.exists(cache_path):
+        lookup = np.load(cache_path)
+    else:
+        lookup = np.zeros((int(round(180 / resolution)) + 1, int(round(360 / resolution))), dtype='uint64')
+
+    rows, cols = _grid_indices(lat, lon, resolution)
+    missing = lookup[rows, cols] == 0
+    if missing.any():
+        for row, col in set(zip(rows[missing].tolist(), cols[missing].tolist())):
+            lat_lng = s2sphere.LatLng.from_degrees(90 - row * resolution, col * resolution - 180)
+            lookup[row, col] = s2sphere.CellId.from_lat_lng(lat_lng).parent(level).id()
+        # Write to a temporary file first so concurrent readers never see a partial table
+        with atomic_path(cache_path) as temp_path:
+            with open(temp_path, 'wb') as f:
+                np.save(f, lookup)
+    return lookup[rows, cols]
+
+
+def prepare_grid_coordinates(coordinates, spatial_range, level, grid_name, resolution, cache_dir=GRID_CACHE_DIR):
+    """
+    Equivalent of prepare_coordinates for data lying on a fixed regular grid (e.g. ERA5 0.25°).
+
+    S2Cells come from the cached grid lookup table (see grid_cells) and are broadcast to all rows by array
+    indexing, instead of being recomputed for every (lat, lon, time) row.
+
+    :param coordinates: Coordinates to be transformed
+    :param spatial_range: A tuple containing the spatial range (N, S, E, W) defining the bounding box.
+    :param level: S2Cell level.
+    :param grid_name: Name of the grid used for the cache file (e.g. 'era5').
+    :param resolution: Grid spacing in degrees.
+    :param cache_dir: Folder holding the lookup tables.
+    :return: DataFrame containing coordinates within the specified spatial range and their corresponding S2Cell IDs.
+    """
+    coords = coordinates.copy()  # to prevent the warning about the copy-setting
+    coords.lat = coords.lat.astype('float32')
+    coords.lon = coords.lon.astype('float32')
+    coords = _limit_coordinates(spatial_range=spatial_range, coordinates=coords)
+    if coords.size == 0:
+        print("No data in the range")
+        return None
+    cell_ids = grid_cells(coords.lat.to_numpy(), coords.lon.to_numpy(), level, grid_name, resolution, cache_dir)
+    unique_ids, inverse = np.unique(cell_ids, return_inverse=True)
+    cells = np.array([s2sphere.CellId(int(cell_id)) for cell_id in unique_ids], dtype=object)
+    coords['S2CELL'] = cells[inverse]
+    return coords
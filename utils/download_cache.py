@@ -0,0 +1,99 @@
+import asyncio
+import hashlib
+import json
+import os
+from contextlib import nullcontext
+from utils.atomic_write import atomic_write
+
+
+def _cache_paths(url, cache_dir):
+    """
+    Build the paths of the mirrored body and its metadata file for a URL.
+
+    :param url: Address of the mirrored resource.
+    :param cache_dir: Folder holding the mirror.
+    :return: Tuple (body path, metadata path).
+    """
+    key = hashlib.sha1(url.encode('utf-8')).hexdigest()
+    body_path = os.path.join(cache_dir, key)
+    return body_path, body_path + '.json'
+
+
+def _read_mirror(body_path, meta_path):
+    """
+    Read a mirrored body and its metadata.
+
+    :return: Tuple (body bytes, metadata dict) or (None, None) when the mirror entry is missing or incomplete.
+    """
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        with open(body_path, 'rb') as f:
+            return f.read(), meta
+    except (OSError, ValueError):
+        return None, None
+
+
+def _write_mirror(body_path, meta_path, content, meta):
+    """
+    Store a body and its metadata; both are written to temporary files first and moved into place.
+    """
+    atomic_write(body_path, content)
+    atomic_write(meta_path, json.dumps(meta))
+
+
+async def read_mirror(url, cache_dir):
+    """
+    Read the mirrored copy of a resource without any network call.
+
+    :param url: Address of the mirrored resource.
+    :param cache_dir: Folder holding the mirror.
+    :return: Mirrored body as bytes, or None if the resource has not been mirrored yet.
+    """
+    content, _ = await asyncio.to_thread(_read_mirror, *_cache_paths(url, cache_dir))
+    return content
+
+
+async def cached_get(client, url, cache_dir, revalidate=True, semaphore=None):
+    """
+    Download a resource through a local mirror keyed by its URL.
+
+    Every downloaded body is stored together with its ETag and Last-Modified headers. When `revalidate` is False
+    (immutable resources, e.g. historical archives) an existing mirror copy is returned without any network call.
+    Otherwise a conditional GET (If-None-Match / If-Modified-Since) is sent and the mirror copy is served on
+    304 Not Modified.
+
+    :param client: httpx.AsyncClient used for the requests.
+    :param url: Address of the resource.
+    :param cache_dir: Folder holding the mirror.
+    :param revalidate: If False, a mirrored copy is trusted without contacting the server.
+    :param semaphore: Optional asyncio.Semaphore bounding the number of concurrent requests.
+    :return: Response body as bytes, or None if the server answered with an error status.
+    """
+    body_path, meta_path = _cache_paths(url, cache_dir)
+    content, meta = await asyncio.to_thread(_read_mirror, body_path, meta_path)
+    if content is not None and not revalidate:
+        return content
+
+    headers = {}
+    if meta is not None:
+        if meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+
+    async with semaphore or nullcontext():
+        response = await client.get(url, headers=headers)
+
+    if response.status_code == 304 and content is not None:
+        return content
+    if response.status_code != 200:
+        return None
+
+    meta = {
+        'url': url,
+        'etag': response.headers.get('ETag'),
+        'last_modified': response.headers.get('Last-Modified')
+    }
+    await asyncio.to_thread(_write_mirror, body_path, meta_path, response.content, meta)
+    return response.content
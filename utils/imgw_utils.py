@@ -1,7 +1,16 @@
+import os
 from datetime import datetime
 
 import pandas as pd
 
+from utils.atomic_write import atomic_path
+
+# Number of rows parsed at once when streaming IMGW CSV files
+CHUNK_SIZE = 100000
+
+# Number of rows per Parquet row group in the local IMGW archive
+ARCHIVE_ROW_GROUP_SIZE = 50000
+
 
 def expand_range(range_str):
     """
@@ -23,20 +32,46 @@ def expand_range(range_str):
         return {range_str: range_str}
 
 
-def create_timestamp_from_row(row):
+def create_timestamps(df, year_column='Year', month_column='Month', day_column='Day'):
     """
-    Create a Pandas Timestamp from day, month, and year columns in a DataFrame row.
+    Create Pandas Timestamps from day, month, and year columns of a DataFrame in one vectorized call.
 
     Parameters:
-        row (pd.Series): A row from a DataFrame containing 'day', 'month', and 'year' columns.
+        df (pd.DataFrame): DataFrame containing the year, month, and day columns.
+        year_column (str): Name of the year column.
+        month_column (str): Name of the month column.
+        day_column (str): Name of the day column.
 
     Returns:
-        pd.Timestamp: Timestamp object representing the given date.
+        pd.Series: Series of datetime64 values aligned with the DataFrame index.
     """
-    day = int(row['Day'])
-    month = int(row['Month'])
-    year = int(row['Year'])
-    return pd.Timestamp(year=year, month=month, day=day)
+    return pd.to_datetime(pd.DataFrame({
+        'year': df[year_column].astype('int64'),
+        'month': df[month_column].astype('int64'),
+        'day': df[day_column].astype('int64')
+    }))
+
+
+def create_hydrological_timestamps(df, year_column='Hydrological year', month_column='Calendar month',
+                                   day_column='Day'):
+    """
+    Create Pandas Timestamps from hydrological year, calendar month, and day columns of a DataFrame.
+
+    The IMGW hydrological year starts on 1 November of the previous calendar year, so November and December
+    records are shifted back by one year.
+
+    Parameters:
+        df (pd.DataFrame): DataFrame containing the hydrological year, calendar month, and day columns.
+        year_column (str): Name of the hydrological year column.
+        month_column (str): Name of the calendar month column.
+        day_column (str): Name of the day column.
+
+    Returns:
+        pd.Series: Series of datetime64 values aligned with the DataFrame index.
+    """
+    month = df[month_column].astype('int64')
+    year = df[year_column].astype('int64') - (month >= 11).astype('int64')
+    return pd.to_datetime(pd.DataFrame({'year': year, 'month': month, 'day': df[day_column].astype('int64')}))
 
 
 def get_years_between_dates(date_from, date_to):
@@ -61,3 +96,124 @@ def get_years_between_dates(date_from, date_to):
         years.append(str(current_year))
         current_year += 1
     return years
+
+
+def get_hydrological_years_between_dates(date_from, date_to):
+    """
+    Retrieves a list of the IMGW hydrological years covering two specified dates.
+
+    The hydrological year Y runs from 1 November of Y-1 to 31 October of Y, so dates in November and December
+    belong to the hydrological year of the next calendar year.
+
+    :param date_from: A string representing the start date in the format 'YYYY-MM-DD'.
+    :param date_to: A string representing the end date in the format 'YYYY-MM-DD'.
+    :return: A list of strings representing the hydrological years between the two dates, inclusive.
+    """
+    start_date = datetime.strptime(date_from, '%Y-%m-%d')
+    end_date = datetime.strptime(date_to, '%Y-%m-%d')
+    first_year = start_date.year + 1 if start_date.month >= 11 else start_date.year
+    last_year = end_date.year + 1 if end_date.month >= 11 else end_date.year
+    return [str(year) for year in range(first_year, last_year + 1)]
+
+
+def current_hydrological_year():
+    """
+    Get the IMGW hydrological year of the current date.
+
+    :return: The current hydrological year as an integer.
+    """
+    today = datetime.now()
+    return today.year + 1 if today.month >= 11 else today.year
+
+
+def split_open_years(years, first_open_year):
+    """
+    Split years into closed years, which IMGW does not republish anymore and which can be served from the local
+    archive, and open years, whose files are still updated and have to be scraped on every request.
+
+    :param years: List of years as strings.
+    :param first_open_year: First year still being published (e.g. the current year).
+    :return: Tuple of lists of years as strings (closed years, open years).
+    """
+    closed_years = [year for year in years if int(year) < first_open_year]
+    open_years = [year for year in years if int(year) >= first_open_year]
+    return closed_years, open_years
+
+
+def read_station_csv(file, columns, usecols, dtypes, station_codes, station_column='Station code',
+                     chunksize=CHUNK_SIZE):
+    """
+    Stream an IMGW CSV file in chunks, keeping only the requested columns and the rows of the requested stations.
+
+    IMGW files have no header and use the windows-1250 encoding. Rows of other stations are dropped chunk by
+    chunk, so only the relevant part of the national archive is ever held in memory.
+
+    :param file: Path or file-like object of the CSV file.
+    :param columns: Names of all columns of the file, in order.
+    :param usecols: Names of the columns to be parsed.
+    :param dtypes: Dictionary mapping column names to dtypes (columns not parsed are ignored).
+    :param station_codes: Collection of station codes to be kept (None keeps all stations).
+    :param station_column: Name of the station code column.
+    :param chunksize: Number of rows parsed at once.
+    :return: DataFrame with the selected columns and rows.
+    """
+    usecols = [col for col in columns if col in set(usecols)]
+    dtypes = {col: dtype for col, dtype in dtypes.items() if col in usecols}
+    station_codes = None if station_codes is None else list(station_codes)
+    chunks = []
+    reader = pd.read_csv(file, encoding='windows-1250', names=columns, usecols=usecols, dtype=dtypes,
+                         chunksize=chunksize)
+    for chunk in reader:
+        if station_codes is not None:
+            chunk = chunk[chunk[station_column].isin(station_codes)]
+        if not chunk.empty:
+            chunks.append(chunk)
+    if not chunks:
+        return pd.DataFrame({col: pd.Series(dtype=dtypes.get(col, 'object')) for col in usecols})
+    return pd.concat(chunks, ignore_index=True)
+
+
+def write_archive(df, root, year_column, station_column='Station code'):
+    """
+    Write IMGW records to a local columnar archive partitioned by year.
+
+    Each year is stored as a single Parquet file in '<root>/year=<year>/', sorted by station code so that
+    station filters can skip whole row groups. Re-ingesting a year replaces its file.
+
+    :param df: DataFrame with IMGW records.
+    :param root: Root folder of the archive.
+    :param year_column: Name of the column used for partitioning (e.g. 'Year' or 'Hydrological year').
+    :param station_column: Name of the station code column.
+    :return: List of the years written.
+    """
+    written = []
+    for year, part in df.groupby(year_column):
+        part = part.sort_values([station_column] + [col for col in ('Month', 'Calendar month', 'Day')
+                                                    if col in part.columns])
+        # The temporary file is hidden from readers of the partitioned dataset
+        with atomic_path(os.path.join(root, f"year={int(year)}", 'part-0.parquet')) as temp_path:
+            part.to_parquet(temp_path, index=False, row_group_size=ARCHIVE_ROW_GROUP_SIZE)
+        written.append(int(year))
+    return written
+
+
+def read_archive(root, station_codes, years, columns=None, station_column='Station code'):
+    """
+    Read IMGW records of the given stations and years from a local columnar archive.
+
+    Station and year predicates are pushed down to Parquet, so only the matching partitions and row groups
+    are decoded.
+
+    :param root: Root folder of the archive.
+    :param station_codes: Collection of station codes to be read.
+    :param years: List of years (strings or integers) to be read.
+    :param columns: List of columns to be read (all columns if None).
+    :param station_column: Name of the station code column.
+    :return: DataFrame with the records, or None if any of the years has not been ingested.
+    """
+    years = [int(year) for year in years]
+    if not all(os.path.exists(os.path.join(root, f"year={year}", 'part-0.parquet')) for year in years):
+        return None
+    filters = [('year', 'in', years), (station_column, 'in', list(station_codes))]
+    df = pd.read_parquet(root, columns=columns, filters=filters)
+    return df.drop(columns=['year'], errors='ignore').reset_index(drop=True)
@@ -0,0 +1,36 @@
+import asyncio
+import atexit
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+MAX_WORKERS = max(1, min(4, (os.cpu_count() or 1) - 1))
+
+_POOL = None
+_LOCK = threading.Lock()
+
+
+def get_process_pool():
+    """
+    Get the process pool shared by the readers for CPU-bound parsing (created on first use, shut down at exit).
+
+    :return: concurrent.futures.ProcessPoolExecutor.
+    """
+    global _POOL
+    with _LOCK:
+        if _POOL is None:
+            _POOL = ProcessPoolExecutor(max_workers=MAX_WORKERS)
+            atexit.register(_POOL.shutdown)
+    return _POOL
+
+
+async def run_in_process(func, *args):
+    """
+    Run a picklable function in the shared process pool without blocking the event loop.
+
+    :param func: Module-level function.
+    :param args: Picklable arguments of the function.
+    :return: Result of the function.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_process_pool(), func, *args)
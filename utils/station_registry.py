@@ -0,0 +1,153 @@
+import os
+import threading
+import numpy as np
+import pandas as pd
+import s2sphere
+
+MAX_LEVEL = 30
+
+# Registries loaded in this process, keyed by file path, modification time and reading options
+_REGISTRIES = {}
+_LOCK = threading.Lock()
+
+
+def leaf_cells(lat, lon):
+    """
+    Compute the leaf (level 30) S2Cell IDs of points.
+
+    :param lat: Array of latitudes.
+    :param lon: Array of longitudes.
+    :return: Array of S2Cell IDs (uint64).
+    """
+    return np.array([s2sphere.CellId.from_lat_lng(s2sphere.LatLng.from_degrees(float(a), float(o))).id()
+                     for a, o in zip(lat, lon)], dtype='uint64')
+
+
+def parent_cells(cell_ids, level):
+    """
+    Vectorized equivalent of CellId.parent(level) for an array of S2Cell IDs.
+
+    :param cell_ids: Array of S2Cell IDs (uint64) of a level finer than or equal to `level`.
+    :param level: S2Cell level.
+    :return: Array of parent S2Cell IDs (uint64).
+    """
+    lsb = np.uint64(1) << np.uint64(2 * (MAX_LEVEL - level))
+    return (cell_ids & ~(lsb - np.uint64(1))) | lsb
+
+
+def to_cell_ids(cell_ids):
+    """
+    Convert S2Cell IDs to s2sphere.CellId objects, building each distinct cell once.
+
+    :param cell_ids: Array of S2Cell IDs (uint64).
+    :return: Array of s2sphere.CellId (object dtype) aligned with the IDs.
+    """
+    unique_ids, inverse = np.unique(cell_ids, return_inverse=True)
+    cells = np.array([s2sphere.CellId(int(cell_id)) for cell_id in unique_ids], dtype=object)
+    return cells[inverse.reshape(-1)]
+
+
+class StationRegistry:
+    """
+    In-memory index of point stations.
+
+    Stations are indexed by latitude for bounding box lookups and by leaf S2Cell ID for cell lookups (binary
+    searches). S2Cells of any level are derived from the leaf IDs computed once, and kept per level.
+    """
+
+    def __init__(self, stations):
+        """
+        :param stations: DataFrame of stations with 'lat' and 'lon' columns; stations without coordinates are dropped.
+        """
+        stations = stations[stations['lat'].notna() & stations['lon'].notna()].copy()
+        # Same precision as prepare_coordinates, so that both give the same selections and cells
+        stations['lat'] = stations['lat'].astype('float32')
+        stations['lon'] = stations['lon'].astype('float32')
+        self.stations = stations
+        self._lat = stations['lat'].to_numpy(dtype='float64')
+        self._lon = stations['lon'].to_numpy(dtype='float64')
+        self._lat_order = np.argsort(self._lat, kind='stable')
+        self._sorted_lat = self._lat[self._lat_order]
+        self._leaf = leaf_cells(self._lat, self._lon)
+        self._cell_order = np.argsort(self._leaf, kind='stable')
+        self._sorted_leaf = self._leaf[self._cell_order]
+        self._cells = {}
+
+    def __len__(self):
+        return len(self.stations)
+
+    def cells(self, level):
+        """
+        S2Cells of all stations at a level (computed once per level).
+
+        :param level: S2Cell level.
+        :return: Array of s2sphere.CellId aligned with the stations.
+        """
+        if level not in self._cells:
+            self._cells[level] = to_cell_ids(parent_cells(self._leaf, level))
+        return self._cells[level]
+
+    def _subset(self, positions, level):
+        """
+        Build the DataFrame of the stations at the given positions (in registry order), with their S2Cells.
+        """
+        if len(positions) == 0:
+            print("No data in the range")
+            return None
+        positions = np.sort(positions)
+        stations = self.stations.iloc[positions].copy()
+        if level is not None:
+            stations['S2CELL'] = self.cells(level)[positions]
+        return stations
+
+    def select(self, spatial_range, level=None):
+        """
+        Equivalent of prepare_coordinates: stations within a bounding box, with their S2Cells.
+
+        :param spatial_range: A tuple containing the spatial range (N, S, E, W) defining the bounding box.
+        :param level: S2Cell level (None does not add the S2CELL column).
+        :return: DataFrame of the stations in the range (in registry order), or None if there is none.
+        """
+        # Bounds compared at the float32 precision of the coordinates, as in prepare_coordinates
+        n, s, e, w = (np.float64(np.float32(bound)) for bound in spatial_range)
+        lo = np.searchsorted(self._sorted_lat, s, side='left')
+        hi = np.searchsorted(self._sorted_lat, n, side='right')
+        positions = self._lat_order[lo:hi]
+        lon = self._lon[positions]
+        return self._subset(positions[(lon >= w) & (lon <= e)], level)
+
+    def select_cells(self, cells, level=None):
+        """
+        Stations lying in the given S2Cells (of any level).
+
+        :param cells: Iterable of s2sphere.CellId.
+        :param level: S2Cell level of the S2CELL column (None does not add it).
+        :return: DataFrame of the stations in the cells (in registry order), or None if there is none.
+        """
+        positions = []
+        for cell in cells:
+            lo = np.searchsorted(self._sorted_leaf, np.uint64(cell.range_min().id()), side='left')
+            hi = np.searchsorted(self._sorted_leaf, np.uint64(cell.range_max().id()), side='right')
+            positions.append(self._cell_order[lo:hi])
+        positions = np.unique(np.concatenate(positions)) if positions else np.array([], dtype='int64')
+        return self._subset(positions, level)
+
+
+def load_registry(path, rename=None, **read_csv_kwargs):
+    """
+    Load a stations CSV file as a StationRegistry, once per process (reloaded if the file changes).
+
+    :param path: Path of the CSV file.
+    :param rename: Optional mapping renaming columns, e.g. to 'lat' and 'lon'.
+    :param read_csv_kwargs: Options passed to pd.read_csv.
+    :return: StationRegistry.
+    """
+    key = (os.path.realpath(path), os.path.getmtime(path), repr(rename), repr(sorted(read_csv_kwargs.items())))
+    with _LOCK:
+        registry = _REGISTRIES.get(key)
+        if registry is None:
+            stations = pd.read_csv(path, **read_csv_kwargs)
+            if rename is not None:
+                stations = stations.rename(columns=rename)
+            registry = _REGISTRIES[key] = StationRegistry(stations)
+    return registry